@@ -0,0 +1,148 @@
+################################################################################
+# DataLoader upload throughput against a local stand-in loader server
+#
+# StandInLoader mimics the hardware database loader closely enough to test
+# uploads without the network: it checks the md5 signature the same way the
+# server does, answers "Signature Error" on a mismatch, and counts the rows it
+# accepts. Per-request latency and a rate of injected 503/"Signature Error"
+# answers are configurable.
+#
+# The benchmark uploads the same rows once per row with send(), the way
+# masterupload.py has always done, and then with sendBatched().
+#
+# Usage:
+#   python -m benchmarks.dataloader [--rows 2000] [--latency 0.02] [--faults 0.05]
+################################################################################
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from guis.straw.dataloader import DataLoader
+
+PASSWORD = "stand-in"
+GROUP = "Straw Tables"
+TABLE = "straws"
+
+
+class StandInLoader(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0, faults=0.0):
+        super().__init__(address, StandInHandler)
+        self.latency = latency  # seconds added to every request
+        self.faults = faults  # fraction of requests answered with an error
+        self.requests = 0
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "http://%s:%s/loader" % self.server_address
+
+    def serve(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+
+        m = hashlib.md5()
+        m.update(PASSWORD.encode())
+        m.update(self.headers["X-Salt"].encode())
+        m.update(body)
+        if m.hexdigest() != self.headers["X-Signature"]:
+            return self.reply(200, b"Signature Error")
+
+        fault = random.random()
+        if fault < self.server.faults / 2:
+            return self.reply(200, b"Signature Error")
+        if fault < self.server.faults:
+            return self.reply(503, b"Service Unavailable")
+
+        rows = json.loads(body)["rows"]
+        with self.server.lock:
+            self.server.rows += len(rows)
+        self.reply(200, b"OK")
+
+    def reply(self, code, text):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="s/request")
+    parser.add_argument(
+        "--faults", type=float, default=0.0, help="fraction of failed requests"
+    )
+    parser.add_argument("--max_rows", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    return parser.parse_args()
+
+
+def MakeRows(n):
+    return [
+        {
+            "straw_barcode": "ST%05d" % i,
+            "batch_number": "012345.B4",
+            "worker_barcode": "wk-bench01",
+        }
+        for i in range(n)
+    ]
+
+
+def Main():
+    options = GetOptions()
+    server = StandInLoader(latency=options.latency, faults=options.faults)
+    server.serve()
+    rows = MakeRows(options.rows)
+
+    # One request per row
+    start = time.perf_counter()
+    for row in rows:
+        loader = DataLoader(PASSWORD, server.url, GROUP, TABLE)
+        loader.addRow(row)
+        loader.send()
+    dt = time.perf_counter() - start
+    print(
+        "%20s: %8.1f rows/s, %5d requests, %5d rows accepted"
+        % ("send() per row", len(rows) / dt, server.requests, server.rows)
+    )
+
+    server.requests, server.rows = 0, 0
+    start = time.perf_counter()
+    loader = DataLoader(PASSWORD, server.url, GROUP, TABLE)
+    for row in rows:
+        loader.addRow(row)
+    results = loader.sendBatched(
+        maxRows=options.max_rows, maxWorkers=options.workers, backoff=0.05
+    )
+    dt = time.perf_counter() - start
+    failed = sum(len(batch) for ok, code, text, batch, loaded in results if not ok)
+    print(
+        "%20s: %8.1f rows/s, %5d requests, %5d rows accepted, %d failed"
+        % ("sendBatched()", len(rows) / dt, server.requests, server.rows, failed)
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    Main()
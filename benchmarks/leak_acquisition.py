@@ -0,0 +1,132 @@
+################################################################################
+# Leak stand acquisition: polling the rows in turn vs a reader per port
+#
+# Runs --rows simulated leak stand arduinos (guis.common.simulator), --silent
+# of which never send anything, and reads them for --duration s
+#   polled  - the way LeakTestStatus.handleStart used to: one readline
+#             (timeout 0.08 s) per row per sweep, the reading timestamped
+#             when the sweep gets to it
+#   readers - guis.straw.leak.acquisition.LeakAcquisition, a thread per port
+# and reports, over the readings of the live rows,
+#   rate    - readings per second taken in
+#   stamp   - how late each reading's timestamp is after the simulator sent
+#             it (median, 99th percentile, max)
+#   backlog - readings sent but not taken in by the end
+#
+# Usage:
+#   python -m benchmarks.leak_acquisition [--rows 10 40] [--silent 5]
+#                                         [--period 0.4] [--duration 10]
+################################################################################
+import argparse
+import statistics
+import time
+
+import serial
+
+from guis.common.simulator import DeviceModel, LeakStandArduino, VirtualPort
+from guis.straw.leak.acquisition import LeakAcquisition
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 40])
+    parser.add_argument("--silent", type=int, default=5, help="rows with no data")
+    parser.add_argument("--period", type=float, default=0.4, help="s per reading")
+    parser.add_argument("--duration", type=float, default=10.0)
+    return parser.parse_args()
+
+
+def Ports(rows, silent, period):
+    ports = []
+    for row in range(rows):
+        if row < silent:
+            model = DeviceModel()  # never sends
+        else:
+            model = LeakStandArduino(period=period, seed=row)
+        ports.append(VirtualPort(model).start())
+    return ports
+
+
+# time.time() - time.monotonic(), to compare timestamps with sentTime()
+def Offset():
+    return time.time() - time.monotonic()
+
+
+def Polled(ports, duration, record):
+    arduinos = [
+        serial.Serial(port=port.device, baudrate=115200, timeout=0.08) for port in ports
+    ]
+    counts = [0] * len(ports)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for row, arduino in enumerate(arduinos):
+            line = arduino.readline().strip()
+            if not line:
+                continue
+            timestamp = time.time()
+            chamber, ppm = line.split()
+            int(float(chamber)), float(ppm)
+            record(row, counts[row], timestamp)
+            counts[row] += 1
+    for arduino in arduinos:
+        arduino.close()
+    return counts
+
+
+def Readers(ports, duration, record):
+    acquisition = LeakAcquisition(startup=0)
+    for row, port in enumerate(ports):
+        acquisition.start(row, port.device)
+    counts = [0] * len(ports)
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for reading in acquisition.readings(timeout=0.1):
+            record(reading.row, counts[reading.row], reading.timestamp)
+            counts[reading.row] += 1
+    acquisition.stopAll()
+    return counts
+
+
+def Run(name, read, rows, options):
+    ports = Ports(rows, options.silent, options.period)
+    offset = Offset()
+    stamps = []
+
+    def record(row, n, timestamp):
+        sent = ports[row].sentTime(n)
+        if sent is not None:
+            stamps.append(timestamp - offset - sent)
+
+    try:
+        counts = read(ports, options.duration, record)
+        backlog = sum(port.lines_sent for port in ports) - sum(counts)
+    finally:
+        for port in ports:
+            port.close()
+
+    stamps.sort()
+    print(
+        "%3d rows (%d silent), %-7s %7.1f readings/s  stamp late by median "
+        "%7.1f ms, p99 %7.1f ms, max %7.1f ms  backlog %5d"
+        % (
+            rows,
+            options.silent,
+            name,
+            sum(counts) / options.duration,
+            1e3 * statistics.median(stamps) if stamps else float("nan"),
+            1e3 * stamps[int(0.99 * (len(stamps) - 1))] if stamps else float("nan"),
+            1e3 * stamps[-1] if stamps else float("nan"),
+            backlog,
+        )
+    )
+
+
+def Main():
+    options = GetOptions()
+    for rows in options.rows:
+        Run("polled", Polled, rows, options)
+        Run("readers", Readers, rows, options)
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,154 @@
+################################################################################
+# Batch refit of the straw leak raw data: files/s and agreement
+#
+# Writes --files raw data text files (benchmarks.leak_raw_archive.WriteFiles)
+# and a LeakTestResults.csv recording each file's leak rate as LeakTestGUI
+# would, with the straw's volume taken off the chamber's, and every
+# --changed'th one recorded 5% off. Then refits them all
+#   one by one  - the way refit_straw_leak.refit does (get_data_from_file,
+#                 get_fit, calculate_leak_rate per file, in this process), with
+#                 LeakTestGUI's chamber volume
+#   batch_refit - guis.straw.leak.batch_refit.refit_files over a pool of
+#                 --processes processes (each of them in turn), from the text
+#                 files and from the archive
+# and reports the files/s of each. Checks that every batch refit agrees with
+# the one by one refit to within --rtol (the square roots may differ in the
+# last bit, see benchmarks/leak_fit_equivalence.py) and that exactly the
+# changed results are reported as differing. Exits 1 if not.
+#
+# Usage:
+#   python -m benchmarks.leak_batch_refit [--files 500] [--readings 3000]
+#       [--processes 1 4] [--changed 10] [--skip_start 5] [--skip_end 5]
+#       [--rtol 1e-12]
+################################################################################
+import argparse
+import datetime
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from tests.leak_fit_data import Agree
+from benchmarks.leak_raw_archive import WriteFiles
+from guis.straw.leak import batch_refit
+from guis.straw.leak.batch_fit import chamber_from_filename
+from guis.straw.leak.least_square_linear import get_fit
+from guis.straw.leak.raw_data_archive import RawDataArchive
+from guis.straw.leak.refit_straw_leak import truncate
+from guis.straw.leak.straw_leak_utilities import (
+    STRAW_VOLUME,
+    calculate_leak_rate,
+    calculate_leak_rate_err,
+    get_chamber_volume,
+    get_chamber_volume_err,
+    get_data_from_file,
+)
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--readings", type=int, default=3000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--skip_start", type=int, default=5)
+    parser.add_argument("--skip_end", type=int, default=5)
+    parser.add_argument("--rtol", type=float, default=1e-12)
+    return parser.parse_args()
+
+
+# refit_straw_leak.refit, for a path rather than a name in the raw_data
+# directory, and with the chamber volume less the straw's, as LeakTestGUI has it
+def RefitOne(path, skip_start, skip_end):
+    timestamp, PPM, PPM_err = (
+        truncate(column, skip_start, skip_end) for column in get_data_from_file(path)
+    )
+    chamber = chamber_from_filename(path.name)
+    volume = get_chamber_volume(chamber) - STRAW_VOLUME
+    slope, slope_err, _, _ = get_fit(timestamp, PPM, PPM_err)
+    leak_rate = calculate_leak_rate(slope, volume)
+    leak_rate_err = calculate_leak_rate_err(
+        leak_rate, slope, slope_err, volume, get_chamber_volume_err(chamber)
+    )
+    return leak_rate, leak_rate_err
+
+
+def WriteResults(path, paths, expected, changed):
+    with open(path, "w") as f:
+        for n, (raw, (leak_rate, leak_rate_err)) in enumerate(zip(paths, expected)):
+            straw, date = raw.name.split("_chamber")[0], raw.name.split("_")[2:5]
+            when = datetime.datetime(*map(int, date)) + datetime.timedelta(hours=20)
+            if n % changed == 0:
+                leak_rate *= 1.05
+            f.write(
+                "%s%s,%s,CO2,wk-test01,chamber%d,%s,%s"
+                % (
+                    "\n" if n else "",
+                    straw,
+                    when.strftime("%Y-%m-%d %H:%M:%S"),
+                    chamber_from_filename(raw.name),
+                    leak_rate,
+                    leak_rate_err,
+                )
+            )
+
+
+def Check(name, refits, expected, results, options):
+    bad = 0
+    for refit, (leak_rate, leak_rate_err) in zip(refits, expected):
+        if not (
+            Agree(refit.leak_rate, leak_rate, options.rtol)
+            and Agree(refit.leak_rate_err, leak_rate_err, options.rtol)
+        ):
+            print("%s: %s refit differently" % (name, refit.file))
+            bad += 1
+    refits = [
+        batch_refit.compare(refit, batch_refit.recorded(results, refit))
+        for refit in refits
+    ]
+    differing = [
+        n for n, refit in enumerate(refits) if batch_refit.differs(refit, 0.01)
+    ]
+    if differing != list(range(0, len(refits), options.changed)):
+        print("%s: %d results reported as differing" % (name, len(differing)))
+        bad += 1
+    return bad
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir, archive_dir = Path(tmp) / "raw_data", Path(tmp) / "raw_data_archive"
+        raw_dir.mkdir()
+        paths = WriteFiles(raw_dir, options.files, options.readings)
+        RawDataArchive(archive_dir).convert(raw_dir)
+
+        start = time.perf_counter()
+        expected = [RefitOne(p, options.skip_start, options.skip_end) for p in paths]
+        elapsed = time.perf_counter() - start
+        print("%-28s %8.1f files/s" % ("one by one", len(paths) / elapsed))
+
+        WriteResults(Path(tmp) / "results.csv", paths, expected, options.changed)
+        results = batch_refit.read_results(Path(tmp) / "results.csv")
+
+        bad = 0
+        for processes in options.processes:
+            for source, archive in (("text", None), ("archive", archive_dir)):
+                name = "batch_refit, %d proc, %s" % (processes, source)
+                start = time.perf_counter()
+                refits = batch_refit.refit_files(
+                    paths,
+                    options.skip_start,
+                    options.skip_end,
+                    archive,
+                    processes,
+                )
+                elapsed = time.perf_counter() - start
+                print("%-28s %8.1f files/s" % (name, len(paths) / elapsed))
+                bad += Check(name, refits, expected, results, options)
+        print("batch refits %s" % ("differ" if bad else "all agree"))
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,124 @@
+################################################################################
+# Early leak test decisions on simulated straws
+#
+# Writes --straws raw data files of --hours of readings every --period s, for
+# straws of known leak rate: mostly good (0.1-0.8 of max_leakrate), some bad
+# (1.2-5x), some close to the limit (0.85-1.15x). Each file's ppm rises with
+# its leak rate, with reading noise (--noise ppm) and a slow random walk
+# (--drift ppm per reading). The files are archived and replayed with
+# guis.straw.leak.decision_replay, which reports the chamber-hours each
+# SequentialDecision saves and how often it disagrees with the fixed rules.
+# This also reports how often each rule got the straw wrong, against the leak
+# rate it really has.
+#
+# Usage:
+#   python -m benchmarks.leak_early_decision [--straws 300] [--hours 8]
+#       [--period 10] [--noise 10] [--drift 0.3] [--z 2 3 4]
+################################################################################
+import argparse
+import datetime
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from guis.straw.leak import decision_replay
+from guis.straw.leak.leak_decision import FAILED, PASSED, SequentialDecision
+from guis.straw.leak.raw_data_archive import RawDataArchive
+from guis.straw.leak.straw_leak_utilities import STRAW_VOLUME, get_chamber_volume
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--straws", type=int, default=300)
+    parser.add_argument("--hours", type=float, default=8)
+    parser.add_argument("--period", type=float, default=10, help="s per reading")
+    parser.add_argument("--noise", type=float, default=10, help="ppm")
+    parser.add_argument("--drift", type=float, default=0.3, help="ppm per reading")
+    parser.add_argument("--z", type=float, nargs="+", default=[2.0, 3.0, 4.0])
+    return parser.parse_args()
+
+
+def TrueLeakRate(rng):
+    kind = rng.random()
+    if kind < 0.80:
+        return rng.uniform(0.1, 0.8) * decision_replay.MAX_LEAKRATE
+    if kind < 0.92:
+        return rng.uniform(1.2, 5.0) * decision_replay.MAX_LEAKRATE
+    return rng.uniform(0.85, 1.15) * decision_replay.MAX_LEAKRATE
+
+
+# Write the straws' raw data files. Returns {file name: true leak rate}.
+def WriteFiles(directory, options):
+    rng = random.Random(0)
+    truth = {}
+    for n in range(options.straws):
+        chamber = n % 50
+        leak_rate = TrueLeakRate(rng)
+        # calculate_leak_rate, backwards
+        volume = get_chamber_volume(chamber) - STRAW_VOLUME
+        slope = leak_rate / (volume * 10 ** -6 * 60 * 0.14)
+        start = 1.6e9 + 86400 * (n // 50)
+        day = datetime.datetime.fromtimestamp(start).strftime("%Y_%m_%d")
+        name = "ST%05d_chamber%d_%s_rawdata.txt" % (n, chamber, day)
+        drift = 0.0
+        with open(directory / name, "w") as f:
+            for i in range(int(options.hours * 3600 / options.period)):
+                t = i * options.period
+                drift += rng.gauss(0, options.drift)
+                ppm = 400 + slope * t + drift + rng.gauss(0, options.noise)
+                f.write(
+                    ("%.0f" % (start + t))
+                    + "\t"
+                    + str(chamber)
+                    + "\t"
+                    + ("%.0f" % ppm)
+                    + "\t"
+                    + str(datetime.datetime.fromtimestamp(start + t))[:19]
+                    + "\n"
+                )
+        truth[name] = leak_rate
+    return truth
+
+
+def Wrong(decisions, truth):
+    decided = wrong = 0
+    for name, decision in decisions:
+        if decision.result is None:
+            continue
+        decided += 1
+        bad = truth[name] > decision_replay.MAX_LEAKRATE
+        wrong += decision.result != (FAILED if bad else PASSED)
+    return wrong, decided
+
+
+def Main():
+    options = GetOptions()
+    sequentials = [SequentialDecision(z=z) for z in options.z]
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir, archive_dir = Path(tmp) / "raw_data", Path(tmp) / "raw_data_archive"
+        raw_dir.mkdir()
+        truth = WriteFiles(raw_dir, options)
+        RawDataArchive(archive_dir).convert(raw_dir)
+
+        start = time.perf_counter()
+        replays = decision_replay.replay_all(sequentials, archive_dir=archive_dir)
+        elapsed = time.perf_counter() - start
+        print(
+            "replayed %d straws in %.1f s (%.1f straws/s)"
+            % (len(replays), elapsed, len(replays) / elapsed)
+        )
+        decision_replay.report(replays, sequentials)
+
+        wrong, decided = Wrong([(r.file, r.fixed) for r in replays], truth)
+        print("fixed rules wrong about %d of %d straws they decided" % (wrong, decided))
+        for i, rule in enumerate(sequentials):
+            wrong, decided = Wrong([(r.file, r.sequential[i]) for r in replays], truth)
+            print(
+                "z %-4g      wrong about %d of %d straws it decided"
+                % (rule.z, wrong, decided)
+            )
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,235 @@
+################################################################################
+# Numerical equivalence and speed of the batched leak fits
+#
+# Compares guis/straw/leak/batch_fit.py with the functions it batches, chamber
+# by chamber:
+#   fit                 - least_square_linear.get_fit
+#   fit_zero_intercept  - get_slope_zero_intercept, get_slope_err_zero_intercept
+#   leak_rates          - straw_leak_utilities.calculate_leak_rate(_err)
+#   fit_states          - streaming_fit.LeakFitState.fit
+#   fit_files           - get_data_from_file, get_fit and the leak rates, as
+#                         refit_straw_leak.refit does, on raw data files
+# on random leak-stand-like data of different lengths (including 0, 1 and 2
+# readings) and on degenerate data where the fits return -100 or raise, from
+# tests/leak_fit_data.py. Values agree if they are within --rtol of each
+# other, or both aren't finite (the batched fits give nan or inf where the
+# originals raise).
+#
+# Then times a fit of every chamber one by one and batched, for 50 chambers
+# (a leak stand) and --files raw data files (an archive).
+#
+# tests/test_leak_fit_equivalence.py asserts the same agreement on small
+# inputs under pytest; this reports the worst differences at full size.
+#
+# Usage:
+#   python -m benchmarks.leak_fit_equivalence [--chambers 50] [--readings 3000]
+#                                             [--files 500] [--rtol 1e-12]
+################################################################################
+import argparse
+import math
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from guis.straw.leak import batch_fit
+from guis.straw.leak.least_square_linear import get_fit
+from guis.straw.leak.straw_leak_utilities import (
+    calculate_leak_rate,
+    calculate_leak_rate_err,
+    get_chamber_volume,
+    get_chamber_volume_err,
+    get_data_from_file,
+)
+from guis.straw.leak.streaming_fit import LeakFitState
+from tests.leak_fit_data import Agree, Chamber, Degenerate, ZeroIntercept
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chambers", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=3000, help="per chamber")
+    parser.add_argument("--files", type=int, default=500, help="archive size")
+    parser.add_argument("--rtol", type=float, default=1e-12)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+## DATA ##
+# Raw data file lines for a chamber: <timestamp> <chamber> <reading> <time>
+def WriteRawData(path, chamber, x, y):
+    start = 1.6e9
+    with open(path, "w") as f:
+        f.write("%.2f %d %.2f start\n" % (start, chamber, 0.0))
+        for t, ppm in zip(x, y):
+            f.write("%.2f %d %.2f time\n" % (start + t, chamber, ppm))
+
+
+## COMPARISON ##
+def Relative(a, b):
+    a, b = complex(a).real, complex(b).real
+    if a == b or not (math.isfinite(a) and math.isfinite(b)):
+        return 0.0
+    return abs(a - b) / max(abs(a), abs(b))
+
+
+class Check:
+    def __init__(self, rtol):
+        self.rtol = rtol
+        self.failed = []
+        self.worst = {}
+
+    # expected: a tuple per chamber; got: a tuple of arrays, one entry per chamber
+    def compare(self, name, expected, got):
+        for chamber, values in enumerate(expected):
+            for quantity, (e, g) in enumerate(zip(values, got)):
+                g = g[chamber]
+                key = "%s[%d]" % (name, quantity)
+                self.worst[key] = max(self.worst.get(key, 0.0), Relative(e, g))
+                if not Agree(e, g, self.rtol):
+                    self.failed.append(
+                        "%s, chamber %d: expected %r, got %r" % (key, chamber, e, g)
+                    )
+
+
+def Compare(chambers, check, directory):
+    numbers = [i % 50 for i in range(len(chambers))]
+    x, mask = batch_fit.stack([c[0] for c in chambers])
+    y, _ = batch_fit.stack([c[1] for c in chambers])
+    y_err, _ = batch_fit.stack([c[2] for c in chambers], fill=1.0)
+
+    fits = [get_fit(*c) for c in chambers]
+    got = batch_fit.fit(x, y, y_err, mask)
+    check.compare("fit", fits, got)
+    check.compare(
+        "fit_zero_intercept",
+        [ZeroIntercept(*c) for c in chambers],
+        batch_fit.fit_zero_intercept(x, y, y_err, mask),
+    )
+
+    # leak rates from the same slopes, so only the leak rate math is compared
+    rates = []
+    for (slope, slope_err, _, _), n in zip(fits, numbers):
+        rate = calculate_leak_rate(slope, get_chamber_volume(n))
+        rates.append(
+            (
+                rate,
+                calculate_leak_rate_err(
+                    rate,
+                    slope,
+                    slope_err,
+                    get_chamber_volume(n),
+                    get_chamber_volume_err(n),
+                ),
+            )
+        )
+    check.compare("leak_rates", rates, batch_fit.leak_rates(got[0], got[1], numbers))
+
+    states = []
+    for c in chambers:
+        state = LeakFitState()
+        for t, ppm in zip(c[0], c[1]):
+            state.add(1.6e9 + t, ppm)
+        states.append(state)
+    check.compare("fit_states", [s.fit() for s in states], batch_fit.fit_states(states))
+
+    paths = []
+    for i, (c, n) in enumerate(zip(chambers, numbers)):
+        paths.append(directory / ("ST%05d_chamber%d_2021_06_15_rawdata.txt" % (i, n)))
+        WriteRawData(paths[-1], n, c[0], c[1])
+    check.compare(
+        "fit_files",
+        [RefitFile(p, n) for p, n in zip(paths, numbers)],
+        batch_fit.fit_files(paths),
+    )
+
+
+# refit_straw_leak.refit with nothing skipped, by path
+def RefitFile(path, chamber):
+    timestamps, PPM, PPM_err = get_data_from_file(path)
+    slope, slope_err, _, _ = get_fit(timestamps, PPM, PPM_err)
+    rate = calculate_leak_rate(slope, get_chamber_volume(chamber))
+    rate_err = calculate_leak_rate_err(
+        rate,
+        slope,
+        slope_err,
+        get_chamber_volume(chamber),
+        get_chamber_volume_err(chamber),
+    )
+    return rate, rate_err, len(PPM)
+
+
+## TIMING ##
+def Time(function, repeat=3):
+    best = math.inf
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def Report(name, one_by_one, batched):
+    print(
+        "%-40s one by one %9.1f ms, batched %8.1f ms, %6.1fx"
+        % (name, 1e3 * one_by_one, 1e3 * batched, one_by_one / batched)
+    )
+
+
+def Main():
+    options = GetOptions()
+    rng = random.Random(options.seed)
+    check = Check(options.rtol)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        lengths = [0, 1, 2, 3, 10, 100] + [
+            rng.randint(20, 2 * options.readings) for _ in range(44)
+        ]
+        (directory / "random").mkdir()
+        Compare([Chamber(n, rng) for n in lengths], check, directory / "random")
+        (directory / "degenerate").mkdir()
+        Compare(Degenerate(), check, directory / "degenerate")
+
+        for name, worst in sorted(check.worst.items()):
+            print("%-40s max relative difference %.2e" % (name, worst))
+        for failure in check.failed[:20]:
+            print("MISMATCH " + failure)
+        print("%d values disagree by more than %g" % (len(check.failed), options.rtol))
+
+        # a leak stand's chambers, in memory
+        chambers = [Chamber(options.readings, rng) for _ in range(options.chambers)]
+        x, mask = batch_fit.stack([c[0] for c in chambers])
+        y, _ = batch_fit.stack([c[1] for c in chambers])
+        y_err, _ = batch_fit.stack([c[2] for c in chambers])
+        Report(
+            "%d chambers x %d readings, get_fit" % (len(chambers), options.readings),
+            Time(lambda: [get_fit(*c) for c in chambers]),
+            Time(lambda: batch_fit.fit(x, y, y_err, mask)),
+        )
+        Report(
+            "%d chambers, zero intercept" % len(chambers),
+            Time(lambda: [ZeroIntercept(*c) for c in chambers]),
+            Time(lambda: batch_fit.fit_zero_intercept(x, y, y_err, mask)),
+        )
+
+        # an archive of raw data files, read and fit
+        (directory / "archive").mkdir()
+        paths, numbers = [], []
+        for i in range(options.files):
+            n = i % 50
+            x, y, _ = Chamber(rng.randint(100, options.readings), rng)
+            paths.append(
+                directory / "archive" / ("ST%05d_chamber%d_rawdata.txt" % (i, n))
+            )
+            numbers.append(n)
+            WriteRawData(paths[-1], n, x, y)
+        Report(
+            "%d raw data files, read and fit" % len(paths),
+            Time(lambda: [RefitFile(p, n) for p, n in zip(paths, numbers)], 1),
+            Time(lambda: batch_fit.fit_files(paths), 1),
+        )
+
+
+if __name__ == "__main__":
+    Main()
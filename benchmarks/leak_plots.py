@@ -0,0 +1,134 @@
+################################################################################
+# Cost of the leak fit plots to the acquisition loop
+#
+# Replays --rounds fit updates of --chambers chambers, each with --readings
+# readings (plus a few more per round), the way LeakTestStatus's loop plots
+# them:
+#   inline   - pyplot, plt.savefig per chamber per update (the loop used to)
+#   renderer - PlotRenderer.submit per chamber per update, drawn on its thread
+# and reports the time the loop spends on plots per round and how many pdfs
+# were drawn.
+#
+# The renderer runs with --min_interval 0 here, so it draws whatever it can
+# keep up with; at the default 60 s it draws less.
+#
+# Usage:
+#   python -m benchmarks.leak_plots [--chambers 50] [--readings 1000]
+#                                   [--rounds 3] [--min_interval 0]
+################################################################################
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from guis.straw.leak.plot_renderer import PlotData, PlotRenderer
+from guis.straw.leak.streaming_fit import LeakFitState
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chambers", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--min_interval", type=float, default=0)
+    return parser.parse_args()
+
+
+def Fill(state, n, rng):
+    start = state.starttime or 1.6e9
+    t = start + (state.timestamps[-1] + 2 if state.timestamps else 0)
+    for _ in range(n):
+        state.add(t, 500 + 0.05 * (t - start) + rng.gauss(0, 10))
+        t += 2
+
+
+def Data(directory, chamber, state):
+    slope, slope_err, intercept, _ = state.fit()
+    return PlotData(
+        path=directory / ("ST%05d_chamber%d_fit.pdf" % (chamber, chamber)),
+        title="ST%05d_chamber%d_fit" % (chamber, chamber),
+        fit_state=state,
+        n=len(state),
+        slope=slope,
+        slope_err=slope_err,
+        intercept=intercept,
+        leak_rate=slope * 5e-3,
+        leak_rate_err=slope_err * 5e-3,
+        status="unknown status",
+        time="2021-06-15 12:00:00",
+    )
+
+
+# The loop's old plotting code
+def PlotInline(data):
+    timestamps = data.fit_state.timestamps[: data.n]
+    x = np.linspace(0, max(timestamps))
+    plt.plot(timestamps, data.fit_state.PPM[: data.n], "bo")
+    plt.plot(x, data.slope * x + data.intercept, "r")
+    plt.xlabel("time (s)")
+    plt.ylabel("CO2 level (PPM)")
+    plt.title(data.title)
+    plt.figtext(0.49, 0.80, data.status + "\n" + data.time, fontsize=12, color="r")
+    plt.savefig(data.path)
+    plt.clf()
+
+
+def Run(options, plot, directory):
+    rng = random.Random(0)
+    states = [LeakFitState() for _ in range(options.chambers)]
+    loop = []
+    for _ in range(options.rounds):
+        for state in states:
+            Fill(state, options.readings if not len(state) else 8, rng)
+        start = time.perf_counter()
+        for chamber, state in enumerate(states):
+            plot(chamber, Data(directory, chamber, state))
+        loop.append(time.perf_counter() - start)
+    return loop
+
+
+def Report(name, loop, drawn):
+    print(
+        "%-9s loop spends %8.1f ms per round on plots (max %8.1f ms), %4d pdfs drawn"
+        % (name, 1e3 * sum(loop) / len(loop), 1e3 * max(loop), drawn)
+    )
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+
+        loop = Run(options, lambda c, data: PlotInline(data), directory)
+        Report("inline", loop, options.rounds * options.chambers)
+        plt.close("all")
+
+        renderer = PlotRenderer(min_interval=options.min_interval)
+        renderer.start()
+        loop = Run(options, renderer.submit, directory)
+        # wait for the last round to be drawn
+        while renderer.stats()["pending"]:
+            time.sleep(0.05)
+        renderer.stop()
+        stats = renderer.stats()
+        Report("renderer", loop, stats["renders"])
+        print(
+            "renderer: %d fits submitted, %d drawn, %d failed, median %.1f ms per pdf"
+            % (
+                stats["submitted"],
+                stats["renders"],
+                stats["failed"],
+                1e3 * stats["render_time_median"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,134 @@
+################################################################################
+# Reading the leak raw data: text files vs the columnar archive
+#
+# Writes --files raw data text files of --readings readings each (one straw
+# per file, chambers taking turns), converts them with
+# guis.straw.leak.raw_data_archive, and reports
+#   convert - time to archive them all, and again with nothing changed
+#   size    - bytes on disk, text vs archive
+#   read    - time to read every file the way refits do,
+#             get_data_from_file vs RawDataArchive.get_data, and to look up
+#             and load one straw's history
+# then checks the archive reads back exactly what get_data_from_file does for
+# every file. Exits 1 if it doesn't.
+#
+# Usage:
+#   python -m benchmarks.leak_raw_archive [--files 500] [--readings 3000]
+################################################################################
+import argparse
+import datetime
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from guis.straw.leak.raw_data_archive import RawDataArchive
+from guis.straw.leak.straw_leak_utilities import get_data_from_file
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--readings", type=int, default=3000)
+    return parser.parse_args()
+
+
+def WriteFiles(directory, files, readings):
+    rng = random.Random(0)
+    paths = []
+    for n in range(files):
+        chamber = n % 50
+        start = 1.6e9 + 86400 * (n // 50)
+        day = datetime.datetime.fromtimestamp(start).strftime("%Y_%m_%d")
+        path = directory / ("ST%05d_chamber%d_%s_rawdata.txt" % (n, chamber, day))
+        with open(path, "w") as f:
+            for i in range(readings):
+                epoctime = start + 2 * i
+                ppm = 500 + 0.05 * 2 * i + rng.gauss(0, 10)
+                f.write(
+                    ("%.0f" % epoctime)
+                    + "\t"
+                    + str(chamber)
+                    + "\t"
+                    + ("%.0f" % ppm)
+                    + "\t"
+                    + str(datetime.datetime.fromtimestamp(epoctime))[:19]
+                    + "\n"
+                )
+        paths.append(path)
+    return paths
+
+
+def Size(paths):
+    return sum(path.stat().st_size for path in paths)
+
+
+def Timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir, archive_dir = Path(tmp) / "raw_data", Path(tmp) / "raw_data_archive"
+        raw_dir.mkdir()
+        paths = WriteFiles(raw_dir, options.files, options.readings)
+
+        elapsed, counts = Timed(RawDataArchive(archive_dir).convert, raw_dir)
+        print(
+            "convert  %8.3f s  (%d converted, %d unchanged, %d failed)"
+            % ((elapsed,) + counts)
+        )
+        elapsed, counts = Timed(RawDataArchive(archive_dir).convert, raw_dir)
+        print(
+            "again    %8.3f s  (%d converted, %d unchanged, %d failed)"
+            % ((elapsed,) + counts)
+        )
+        print(
+            "size     text %.1f MB, archive %.1f MB"
+            % (Size(paths) / 1e6, Size(list(archive_dir.iterdir())) / 1e6)
+        )
+
+        text_time, text = Timed(lambda: [get_data_from_file(p) for p in paths])
+        archive = RawDataArchive(archive_dir)
+        archive_time, archived = Timed(
+            lambda: [archive.get_data(p.name) for p in paths]
+        )
+        print(
+            "read     text %8.3f s, archive %8.3f s (%.1fx), %d files"
+            % (text_time, archive_time, text_time / archive_time, len(paths))
+        )
+
+        straw = "ST%05d" % (options.files // 2)
+        text_time, _ = Timed(
+            lambda: [get_data_from_file(p) for p in sorted(raw_dir.glob(straw + "_*"))]
+        )
+        manifest_time, archive = Timed(RawDataArchive, archive_dir)
+        archive_time, _ = Timed(
+            lambda: [archive.get_data(entry.name) for entry in archive.straw(straw)]
+        )
+        print(
+            "history  text %8.2f ms, archive %8.2f ms, one straw"
+            " (the manifest takes %.2f ms to load, once)"
+            % (1e3 * text_time, 1e3 * archive_time, 1e3 * manifest_time)
+        )
+
+        bad = 0
+        for path, a, b in zip(paths, text, archived):
+            if not all(np.array_equal(np.asarray(x), y) for x, y in zip(a, b)):
+                print("%s: archive reads differently" % path.name)
+                bad += 1
+        print(
+            "%d of %d files read back the same from the archive"
+            % (len(paths) - bad, len(paths))
+        )
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    Main()
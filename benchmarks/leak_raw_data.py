@@ -0,0 +1,125 @@
+################################################################################
+# Writing the leak raw data files: open, append, close per reading vs
+# RawDataWriter
+#
+# Writes --readings readings to each of --chambers raw data files, the
+# chambers taking turns like the acquisition loop's readings do,
+#   per line - the way LeakTestStatus used to: open the chamber's file, append
+#              the line, flush, close
+#   writer   - guis.straw.leak.raw_data_writer.RawDataWriter, closed at the end
+# and reports the time per reading and the files opened, then checks the two
+# sets of files are byte for byte the same and read back the same with
+# get_data_from_file. Exits 1 if they don't.
+#
+# Usage:
+#   python -m benchmarks.leak_raw_data [--chambers 50] [--readings 2000]
+#                                      [--flush_interval 1] [--fsync_interval 60]
+################################################################################
+import argparse
+import datetime
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from guis.straw.leak.raw_data_writer import RawDataWriter
+from guis.straw.leak.straw_leak_utilities import get_data_from_file
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chambers", type=int, default=50)
+    parser.add_argument("--readings", type=int, default=2000)
+    parser.add_argument("--flush_interval", type=float, default=1.0)
+    parser.add_argument(
+        "--fsync_interval", type=float, default=60.0, help="negative: never"
+    )
+    return parser.parse_args()
+
+
+# (chamber, line) of every reading, in the order they're written
+def Readings(chambers, readings):
+    rng = random.Random(0)
+    start = 1.6e9
+    lines = []
+    for n in range(readings):
+        for chamber in range(chambers):
+            epoctime = start + 2 * n + 0.01 * chamber
+            ppm = 500 + 0.05 * 2 * n + rng.gauss(0, 10)
+            lines.append(
+                (
+                    chamber,
+                    ("%.0f" % epoctime)
+                    + "\t"
+                    + str(chamber)
+                    + "\t"
+                    + ("%.0f" % ppm)
+                    + "\t"
+                    + str(datetime.datetime.fromtimestamp(epoctime))[:19]
+                    + "\n",
+                )
+            )
+    return lines
+
+
+def RawPath(directory, chamber):
+    return directory / ("ST%05d_chamber%d_2021_06_15_rawdata.txt" % (chamber, chamber))
+
+
+def PerLine(directory, readings, options):
+    for chamber, line in readings:
+        with open(RawPath(directory, chamber), "a+", 1) as f:
+            f.write(line)
+            f.flush()
+    return len(readings)
+
+
+def Writer(directory, readings, options):
+    writer = RawDataWriter(
+        flush_interval=options.flush_interval,
+        fsync_interval=None if options.fsync_interval < 0 else options.fsync_interval,
+    )
+    for chamber, line in readings:
+        writer.write(chamber, RawPath(directory, chamber), line)
+    writer.closeAll()
+    return writer.stats()["opens"]
+
+
+def Run(name, write, directory, readings, options):
+    directory.mkdir()
+    start = time.perf_counter()
+    opens = write(directory, readings, options)
+    elapsed = time.perf_counter() - start
+    print(
+        "%-8s %7.2f us per reading, %8.3f s total, %7d files opened"
+        % (name, 1e6 * elapsed / len(readings), elapsed, opens)
+    )
+
+
+def Main():
+    options = GetOptions()
+    readings = Readings(options.chambers, options.readings)
+    with tempfile.TemporaryDirectory() as tmp:
+        per_line, writer = Path(tmp) / "per_line", Path(tmp) / "writer"
+        Run("per line", PerLine, per_line, readings, options)
+        Run("writer", Writer, writer, readings, options)
+
+        bad = 0
+        for chamber in range(options.chambers):
+            a, b = RawPath(per_line, chamber), RawPath(writer, chamber)
+            if a.read_bytes() != b.read_bytes():
+                print("chamber %d: files differ" % chamber)
+                bad += 1
+            elif get_data_from_file(a) != get_data_from_file(b):
+                print("chamber %d: read back differently" % chamber)
+                bad += 1
+        print(
+            "%d of %d chambers' files identical and read back the same"
+            % (options.chambers - bad, options.chambers)
+        )
+    sys.exit(1 if bad else 0)
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,109 @@
+################################################################################
+# pangui startup time
+#
+# Measures, each in a fresh python process so nothing is already imported:
+#   import - time to import guis.panel.pangui.pangui
+#   window - time from the start of the import until the panel GUI window has
+#            been shown and painted once
+# for LAZY_STARTUP (the default) and eager startup, where the data processor,
+# the device windows and the checked packages are imported and every pro's
+# widgets are built before the window is shown.
+#
+# With --max_import/--max_window the script exits with status 1 if the lazy
+# startup is slower than that (median, in seconds), so it can be used to catch
+# startup regressions.
+#
+# Usage:
+#   python -m benchmarks.pangui_startup [--repeat 5] [--offscreen]
+#                                       [--max_import 2.0] [--max_window 5.0]
+################################################################################
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Run in the child process. Prints {"import": s, "window": s}.
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import guis.panel.pangui.pangui as pangui
+imported = time.perf_counter()
+
+pangui.LAZY_STARTUP = {lazy}
+if not pangui.LAZY_STARTUP:
+    # what run() does before showing the window, minus checkPackages' popups
+    import cycler, kiwisolver, matplotlib, pyparsing, pyrect, pyscreeze
+    import pytweening, scipy, setuptools, six, sqlalchemy, pyautogui
+    pangui.importDeferredModules()
+
+from PyQt5.QtWidgets import QApplication
+from guis.common.getresources import GetProjectPaths
+
+app = QApplication(sys.argv)
+window = pangui.panelGUI(GetProjectPaths())
+window.show()
+app.processEvents()
+shown = time.perf_counter()
+print(json.dumps({{"import": imported - start, "window": shown - start}}))
+"""
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--offscreen", action="store_true", help="use Qt's offscreen platform"
+    )
+    parser.add_argument("--max_import", type=float, help="s, lazy import limit")
+    parser.add_argument("--max_window", type=float, help="s, lazy window limit")
+    return parser.parse_args()
+
+
+def Measure(lazy, offscreen):
+    env = dict(os.environ)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD.format(lazy=lazy)],
+        env=env,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def Main():
+    options = GetOptions()
+    medians = {}
+    for lazy in (True, False):
+        runs = [Measure(lazy, options.offscreen) for _ in range(options.repeat)]
+        medians[lazy] = {
+            key: statistics.median(run[key] for run in runs) for key in runs[0]
+        }
+        print(
+            "%6s startup: import %6.3f s, first window %6.3f s (median of %d)"
+            % (
+                "lazy" if lazy else "eager",
+                medians[lazy]["import"],
+                medians[lazy]["window"],
+                options.repeat,
+            )
+        )
+
+    failed = False
+    limits = {"import": options.max_import, "window": options.max_window}
+    for key, limit in limits.items():
+        if limit is not None and medians[True][key] > limit:
+            print(
+                "lazy %s time %.3f s is over the %.3f s limit"
+                % (key, medians[True][key], limit)
+            )
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    Main()
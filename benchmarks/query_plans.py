@@ -0,0 +1,197 @@
+################################################################################
+# Query plan check for the hot ORM queries
+#
+# Creates a scratch database from the db_classes tables, applies the schema
+# migrations (guis/common/migrations.py) and asks SQLite for the plan of each
+# query the GUIs run per straw, per position or per procedure, and reports
+# those that have to scan a whole table. tests/test_query_plans.py asserts
+# the same under pytest, to catch a lost index; this prints the plans.
+#
+# With --no_migrate the migrations are left out, to see the plans without the
+# indexes (queries on derived tables then fail: those are made by migrations).
+#
+# Usage:
+#   python -m benchmarks.query_plans [--no_migrate] [--verbose]
+################################################################################
+import argparse
+import re
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, Table, create_engine
+from sqlalchemy.orm import sessionmaker
+
+from guis.common.db_classes.bases import BASE
+from guis.common.db_classes.comment_failure import Comment
+from guis.common.db_classes.measurements_panel import (
+    MeasurementPan5,
+    PanelTempMeasurement,
+    StrawTensionMeasurement,
+    WireTensionMeasurement,
+)
+from guis.common.db_classes.procedure import Procedure, ProcedureTimestamp
+from guis.common.db_classes.session import Session
+from guis.common.db_classes.straw import Straw
+from guis.common.db_classes.straw_location import (
+    CuttingPallet,
+    StrawOccupancy,
+    StrawPosition,
+    StrawPresent,
+)
+from guis.common.migrations import DERIVED_TABLES, migrate
+from sqlalchemy import exists
+
+# "SCAN straw_position" (or "SCAN TABLE ..." in older sqlite) reads the whole
+# table; "SEARCH ... USING INDEX" and "SCAN ... USING COVERING INDEX" on a
+# subquery don't.
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?! USING (?:COVERING )?INDEX)")
+
+
+# name : query, mirroring the db_classes methods that run them
+def HotQueries(session):
+    location, position, straw, procedure = 1, 5, 2, 3
+    return {
+        "StrawLocation._queryStrawLocation": session.query(CuttingPallet).filter(
+            CuttingPallet.number == 7
+        ),
+        "StrawLocation.queryStrawPositions": session.query(StrawPosition)
+        .filter(StrawPosition.location == location)
+        .order_by(StrawPosition.position_number),
+        "StrawLocation.getStraws": session.query(StrawPosition.id, Straw)
+        .outerjoin(StrawOccupancy, StrawOccupancy.position == StrawPosition.id)
+        .outerjoin(Straw, Straw.id == StrawOccupancy.straw)
+        .filter(StrawPosition.location == location)
+        .order_by(StrawPosition.position_number.asc()),
+        "StrawLocation.getStrawAtPosition": session.query(Straw)
+        .join(StrawOccupancy, StrawOccupancy.straw == Straw.id)
+        .filter(StrawOccupancy.location == location)
+        .filter(StrawOccupancy.position_number == position),
+        "StrawLocation.getFilledPositions": session.query(
+            StrawOccupancy.position_number
+        )
+        .filter(StrawOccupancy.location == location)
+        .distinct()
+        .order_by(StrawOccupancy.position_number.asc()),
+        "StrawLocation.getUnfilledPositions": session.query(
+            StrawPosition.position_number
+        )
+        .filter(StrawPosition.location == location)
+        .filter(~exists().where(StrawOccupancy.position == StrawPosition.id))
+        .order_by(StrawPosition.position_number.asc()),
+        "StrawLocation.removeStraw": session.query(StrawPresent)
+        .join(StrawOccupancy, StrawOccupancy.id == StrawPresent.id)
+        .filter(StrawOccupancy.location == location)
+        .filter(StrawOccupancy.position_number == position),
+        "StrawLocation.occupancy": session.query(
+            StrawOccupancy.location,
+            StrawOccupancy.position_number,
+            StrawOccupancy.straw,
+        ).filter(StrawOccupancy.location.in_([location, location + 1])),
+        "Pallet._palletIsEmpty": session.query(CuttingPallet)
+        .filter(CuttingPallet.pallet_id == 4)
+        .join(StrawOccupancy, StrawOccupancy.location == CuttingPallet.id),
+        "Straw.locate": session.query(StrawPosition)
+        .join(StrawOccupancy, StrawOccupancy.position == StrawPosition.id)
+        .filter(StrawOccupancy.straw == straw),
+        "Straw.locateAll": session.query(
+            StrawOccupancy.straw,
+            StrawOccupancy.location,
+            StrawOccupancy.position_number,
+        ).filter(StrawOccupancy.straw.in_([straw, straw + 1])),
+        "Procedure._startProcedure": session.query(Procedure)
+        .filter(Procedure.station == "pan1")
+        .filter(Procedure.straw_location == location),
+        "Procedure timestamps": session.query(ProcedureTimestamp).filter(
+            ProcedureTimestamp.procedure == procedure
+        ),
+        "Procedure active sessions": session.query(Session)
+        .filter(Session.active == True)
+        .filter(Session.procedure == procedure),
+        "Procedure comments": session.query(Comment).filter(
+            Comment.procedure == procedure
+        ),
+        "HV measurements": session.query(MeasurementPan5)
+        .filter(MeasurementPan5.procedure == procedure)
+        .order_by(MeasurementPan5.position.asc()),
+        "straw tension measurements": session.query(StrawTensionMeasurement).filter(
+            StrawTensionMeasurement.procedure == procedure
+        ),
+        "wire tension measurements": session.query(WireTensionMeasurement).filter(
+            WireTensionMeasurement.procedure == procedure
+        ),
+        "panel heat measurements": session.query(PanelTempMeasurement).filter(
+            PanelTempMeasurement.procedure == procedure
+        ),
+    }
+
+
+# The mapped tables, minus foreign keys (some point at tables that aren't
+# mapped) and type arguments (straw_location_type.id has a bogus collation);
+# neither plays a part in the plans. Derived tables are left to the migrations.
+def CreateTables(engine):
+    metadata = MetaData()
+    for table in BASE.metadata.tables.values():
+        if table.name in DERIVED_TABLES:
+            continue
+        columns = [
+            Column(c.name, type(c.type)(), primary_key=c.primary_key)
+            for c in table.columns
+        ]
+        Table(table.name, metadata, *columns)
+    metadata.create_all(engine)
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no_migrate", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    return parser.parse_args()
+
+
+def Plan(con, sql):
+    return [row[-1] for row in con.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def Main():
+    options = GetOptions()
+    failed = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "plans.db"
+        engine = create_engine(f"sqlite:///{path}")
+        CreateTables(engine)
+        engine.dispose()
+        if not options.no_migrate:
+            migrate(path)
+
+        con = sqlite3.connect(str(path))
+        queries = HotQueries(sessionmaker(bind=engine)())
+        for name, query in queries.items():
+            sql = str(
+                query.statement.compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+            )
+            try:
+                plan = Plan(con, sql)
+            except sqlite3.OperationalError as e:
+                print("%-40s %s" % (name, e))
+                failed.append(name)
+                continue
+            scans = [step for step in plan if FULL_SCAN.match(step)]
+            print("%-40s %s" % (name, "FULL SCAN" if scans else "ok"))
+            if scans or options.verbose:
+                for step in plan:
+                    print("    " + step)
+            if scans:
+                failed.append(name)
+        con.close()
+
+    print(
+        "%d of %d hot queries scan a whole table or failed"
+        % (len(failed), len(queries))
+    )
+
+
+if __name__ == "__main__":
+    Main()
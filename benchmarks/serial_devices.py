@@ -0,0 +1,212 @@
+################################################################################
+# Serial acquisition loops against simulated devices
+#
+# Runs each device model from guis.common.simulator on a virtual port and
+# reads it with pyserial the way the GUI's acquisition loop does, then reports
+#   throughput - lines (or requests) handled per second
+#   latency    - streaming devices: time from the simulator writing a line to
+#                the loop having parsed it; request/response devices: round
+#                trip of one request (median, 99th percentile, max)
+#   memory     - python heap growth after the first second (tracemalloc) and
+#                the process' max RSS
+#
+# The loops only mirror the reading and parsing; nothing is plotted or saved.
+# Streaming devices run with a short period so the loop, not the device, is
+# the bottleneck; pass --period to change that.
+#
+# Usage:
+#   python -m benchmarks.serial_devices [--duration 10] [--period 0.001]
+#                                       [--baudrate 115200] [device ...]
+################################################################################
+import argparse
+import collections
+import resource
+import statistics
+import time
+import tracemalloc
+
+import serial
+
+from guis.common.simulator import DEVICES, VirtualPort
+
+
+## ACQUISITION LOOPS ##
+# Each takes a LineReader on the open port, runs until the deadline and calls
+# record(latency) once per line or request handled.
+
+
+# Counts the lines read from a streaming device to find when each was sent
+class LineReader:
+    def __init__(self, ser, port):
+        self.ser = ser
+        self.port = port
+        self.count = 0
+        self.latency = None  # of the last line read
+
+    def readline(self):
+        line = self.ser.readline()
+        read = time.monotonic()
+        self.latency = None
+        if line:
+            sent = self.port.sentTime(self.count)
+            self.count += 1
+            if sent is not None:
+                self.latency = read - sent
+        return line
+
+
+def Record(record, reader):
+    if reader.latency is not None:
+        record(reader.latency)
+
+
+# LeakTestStatus.run
+def Leak(reader, deadline, record):
+    while time.monotonic() < deadline:
+        line = reader.readline()
+        if not line:
+            continue
+        chamber, ppm = line.decode().split()
+        int(chamber), float(ppm)
+        Record(record, reader)
+
+
+# HeatControl.hct_init / DataThread.run
+def Heater(reader, deadline, record):
+    if reader.count == 0:
+        while not reader.readline().strip():
+            reader.ser.write(b"\n")
+        reader.ser.write(b"b55\n")
+    while time.monotonic() < deadline:
+        tokens = reader.readline().decode().split()
+        if len(tokens) > 2 and tokens[1] in ("1:", "2:"):
+            float(tokens[-1])
+        Record(record, reader)
+
+
+# GetDataThread.run
+def StrawTensioner(reader, deadline, record):
+    while time.monotonic() < deadline:
+        fields = reader.readline().decode().strip().split(" ")
+        if len(fields) == 3 and fields[2] != "nan":
+            float(fields[1]), float(fields[2])
+        Record(record, reader)
+
+
+# WireTensionWindow.update_tension
+def WireTensioner(reader, deadline, record):
+    ser = reader.ser
+    ser.write(b"c\n")
+    ser.readline()
+    ser.write(b"t\n")
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        ser.write(b"\n")
+        fields = ser.readline().decode().split("\t")
+        float(fields[1])
+        record(time.monotonic() - start)
+
+
+# TensionBox.ping10, one ping per request
+def TensionBox(reader, deadline, record):
+    ser = reader.ser
+    samples = DEVICES["tensionbox"].samples
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+        ser.write(b"5\n1000\n")
+        ser.readline(), ser.readline()
+        counts = [int(ser.readline()) for _ in range(samples)]
+        [(x - 16383 if x >= 8192 else x + 1) * 1.22 for x in counts]
+        record(time.monotonic() - start)
+
+
+# Resistance.measure, one letter per request
+def Resistance(reader, deadline, record):
+    ser = reader.ser
+    if reader.count == 0:
+        reader.readline()  # banner
+        ser.write(b"y")
+    letters = DEVICES["resistance"].letters
+    i = 0
+    while time.monotonic() < deadline:
+        letter = letters[i % len(letters)]
+        i += 1
+        start = time.monotonic()
+        ser.write((letter + "r").encode())
+        fields = ser.readline().decode().strip().split(",")
+        [float(el) * 5 / 1023 for el in fields[1:]]
+        record(time.monotonic() - start)
+
+
+# device : (acquisition loop, baud rate the GUI opens the port at, streaming)
+LOOPS = {
+    "leak": (Leak, 115200, True),
+    "heater": (Heater, 2000000, True),
+    "strawtensioner": (StrawTensioner, 115200, True),
+    "wiretensioner": (WireTensioner, 9600, False),
+    "tensionbox": (TensionBox, 115200, False),
+    "resistance": (Resistance, 9600, False),
+}
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("devices", nargs="*", default=list(LOOPS), choices=LOOPS)
+    parser.add_argument("--duration", type=float, default=10.0, help="s per device")
+    parser.add_argument(
+        "--period", type=float, default=0.001, help="s, streaming device period"
+    )
+    parser.add_argument(
+        "--baudrate", type=int, help="pace the simulator like a real line"
+    )
+    return parser.parse_args()
+
+
+def Run(name, options):
+    loop, baudrate, streaming = LOOPS[name]
+    kwargs = {"period": options.period} if streaming else {}
+    model = DEVICES[name](seed=1, **kwargs)
+    latencies = collections.deque(maxlen=100000)
+    with VirtualPort(model, baudrate=options.baudrate) as port:
+        ser = serial.Serial(port=port.device, baudrate=baudrate, timeout=1)
+        tracemalloc.start()
+        start = time.monotonic()
+        # one second of warm up before taking the memory baseline
+        reader = LineReader(ser, port)
+        loop(reader, start + 1, lambda x: None)
+        baseline = tracemalloc.get_traced_memory()[0]
+        loop(reader, start + 1 + options.duration, latencies.append)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        ser.close()
+
+    latencies = sorted(latencies)
+    if not latencies:
+        print("%-15s no data" % name)
+        return
+    print(
+        "%-15s %9.1f %s/s  latency median %7.3f ms  p99 %7.3f ms  max %7.3f ms"
+        "  heap growth %7.1f kB  peak %7.1f kB"
+        % (
+            name,
+            len(latencies) / options.duration,
+            "lines" if streaming else "reqs",
+            1000 * statistics.median(latencies),
+            1000 * latencies[int(0.99 * (len(latencies) - 1))],
+            1000 * latencies[-1],
+            (current - baseline) / 1024,
+            peak / 1024,
+        )
+    )
+
+
+def Main():
+    options = GetOptions()
+    for name in options.devices:
+        Run(name, options)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print("max RSS %.1f MB" % (rss / 1024))
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,124 @@
+################################################################################
+# Statements, commits and wall time to save a pallet of straws
+#
+# Replays a prep station save against a scratch database, straw by straw the
+# way PrepGUI.saveDataToDB used to (Straw.Straw, addStraw, then a measurement
+# commit, per straw) and with the bulk API in one DM.transaction() (Straw.Straws,
+# addStraws, DM.insertEntries), for pallets of --sizes straws.
+#
+# An executemany counts as one statement.
+#
+# Usage:
+#   python -m benchmarks.straw_saves [--sizes 24 96] [--repeat 5]
+################################################################################
+import argparse
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event
+
+from benchmarks.query_plans import CreateTables
+from guis.common.db_classes.bases import DM
+from guis.common.db_classes.procedures_straw import Prep
+from guis.common.db_classes.straw import Straw
+from guis.common.db_classes.straw_location import StrawLocation
+from guis.common.migrations import migrate
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 96])
+    parser.add_argument("--repeat", type=int, default=5, help="pallets per size")
+    return parser.parse_args()
+
+
+# A new CPAL with n positions, made directly in SQL
+def MakePallet(n, number):
+    with DM._engine.begin() as con:
+        con.execute(
+            "INSERT INTO straw_location (id, location_type, number) "
+            "VALUES (?, 'CPAL', ?)",
+            number,
+            number,
+        )
+        con.execute(
+            "INSERT INTO straw_position (id, location, position_number) "
+            "VALUES (?, ?, ?)",
+            [(number * 1000 + i, number, 2 * i) for i in range(n)],
+        )
+    return StrawLocation.queryWithId(number)
+
+
+def SaveEach(procedure, cpal, straw_ids):
+    for position, straw_id in enumerate(straw_ids):
+        straw = Straw.Straw(id=straw_id, batch="BATCH")
+        cpal.addStraw(straw, 2 * position)
+        Prep.StrawPrepMeasurement(
+            procedure=procedure,
+            straw_id=straw_id,
+            paper_pull_grade="A",
+            evaluation=None,
+        ).commit()
+
+
+def SaveBulk(procedure, cpal, straw_ids):
+    with DM.transaction():
+        straws = Straw.Straws({straw_id: "BATCH" for straw_id in straw_ids})
+        cpal.addStraws(
+            {2 * position: straws[id] for position, id in enumerate(straw_ids)}
+        )
+        DM.insertEntries(
+            [
+                Prep.StrawPrepMeasurement(
+                    procedure=procedure,
+                    straw_id=straw_id,
+                    paper_pull_grade="A",
+                    evaluation=None,
+                )
+                for straw_id in straw_ids
+            ]
+        )
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "straws.db"
+        CreateTables(create_engine(f"sqlite:///{path}"))
+        migrate(path)
+        DM.setLocalDatabasePath(path)
+
+        statements = [0]
+        event.listen(
+            DM._engine,
+            "before_cursor_execute",
+            lambda *args: statements.__setitem__(0, statements[0] + 1),
+        )
+        procedure = SimpleNamespace(id=1)
+        pallet = 0
+        for n in options.sizes:
+            for name, save in (("per straw", SaveEach), ("bulk", SaveBulk)):
+                elapsed, count, commits = 0, 0, 0
+                for _ in range(options.repeat):
+                    pallet += 1
+                    cpal = MakePallet(n, pallet)
+                    straw_ids = range(pallet * 1000, pallet * 1000 + n)
+                    statements[0], start_commits = 0, DM.commits
+                    start = perf_counter()
+                    save(procedure, cpal, straw_ids)
+                    elapsed += perf_counter() - start
+                    count += statements[0]
+                    commits += DM.commits - start_commits
+                    assert len(cpal.getFilledPositions()) == n
+                print(
+                    f"{n:3d} straws, {name:>9}: "
+                    f"{count / options.repeat:6.0f} statements, "
+                    f"{commits / options.repeat:4.0f} commits, "
+                    f"{1e3 * elapsed / options.repeat:8.1f} ms per pallet"
+                )
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,85 @@
+################################################################################
+# Commits and wall time per autosave, with and without DM.transaction()
+#
+# A panel-process autosave (SQLDataProcessor.saveData) calls a few dozen
+# record* setters, and each setter commits. This replays that pattern against
+# a scratch database: every "setter" sets one column on a details row and
+# calls commitEntry, exactly like Procedure.commit().
+#
+# Usage:
+#   python -m benchmarks.transactions [--setters 30] [--saves 20]
+################################################################################
+import argparse
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+from guis.common.databaseManager import DatabaseManager
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--setters", type=int, default=30, help="record* calls per autosave"
+    )
+    parser.add_argument("--saves", type=int, default=20, help="autosaves to time")
+    return parser.parse_args()
+
+
+def MakeDetailsClass(n_columns):
+    base = declarative_base()
+    columns = {f"c{i}": Column(Integer) for i in range(n_columns)}
+    details = type(
+        "Details",
+        (base,),
+        dict(
+            __tablename__="procedure_details_bench",
+            id=Column(Integer, primary_key=True),
+            **columns,
+        ),
+    )
+    return base, details
+
+
+def Autosave(dm, details, n_setters, value):
+    for i in range(n_setters):
+        setattr(details, f"c{i}", value)
+        dm.commitEntry(details)
+
+
+def Run(dm, details, options, grouped):
+    commits = dm.commits
+    start = perf_counter()
+    for save in range(options.saves):
+        if grouped:
+            with dm.transaction():
+                Autosave(dm, details, options.setters, save)
+        else:
+            Autosave(dm, details, options.setters, save)
+    dt = perf_counter() - start
+    return (dm.commits - commits) / options.saves, dt / options.saves
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        dm = DatabaseManager(local_db=Path(tmp) / "bench.db", merge=False)
+        base, Details = MakeDetailsClass(options.setters)
+        base.metadata.create_all(dm._engine)
+        details = Details(id=1)
+        dm.commitEntry(details)
+
+        for label, grouped in [("per-setter commits", False), ("transaction", True)]:
+            commits, seconds = Run(dm, details, options, grouped)
+            print(
+                f"{label:>20}: {commits:5.1f} commits/autosave, "
+                f"{seconds * 1e3:8.2f} ms/autosave"
+            )
+        dm._engine.dispose()
+
+
+if __name__ == "__main__":
+    Main()
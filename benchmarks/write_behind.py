@@ -0,0 +1,117 @@
+################################################################################
+# Time the caller spends in commitEntry, synchronous vs write-behind
+#
+# Replays a stream of small commits (one details row updated, one new record
+# row per save, like a panel step being recorded) against a scratch database
+# while another connection holds the write lock for --hold s every --every s,
+# the way the AutoMerger or a second station does.
+#
+# Reports the worst and mean time a commit call blocked the calling (GUI)
+# thread and, for write-behind, the writer's queue depth and commit latency.
+#
+# Usage:
+#   python -m benchmarks.write_behind [--saves 200] [--interval 0.02]
+#                                     [--hold 1.0] [--every 2.0]
+################################################################################
+import argparse
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+from time import perf_counter, sleep
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+from guis.common.databaseManager import DatabaseManager
+
+BASE = declarative_base()
+
+
+class Details(BASE):
+    __tablename__ = "details_bench"
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer)
+
+
+class Record(BASE):
+    __tablename__ = "record_bench"
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer)
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--saves", type=int, default=200, help="commits to time")
+    parser.add_argument("--interval", type=float, default=0.02, help="s between")
+    parser.add_argument("--hold", type=float, default=1.0, help="s lock is held")
+    parser.add_argument("--every", type=float, default=2.0, help="s between locks")
+    return parser.parse_args()
+
+
+# Another process holding the database's write lock now and then
+def HoldLock(path, options, stop):
+    con = sqlite3.connect(str(path), timeout=30)
+    while not stop.wait(options.every):
+        con.execute("begin exclusive")
+        sleep(options.hold)
+        con.rollback()
+    con.close()
+
+
+def Run(path, options, write_behind):
+    dm = DatabaseManager(local_db=path)
+    details = dm.query(Details).get(1)
+    if write_behind:
+        dm.startWriteBehind()
+
+    stop = threading.Event()
+    locker = threading.Thread(target=HoldLock, args=(path, options, stop))
+    locker.start()
+    blocked, depth = [], 0
+    for save in range(options.saves):
+        start = perf_counter()
+        details.value = save
+        dm.commitEntry(details)
+        dm.commitEntry(Record(value=save))
+        blocked.append(perf_counter() - start)
+        if write_behind:
+            depth = max(depth, dm.writeStats()["pending"])
+        sleep(options.interval)
+    stop.set()
+    locker.join()
+
+    start = perf_counter()
+    dm.sync()
+    print(
+        f"{'write-behind' if write_behind else 'synchronous':>12}: "
+        f"commit call mean {1e3 * sum(blocked) / len(blocked):8.2f} ms, "
+        f"max {1e3 * max(blocked):8.2f} ms"
+    )
+    if write_behind:
+        stats = dm.writeStats()
+        print(
+            f"{'':>12}  writes pending max {depth}, {stats['batches']} batches, "
+            f"latency mean {1e3 * stats['latency_mean']:8.2f} ms, "
+            f"max {1e3 * stats['latency_max']:8.2f} ms, "
+            f"final sync {1e3 * (perf_counter() - start):.2f} ms"
+        )
+        dm.stopWriteBehind()
+    dm._engine.dispose()
+
+
+def Main():
+    options = GetOptions()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        dm = DatabaseManager(local_db=path)
+        BASE.metadata.create_all(dm._engine)
+        dm.commitEntry(Details(id=1, value=0))
+        dm._engine.dispose()
+
+        for write_behind in (False, True):
+            Run(path, options, write_behind)
+
+
+if __name__ == "__main__":
+    Main()
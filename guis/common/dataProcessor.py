@@ -1661,17 +1661,19 @@ class SQLDataProcessor(DataProcessor):
         if not self.ensureProcedure():
             return
 
-        # Save Pro-Specific data
-        {
-            1: self.saveDataProcess1,
-            2: self.saveDataProcess2,
-            3: self.saveDataProcess3,
-            4: self.saveDataProcess4,
-            5: self.saveDataProcess5,
-            6: self.saveDataProcess6,
-            7: self.saveDataProcess7,
-            8: self.saveDataProcess8,
-        }[self.getPro()]()
+        # Save Pro-Specific data. The record* setters each commit, so group
+        # them into a single transaction: one commit per save.
+        with DM.transaction():
+            {
+                1: self.saveDataProcess1,
+                2: self.saveDataProcess2,
+                3: self.saveDataProcess3,
+                4: self.saveDataProcess4,
+                5: self.saveDataProcess5,
+                6: self.saveDataProcess6,
+                7: self.saveDataProcess7,
+                8: self.saveDataProcess8,
+            }[self.getPro()]()
 
     # IR
     def saveDataProcess1(self):
@@ -2024,11 +2026,10 @@ class SQLDataProcessor(DataProcessor):
     def saveTPS(self, tps, item, state):
 
         # Query supply
+        supplies = [s.id for s in Supplies.cachedAll(name=item, type=tps)]
         supply = (
             SupplyChecked.query()
-            .join(Supplies, Supplies.id == SupplyChecked.supply)
-            .filter(Supplies.name == item)
-            .filter(Supplies.type == tps)
+            .filter(SupplyChecked.supply.in_(supplies))
             .filter(SupplyChecked.session == self.session.id)
             .one_or_none()
         )
@@ -2043,13 +2044,10 @@ class SQLDataProcessor(DataProcessor):
 
     def saveMoldRelease(self, item, state):
 
+        items = [i.id for i in MoldReleaseItems.cachedAll(name=item)]
         mri = (
             MoldReleaseItemsChecked.query()
-            .join(
-                MoldReleaseItems,
-                MoldReleaseItems.id == MoldReleaseItemsChecked.mold_release_item,
-            )
-            .filter(MoldReleaseItems.name == item)
+            .filter(MoldReleaseItemsChecked.mold_release_item.in_(items))
             .filter(MoldReleaseItemsChecked.session == self.session.id)
             .one_or_none()
         )
@@ -2073,12 +2071,7 @@ class SQLDataProcessor(DataProcessor):
             return
 
         # Query Step
-        step = (
-            PanelStep.query()
-            .filter(PanelStep.name == step_name)
-            .filter(PanelStep.station == self.station.id)
-            .one_or_none()
-        )
+        step = PanelStep.cached(name=step_name, station=self.station.id)
 
         # Execute step
         self.procedure.executeStep(step)
@@ -4,14 +4,18 @@
 #   DatabaseManager class establishes connection with SQL database to commit entries and run queries.
 #
 
+from contextlib import contextmanager
 from sqlalchemy.orm import sessionmaker as dbconnection
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 
-import logging
+import logging, sqlite3, threading
 
 logger = logging.getLogger("root")
 
 from guis.common.merger import AutoMerger
+from guis.common.getresources import GetNetworkDatabasePath
+from guis.common.writebehind import WriteBehind
+from guis.common.migrations import addFallbackViews, migrate
 
 # Load resources manager
 try:
@@ -19,39 +23,73 @@ try:
 except ImportError:
     # Try backported to PY<37 `importlib_resources`.
     import importlib_resources as pkg_resources
-import data, resources
+import data
 
 
 class DatabaseManager:
-    def __init__(self, local_db=None, merge=True):
-
-        ## Local Database File information
-        self._local_db = self._loadLocalDatabasePath() if local_db is None else local_db
-        logger.info("Reading and writing from database %s" % self._local_db)
-
-        ## Connect to Local SQL database
-        self._Connection = dbconnection()
-        self._engine = create_engine(
-            f"sqlite:///{self._local_db}",
-            pool_pre_ping=True,
-            connect_args={"timeout": 30},
-        )
-        self._Connection.configure(bind=self._engine)
-        self._init_connection()
-
-        ## Start Merger of Local DB with Network/Destination DB
+    # Nothing is opened here, so making one (e.g. on import of db_classes) is
+    # free: the engine and session are created on first use, and the merger
+    # only runs once startMerger() is called.
+    def __init__(self, local_db=None, merge=False):
+
+        ## Local Database File information, filled in on first use
+        self.__local_db = local_db
+        self.__engine = None
+        self.__session = None
+        self.__lock = threading.Lock()
+        self.__fallback_views = []  # see _onConnect
+
+        ## Unit of work state, per thread, see transaction()
+        self.__local = threading.local()
+        self.commits = 0  # number of commits made to the local database
+
+        ## Write-behind writer, see startWriteBehind()
+        self.__writer = None
+        self.__writer_engine = None
+
+        ## Merger of Local DB with Network/Destination DB, see startMerger()
+        self.__merger = None
+        self.__change_capture = None
+
         if merge:
-            self.__merger = AutoMerger(
-                src_db=self._local_db,
-                dst_db=self._loadNetworkDatabasePath(),
-                name="AutoMerger",
-                daemon=True,
-                merge_frequency=600,
-            )
-            self.__merger.start()
+            self.startMerger()
+
+    ### MERGER ###
+    # Scripts that only read or write the local DB never start the merger.
+    # Data-taking GUIs opt in with DM.startMerger() when they start up.
+    def startMerger(self):
+        merger = self._merger()
+        if not merger.is_alive():
+            merger.start()
+
+    def mergerRunning(self):
+        return self.__merger is not None and self.__merger.is_alive()
 
+    # Merge now, whether or not the merger is running
     def merge(self):
-        self.__merger.main()
+        self._merger().main()
+
+    # Merge only the rows recorded by change-capture triggers on the given
+    # tables. See Merger.enableChangeCapture.
+    def enableChangeCapture(self, tables):
+        with self.__lock:
+            self.__change_capture = tables
+            if self.__merger is not None:
+                self.__merger.enableChangeCapture(tables)
+
+    def _merger(self):
+        with self.__lock:
+            if self.__merger is None:
+                self.__merger = AutoMerger(
+                    src_db=self.getLocalDatabasePath(),
+                    dst_db=self._loadNetworkDatabasePath(),
+                    name="AutoMerger",
+                    daemon=True,
+                    merge_frequency=600,
+                )
+                if self.__change_capture is not None:
+                    self.__merger.enableChangeCapture(self.__change_capture)
+            return self.__merger
 
     # The local DB shalt always be located in data/database.db
     def _loadLocalDatabasePath(self):
@@ -61,29 +99,237 @@ class DatabaseManager:
     # The merge-destination DB is set in resources/networkDatabasePath.txt,
     # which is created by setup.py
     def _loadNetworkDatabasePath(self):
-        return pkg_resources.read_text(resources, "networkDatabasePath.txt")
+        return GetNetworkDatabasePath()
 
     def getLocalDatabasePath(self):
-        return self._local_db
+        if self.__local_db is None:
+            self.__local_db = self._loadLocalDatabasePath()
+        return self.__local_db
 
-    def _init_connection(self):
-        self._connection = self._Connection()
+    # Use another database file, e.g. a scratch copy. Only before connecting.
+    def setLocalDatabasePath(self, local_db):
+        with self.__lock:
+            if self.__session is not None:
+                raise RuntimeError("Already connected to %s" % self.__local_db)
+            self.__local_db = local_db
+
+    ### CONNECTION ###
+    # Bring the local SQL database up to date (see migrations.py) and connect
+    # to it, on first use. Derived tables the migration couldn't add are
+    # stood in for by views on every connection, until a later migration adds
+    # them.
+    def _connect(self):
+        with self.__lock:
+            if self.__session is not None:
+                return
+            local_db = self.getLocalDatabasePath()
+            logger.info("Reading and writing from database %s" % local_db)
+            try:
+                migrate(local_db)
+            except sqlite3.Error as e:
+                logger.error("Could not migrate %s: %s" % (local_db, e))
+            self._Connection = dbconnection()
+            self.__engine = create_engine(
+                f"sqlite:///{local_db}",
+                pool_pre_ping=True,
+                connect_args={"timeout": 30},
+            )
+            event.listen(self.__engine, "connect", self._onConnect)
+            self._Connection.configure(bind=self.__engine)
+            self.__session = self._Connection()
+
+    def _onConnect(self, dbapi_connection, connection_record):
+        views = addFallbackViews(dbapi_connection)
+        if views and not self.__fallback_views:
+            logger.warning(
+                "Database not fully migrated, querying %s from its source tables"
+                % ", ".join(views)
+            )
+        self.__fallback_views = views
+
+    @property
+    def _engine(self):
+        if self.__engine is None:
+            self._connect()
+        return self.__engine
+
+    @property
+    def _connection(self):
+        if self.__session is None:
+            self._connect()
+        return self.__session
+
+    def connected(self):
+        return self.__session is not None
 
     ### QUERY METHOD ###
     def query(self, *mapped_class):
         return self._connection.query(*mapped_class)
 
+    # Take loaded entries out of the session. They keep the values they were
+    # loaded with: commits no longer expire (and reload) them.
+    def detach(self, entries):
+        for entry in entries:
+            if entry in self._connection:
+                self._connection.expunge(entry)
+
     ### COMMIT ENTRY METHODS ###
+    # Inside a transaction() block these only stage the entries; they are
+    # committed when the outermost block exits.
+    # In write-behind mode they queue the entries and return a PendingWrite.
     def commitEntry(self, entry):
-        self._connection.add(entry)
-        self._connection.commit()
-        return True
+        return self.commitEntries([entry])
 
     def commitEntries(self, entries):
+        if self.__writer is not None:
+            self._unitOfWork().staged.extend(entries)
+            return self._commit()
         self._connection.add_all(entries)
-        self._connection.commit()
+        self._commit()
         return True
 
+    # Insert new rows with one executemany per table instead of one INSERT
+    # per row. Unlike commitEntries, the entries are not added to the session
+    # and don't get autoincrement ids back; for rows that aren't read back
+    # or changed afterwards, e.g. measurements.
+    def insertEntries(self, entries):
+        if self.__writer is not None:
+            return self.commitEntries(entries)
+        self._connection.bulk_save_objects(entries)
+        self._commit()
+        return True
+
+    def _commit(self):
+        if self._transaction_depth:
+            return True
+        if self.__writer is not None:
+            uow = self._unitOfWork()
+            staged, uow.staged = uow.staged, []
+            self.commits += 1
+            return self.__writer.submit(self._connection, staged)
+        self._connection.commit()
+        self.commits += 1
+
+    ### WRITE-BEHIND ###
+    # Commits go to a writer thread instead of blocking the caller on the
+    # SQLite lock. See guis/common/writebehind.py for what changes for the
+    # GUI session while a write is queued.
+    def startWriteBehind(self):
+        if self._transaction_depth:
+            raise RuntimeError("Can't start write-behind inside a transaction")
+        if self.__writer is None:
+            self._connect()
+            # rows queued for the writer stay dirty; only it may write them
+            self._connection.autoflush = False
+            # The writer retries a locked database itself (for up to its
+            # lock_timeout), so its connections only wait a second on SQLite
+            self.__writer_engine = create_engine(
+                f"sqlite:///{self.getLocalDatabasePath()}",
+                connect_args={"timeout": 1},
+            )
+            self.__writer = WriteBehind(dbconnection(bind=self.__writer_engine))
+            self.__writer.start()
+
+    # Commit whatever is queued, then go back to committing synchronously
+    def stopWriteBehind(self):
+        if self._transaction_depth:
+            raise RuntimeError("Can't stop write-behind inside a transaction")
+        if self.__writer is not None:
+            try:
+                self.sync()
+            finally:
+                self.__writer.stop()
+                self.__writer.reattach(self._connection)
+                self.__writer = None
+                self.__writer_engine.dispose()
+                self.__writer_engine = None
+                self._connection.autoflush = True
+
+    def writeBehind(self):
+        return self.__writer is not None
+
+    # Wait until every write queued so far is committed (no-op when not in
+    # write-behind mode), and put the new rows back in this session. Raises
+    # the error of a write that failed since the last sync(); its rows are
+    # left uncommitted, to be committed again.
+    def sync(self, timeout=None):
+        if self.__writer is None:
+            return
+        self.__writer.sync(timeout)
+        self.__writer.reattach(self._connection)
+        errors = self.__writer.errors()
+        if errors:
+            raise errors[0]
+
+    # Queue depth, writes and commit latency of the write-behind writer
+    def writeStats(self):
+        return None if self.__writer is None else self.__writer.stats()
+
+    ### UNIT OF WORK ###
+    """
+    transaction
+        Context manager grouping every commitEntry/commitEntries made inside
+        it, e.g. by the ORM classes' commit(), into one database transaction.
+        Queries inside the block still see the staged entries (the session
+        autoflushes). Blocks may be nested; only the outermost one commits.
+        If the outermost block raises, all staged changes are rolled back. A
+        nested block runs in a SAVEPOINT: if it raises, only its changes are
+        rolled back, and the outer block may catch the exception and go on.
+        In write-behind mode the staged entries are queued as one write on
+        exit, and queries inside the block don't see them; a nested block
+        that raises drops the entries it staged.
+
+        Blocks are per thread: a block open on one thread doesn't defer
+        another thread's commits. The session is still shared, though, so
+        another thread's commit also commits what this block has flushed.
+
+        Example:
+            with DM.transaction():
+                procedure.recordLeftGap(5)
+                procedure.recordRightGap(7)  # one commit, on exit
+    """
+
+    @contextmanager
+    def transaction(self):
+        uow = self._unitOfWork()
+        staged = len(uow.staged)
+        savepoint = None
+        if uow.depth and self.__writer is None:
+            savepoint = self._connection.begin_nested()
+        uow.depth += 1
+        try:
+            yield self
+        except BaseException:
+            uow.depth -= 1
+            if not uow.depth:
+                uow.staged = []
+                self._connection.rollback()
+            else:
+                del uow.staged[staged:]
+                if savepoint is not None:
+                    savepoint.rollback()
+            raise
+        uow.depth -= 1
+        if savepoint is not None:
+            savepoint.commit()
+        if uow.staged or self.__writer is None:
+            self._commit()
+
+    def inTransaction(self):
+        return bool(self._transaction_depth)
+
+    @property
+    def _transaction_depth(self):
+        return self._unitOfWork().depth
+
+    # The calling thread's transaction() state
+    def _unitOfWork(self):
+        uow = self.__local
+        if not hasattr(uow, "depth"):
+            uow.depth = 0  # transaction() blocks open
+            uow.staged = []  # entries for the writer's next PendingWrite
+        return uow
+
 
 if __name__ == "__main__":
-    DatabaseManager()
+    DatabaseManager(merge=True)
@@ -35,17 +35,26 @@ from datetime import datetime
 from sys import modules, exit
 from inspect import isclass, getmembers
 from datetime import datetime
-from time import time
+from time import time, monotonic
 
-import logging
+import logging, threading
 
 logger = logging.getLogger("root")
 
 # GLOBAL VARIABLES #
+# Connects on first query or commit; call DM.startMerger() to merge into the
+# network DB.
 DM = DatabaseManager()
 BASE = declarative_base()
 
 
+# Opt in to change capture: every table declared on BASE gets triggers that
+# record changed rows, and AutoMerger uploads exactly those rows. The table
+# list is re-read on every merge, so tables declared later are included.
+def enableChangeCapture():
+    DM.enableChangeCapture(lambda: list(BASE.metadata.tables))
+
+
 class AutoCommit:
     def commit(self):
         return DM.commitEntry(self)
@@ -134,6 +143,82 @@ class Query:
         return DM.query(func.count(cls.id))
 
 
+"""
+Reference
+(mixin)
+
+    Read-through cache for tables that hold reference data (stations, steps,
+    supplies, part types, ...). These are set up ahead of time and don't
+    change while a GUI runs, but they are looked up on every step, supply
+    check and login.
+
+    Rows are cached per class and natural key, e.g. Station.cached(id="pan3")
+    or PanelStep.cached(station="pan3", name="pan3_step_1"), and are loaded
+    with one query the first time a key is asked for (a miss is cached too).
+    Cached rows are detached from the session and shared by every caller:
+    read them, don't change them.
+
+    A class's reference_ttl is how long (s) a cached row is trusted; None
+    keeps it until invalidated. Code that changes a reference table
+    invalidates it: cls.invalidate(**key), or invalidateReferences() for all.
+"""
+
+_references = {}  # (class, key names) : {key values : (loaded, rows)}
+_references_lock = threading.Lock()
+
+
+class Reference:
+    reference_ttl = None
+
+    # One row or None, like Query.one_or_none()
+    @classmethod
+    def cached(cls, **key):
+        rows = cls.cachedAll(**key)
+        if len(rows) > 1:
+            raise orm.exc.MultipleResultsFound(
+                "%d %s rows for %s" % (len(rows), cls.__name__, key)
+            )
+        return rows[0] if rows else None
+
+    # tuple of every row matching the key
+    @classmethod
+    def cachedAll(cls, **key):
+        names = tuple(sorted(key))
+        values = tuple(key[name] for name in names)
+        with _references_lock:
+            entry = _references.get((cls, names), {}).get(values)
+        if entry is not None:
+            loaded, rows = entry
+            if cls.reference_ttl is None or monotonic() - loaded < cls.reference_ttl:
+                return rows
+        rows = tuple(cls.query().filter_by(**key).all())
+        DM.detach(rows)
+        with _references_lock:
+            _references.setdefault((cls, names), {})[values] = (monotonic(), rows)
+        return rows
+
+    # Drop the cached rows of this table that were looked up with the given
+    # key values (all of them if none are given)
+    @classmethod
+    def invalidate(cls, **key):
+        with _references_lock:
+            for (c, names), entries in _references.items():
+                if c.__table__ is not cls.__table__:
+                    continue
+                for values in list(entries):
+                    if all(
+                        values[names.index(k)] == v
+                        for k, v in key.items()
+                        if k in names
+                    ):
+                        del entries[values]
+
+
+def invalidateReferences():
+    with _references_lock:
+        _references.clear()
+
+
 ID_INCREMENT = 100
 
 
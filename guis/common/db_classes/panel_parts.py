@@ -1,4 +1,4 @@
-from guis.common.db_classes.bases import BASE, OBJECT, Barcode
+from guis.common.db_classes.bases import BASE, OBJECT, Barcode, Reference
 from sqlalchemy import (
     Column,
     Integer,
@@ -32,7 +32,7 @@ class PanelPart(BASE, OBJECT):
         self.letter = letter
 
     def getPartType(self):
-        return PanelPartType.queryWithId(id=self.type)
+        return PanelPartType.cached(id=self.type)
 
     def barcode(self):
         return self.getPartType().barcode(self.number)
@@ -50,7 +50,7 @@ class PanelPart(BASE, OBJECT):
         return qry
 
 
-class PanelPartType(BASE, OBJECT):
+class PanelPartType(BASE, OBJECT, Reference):
     __tablename__ = "panel_part_type"
     id = Column(VARCHAR, primary_key=True)
     barcode_prefix = Column(VARCHAR)
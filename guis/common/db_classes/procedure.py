@@ -41,7 +41,7 @@ from sqlalchemy import (
     TEXT,
     func,
 )
-from sqlalchemy import orm
+from sqlalchemy import orm, inspect
 from datetime import datetime
 from time import time
 from guis.common.db_classes.straw_location import StrawLocation
@@ -62,7 +62,8 @@ class Procedure(BASE, OBJECT):
 
     # Instance Variables
     new = False
-    details = None
+    _details = None  # see details
+    _details_classes = {}  # Procedure subclass : its details class (or None)
 
     def __repr__(self):
         return f"<{self.__class__.__name__}(station={self.station}, straw_location={self.straw_location})>"
@@ -187,23 +188,19 @@ class Procedure(BASE, OBJECT):
             production_stage is not None and production_step is not None
         ), "Unable to query Station. You must provide a station ID or both the production_stage and production_step of the desired station."
 
-        if station:
-            qry = Station.queryWithId(station)
-
         if production_stage and production_step:
-            qry = Station.query().filter(
-                and_(
-                    Station.production_stage == production_stage,
-                    Station.production_step == production_step,
-                )
+            return Station.cached(
+                production_stage=production_stage, production_step=production_step
             )
 
-        return qry.one_or_none()
+        return Station.cached(id=station)
 
+    # Loading a procedure only reads it: the details row is looked up (or
+    # made) the first time it's asked for, and nothing is written until
+    # commit() is called with something changed.
     @orm.reconstructor
     def init_on_load(self):
-        self._init_details()
-        self.commit()
+        self._details = None
 
     ## PROPERTIES ##
 
@@ -229,7 +226,7 @@ class Procedure(BASE, OBJECT):
     def getStation(self):
         from guis.common.db_classes.station import Station
 
-        return Station.queryWithId(self.station)
+        return Station.cached(id=self.station)
 
     # Elapsed Time
     def setElapsedTime(self, seconds):
@@ -267,22 +264,39 @@ class Procedure(BASE, OBJECT):
 
     ## DETAILS CLASS ##
 
+    # This procedure's row in its details table, or None if the station has
+    # no details table. A procedure without a row gets a new one, which is
+    # written with the procedure's next commit().
+    @property
+    def details(self):
+        if self._details is None:
+            self._init_details()
+        return self._details
+
+    @details.setter
+    def details(self, details):
+        self._details = details
+
     def _init_details(self):
-        try:
-            dc = self._getDetailsClass()
-        except Exception:
-            dc = None
+        dc = self._detailsClass()
         if dc is None:
             return
         # Query a details class having this procedure as its procedure.
-        qry = dc.query().filter(dc.procedure == self.id)
-        # Check if one exists
-        if Query.exists(qry):
-            # If one exists, set it to be this procedure's 'self.details'
-            self.details = qry.one_or_none()
-        else:
+        self._details = dc.query().filter(dc.procedure == self.id).one_or_none()
+        if self._details is None:
             # Otherwise, construct a new one
-            self.details = dc(procedure=self.id)
+            self._details = dc(procedure=self.id)
+
+    # _getDetailsClass() declares a table, which can only be done once per
+    # process, so its result is kept for the class.
+    def _detailsClass(self):
+        cls = type(self)
+        if cls not in Procedure._details_classes:
+            try:
+                Procedure._details_classes[cls] = self._getDetailsClass()
+            except Exception:
+                Procedure._details_classes[cls] = None
+        return Procedure._details_classes[cls]
 
     def _getDetailsClass(self):
         # TODO: If additional procedure data is recorded at this station,
@@ -293,15 +307,30 @@ class Procedure(BASE, OBJECT):
         return self.new
 
     # OVERRIDING
+    # Record current status to database: this procedure and its details, if
+    # they're new or have changed. A procedure that has only been read
+    # doesn't start a write.
     def commit(self):
-        # Record current status to database
         entries = []
-        entries.append(self)
-        # Include details if they exist
-        if self.details:
-            entries.append(self.details)
-        # Commit to database
-        DM.commitEntries(entries)
+        if self._changed(self):
+            entries.append(self)
+        # a new details row is written once something is recorded in it
+        if self._details is not None and self._changed(
+            self._details, ignore=("procedure",)
+        ):
+            entries.append(self._details)
+        if not entries:
+            return True
+        return DM.commitEntries(entries)
+
+    @staticmethod
+    def _changed(entry, ignore=()):
+        state = inspect(entry)
+        if state.pending:
+            return True
+        return any(
+            attr.history.has_changes() for attr in state.attrs if attr.key not in ignore
+        )
 
     ## COMMENTS ##
 
@@ -113,7 +113,6 @@ class Resistance(StrawProcedure):
             self.outside_outside_resistance = oo_resistance
             self.outside_outside_method = oo_method
             self.evaluation = evaluation
-            self.commit()
 
         def __repr__(self):
             return (
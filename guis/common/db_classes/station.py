@@ -24,7 +24,7 @@
 # = process and the station = spot in a room terminologies) a Station instance
 # can start Sessions and knows about active Sessions.
 ################################################################################
-from guis.common.db_classes.bases import BASE, OBJECT, DM, logger
+from guis.common.db_classes.bases import BASE, OBJECT, DM, Reference, logger
 from sqlalchemy import (
     Column,
     Integer,
@@ -42,7 +42,7 @@ from sqlalchemy import (
 )
 
 
-class Station(BASE, OBJECT):
+class Station(BASE, OBJECT, Reference):
     __tablename__ = "station"
     id = Column(CHAR(4), primary_key=True)  # "pan3", "prep"
     name = Column(VARCHAR(30))  # "Panel Day 3", "Paper Pull"
@@ -67,12 +67,9 @@ class Station(BASE, OBJECT):
     # PanelStation or StrawStation object respectively.
     @staticmethod
     def get_station(stage, step):
-        query = None
         try:
-            query = {"panel": PanelStation.query(), "straws": StrawStation.query()}[
-                stage
-            ]
-            return query.filter(Station.production_step == step).one_or_none()
+            cls = {"panel": PanelStation, "straws": StrawStation}[stage]
+            return cls.cached(production_step=step)
         except KeyError:
             logger.error(
                 "Invalid stage in Station query. Valid stages are 'panel' and 'straws'."
@@ -92,9 +89,9 @@ class Station(BASE, OBJECT):
         return Session.query().filter(Session.active == True).all()
 
     def queryMoldReleaseItems(self):
-        return (
-            MoldReleaseItems.query().filter(MoldReleaseItems.station == self.id).all()
-        )
+        from guis.common.db_classes.supplies import MoldReleaseItems
+
+        return list(MoldReleaseItems.cachedAll(station=self.id))
 
 
 class PanelStation(Station):
@@ -104,13 +101,8 @@ class PanelStation(Station):
         from guis.common.db_classes.steps import PanelStep
 
         # Get step 1
-        s1 = (
-            DM.query(PanelStep)
-            .filter(PanelStep.current == True)
-            .filter(PanelStep.station == self.id)
-            .filter(PanelStep.previous == None)
-            .filter(PanelStep.parent_step == None)
-            .one_or_none()
+        s1 = PanelStep.cached(
+            current=True, station=self.id, previous=None, parent_step=None
         )
         # Generate steps list from step 1
         return PanelStep.stepsList(root_step=s1)
@@ -1,4 +1,4 @@
-from guis.common.db_classes.bases import BASE, OBJECT
+from guis.common.db_classes.bases import BASE, OBJECT, Reference
 from sqlalchemy import (
     Column,
     Integer,
@@ -16,7 +16,7 @@ from sqlalchemy import (
 )
 
 
-class PanelStep(BASE, OBJECT):
+class PanelStep(BASE, OBJECT, Reference):
     __tablename__ = "panel_step"
     id = Column(Integer, primary_key=True)
     station = Column(Integer, ForeignKey("station.id"))
@@ -35,23 +35,18 @@ class PanelStep(BASE, OBJECT):
     def substeps(self):
         # Query first substep
 
-        first_sub_step = (
-            self.querySubSteps()
-            .filter(PanelStep.parent_step == self.id)
-            .filter(PanelStep.previous == None)
-            .one_or_none()
-        )
+        first_sub_step = PanelStep.cached(parent_step=self.id, previous=None)
         # Append steps to list in order until there are no more.
         sub_steps = self.stepsList(first_sub_step)
         return sub_steps
 
     def nextStep(self):
         # Query the step who's id is 'self.next'
-        return PanelStep.queryWithId(self.next)
+        return PanelStep.cached(id=self.next)
 
     def previousStep(self):
         # Query the step who's id is 'self.previous'
-        return PanelStep.queryWithId(self.previous)
+        return PanelStep.cached(id=self.previous)
 
     """
     querySubSteps
@@ -26,14 +26,15 @@ class Straw(BASE, OBJECT):
     batch = Column(VARCHAR)
     parent = Column(Integer, ForeignKey("straw.id"))
 
-    def __init__(self, id, batch=None, parent=None, create_key=None):
+    def __init__(self, id, batch=None, parent=None, create_key=None, commit=True):
         # Check for authorization with 'create_key'
         assert create_key == Straw.__create_key, "You can only make a Straw internally."
 
         self.id = id
         self.batch = batch
         self.parent = parent
-        self.commit()
+        if commit:
+            self.commit()
 
     @classmethod
     def Straw(cls, id, batch=None):
@@ -48,6 +49,37 @@ class Straw(BASE, OBJECT):
         # Return straw
         return s
 
+    """
+    Straws(cls, batches)
+
+        Description:    Bulk Straw.Straw: gets or creates many straws with one
+                        query for the existing ones and one commit (staged, in
+                        a DM.transaction()) for the new ones.
+
+        Input:          (dict)  {straw id : batch}; the batch is only used for
+                                new straws
+
+        Return:         (dict)  {straw id : Straw}
+    """
+
+    @classmethod
+    def Straws(cls, batches):
+        ids = list(batches)
+        straws = {}
+        # SQLite limits the number of parameters in a query
+        for i in range(0, len(ids), 500):
+            for straw in cls.query().filter(cls.id.in_(ids[i : i + 500])):
+                straws[straw.id] = straw
+        new = [
+            Straw(id, batches[id], None, cls.__create_key, commit=False)
+            for id in ids
+            if id not in straws
+        ]
+        if new:
+            DM.commitEntries(new)
+        straws.update((straw.id, straw) for straw in new)
+        return straws
+
     @classmethod
     def exists(cls, straw_id):
         return DM.query(Straw).filter(Straw.id == straw_id).one_or_none()
@@ -136,11 +168,29 @@ class Straw(BASE, OBJECT):
     def locate(self):
         return (
             DM.query(sl.StrawPosition)  # Get all the straw positions
-            # .join(sl.StrawPosition, sl.StrawPosition.location == sl.StrawLocation.id) # where straw positions have an entry in the straw location
             .join(
-                sl.StrawPresent, sl.StrawPresent.position == sl.StrawPosition.id
-            )  # that also have straw present entries
-            .filter(sl.StrawPresent.present == 1)  # where our straw is in fact present
-            .filter(sl.StrawPresent.straw == self.id)  # for this straw
+                sl.StrawOccupancy, sl.StrawOccupancy.position == sl.StrawPosition.id
+            )  # where a straw is present
+            .filter(sl.StrawOccupancy.straw == self.id)  # that is this straw
+            .all()
+        )
+
+    # Where each of the given straws is, in one query.
+    # Returns {straw id : [(straw location PK, position number), ...]}, with an
+    # empty list for a straw that isn't present anywhere.
+    @staticmethod
+    def locateAll(straw_ids):
+        straw_ids = list(straw_ids)
+        locations = {straw: [] for straw in straw_ids}
+        rows = (
+            DM.query(
+                sl.StrawOccupancy.straw,
+                sl.StrawOccupancy.location,
+                sl.StrawOccupancy.position_number,
+            )
+            .filter(sl.StrawOccupancy.straw.in_(straw_ids))
             .all()
         )
+        for straw, location, position in rows:
+            locations[straw].append((location, position))
+        return locations
@@ -24,12 +24,15 @@
 #
 # Initializing any straw location commits it to the DB
 #
+# What is at a straw location now is read from straw_occupancy (see
+# StrawOccupancy), which the database keeps in step with straw_present.
+#
 ################################################################################
 import logging
 
 logger = logging.getLogger("root")
 
-from guis.common.db_classes.bases import BASE, OBJECT, DM, Barcode
+from guis.common.db_classes.bases import BASE, OBJECT, DM, Barcode, Reference
 from sqlalchemy import (
     Column,
     Integer,
@@ -45,6 +48,7 @@ from sqlalchemy import (
     TEXT,
     func,
     or_,
+    exists,
 )
 from sqlalchemy.sql.expression import true, false
 import guis.common.db_classes.straw as st
@@ -150,46 +154,29 @@ class StrawLocation(BASE, OBJECT):
         return LoadingPallet._construct(number=number, pallet_id=pallet_id)
 
     ## PROPERTIES ##
+    # [Straw or None for each position, in position order]
     def getStraws(self):
-
-        # Query Tuples of Straw Position ids and Straw objects
+        # (position id, Straw or None) for every position on this location
         qry = (
             DM.query(StrawPosition.id, st.Straw)
-            .join(StrawPresent, StrawPresent.straw == st.Straw.id)
-            .outerjoin(StrawPosition, StrawPosition.id == StrawPresent.position)
-            .filter(StrawPosition.location == self.id)
-            .filter(StrawPresent.present == True)
-            .order_by(StrawPosition.position_number.asc())
-            .all()
-        )
-
-        # Create a dictionary of this query {<position id> : <Straw>, ...}
-        straw_position_dict = dict(qry)
-
-        # Query straw position ids on this straw location ordered by position number
-        positions = (
-            DM.query(StrawPosition.id)
+            .outerjoin(StrawOccupancy, StrawOccupancy.position == StrawPosition.id)
+            .outerjoin(st.Straw, st.Straw.id == StrawOccupancy.straw)
             .filter(StrawPosition.location == self.id)
             .order_by(StrawPosition.position_number.asc())
             .all()
         )
-
-        # Create a list of straws of equal length to the list of positions
-        straws = [None] * len(positions)
-
-        # Iterate through the list of positions and use the dictionary to populate the list of straws, leaving None objects wherever there is no Straw.
-        for i, pos in enumerate([p[0] for p in positions]):
-            try:
-                straws[i] = straw_position_dict[pos]
-            except KeyError:
-                pass
-        return straws
+        # one entry per position
+        straws = {}
+        for position, straw in qry:
+            if straws.get(position) is None:
+                straws[position] = straw
+        return list(straws.values())
 
     def isEmpty(self):
-        return not any(self.getStraws())
+        return not self.exists(StrawOccupancy.query().filter_by(location=self.id))
 
     def getLocationType(self):
-        return StrawLocationType.queryWithId(self.location_type)
+        return StrawLocationType.cached(id=self.location_type)
 
     def barcode(self):
         return self.getLocationType().barcode(self.number)
@@ -201,14 +188,10 @@ class StrawLocation(BASE, OBJECT):
     def getUnfilledPositions(self):
         unfilled_positions = (
             DM.query(StrawPosition.position_number)  # get all straw position numbers
-            .outerjoin(
-                StrawPresent, StrawPresent.position == StrawPosition.id
-            )  # and all the matching StrawPresent positions
-            .filter(
-                or_(StrawPresent.position == None, StrawPresent.present == 0)
-            )  # such that the StrawPresent positions don't actually have an entry
-            # or such that the present field is false
             .filter(StrawPosition.location == self.id)  # for this straw location
+            .filter(  # that no straw is present at
+                ~exists().where(StrawOccupancy.position == StrawPosition.id)
+            )
             .order_by(StrawPosition.position_number.asc())
             .all()
         )
@@ -218,13 +201,10 @@ class StrawLocation(BASE, OBJECT):
     # return [0, 6, 8, 14, 22, ...]
     def getFilledPositions(self):
         filled_positions = (
-            DM.query(StrawPosition.position_number)  # get all straw position numbers
-            .join(
-                StrawPresent, StrawPresent.position == StrawPosition.id
-            )  # where the straw positions have an entry in the StrawPresent table
-            .filter(StrawPresent.present == 1)
-            .filter(StrawPosition.location == self.id)  # for this straw location
-            .order_by(StrawPosition.position_number.asc())
+            DM.query(StrawOccupancy.position_number)
+            .filter(StrawOccupancy.location == self.id)
+            .distinct()
+            .order_by(StrawOccupancy.position_number.asc())
             .all()
         )
         return [pos for pos, *remainder in filled_positions]
@@ -234,10 +214,9 @@ class StrawLocation(BASE, OBJECT):
     def getStrawAtPosition(self, position):
         return (
             DM.query(st.Straw)
-            .join(StrawPresent, StrawPresent.straw == st.Straw.id)
-            .join(StrawPosition, StrawPresent.position == StrawPosition.id)
-            .filter(StrawPosition.location == self.id)
-            .filter(StrawPosition.position_number == position)
+            .join(StrawOccupancy, StrawOccupancy.straw == st.Straw.id)
+            .filter(StrawOccupancy.location == self.id)
+            .filter(StrawOccupancy.position_number == position)
             .one_or_none()
         )
 
@@ -261,41 +240,64 @@ class StrawLocation(BASE, OBJECT):
     # straw argument here is a Straw object
     def removeStraw(self, straw=None, position=None, commit=True):
         logger.debug(f"removing straw in position {position}")
-        qry = (
-            DM.query(StrawPresent)  # get entries from straw present table
-            .filter(StrawPresent.present == True)  # such that straws are present
-            .filter(StrawPosition.location == self.id)  # for this straw location
-        )
+        qry = self._queryStrawPresents()  # straws present on this location
         if straw:
             qry = qry.filter(
-                StrawPresent.straw == straw.id
+                StrawOccupancy.straw == straw.id
             )  # and with straw id matching the argument
         if position is not None:
-            qry = qry.join(
-                StrawPosition, StrawPosition.id == StrawPresent.position
-            ).filter(  # w/ position matching an entry in straw position table
-                StrawPosition.position_number == position
-            )  # with Straw Position matching the argument
-        logger.debug(f"removeStraw: straws matching query: {qry.all()}")
+            qry = qry.filter(
+                StrawOccupancy.position_number == position
+            )  # at the position matching the argument
         straw_present = qry.one_or_none()
+        logger.debug(f"removeStraw: straw matching query: {straw_present}")
         if straw_present is None:
             return
         straw_present.remove(commit)
         return straw_present
 
     def removeAllStraws(self, commit=True):
-        for position in self.getFilledPositions():
-            self.removeStraw(position=position, commit=commit)
+        straw_presents = self._queryStrawPresents().all()
+        for straw_present in straw_presents:
+            straw_present.remove(commit=False)
+        if commit and straw_presents:
+            DM.commitEntries(straw_presents)
+        return straw_presents
+
+    # Bulk addStraw: {position number : Straw}. Straws already on this
+    # location are skipped. Two queries, then the new StrawPresents are
+    # committed together (or only returned, with commit=False).
+    def addStraws(self, straws, commit=True):
+        here = {
+            straw
+            for straw, in DM.query(StrawOccupancy.straw).filter(
+                StrawOccupancy.location == self.id
+            )
+        }
+        positions = dict(
+            DM.query(StrawPosition.position_number, StrawPosition.id).filter(
+                StrawPosition.location == self.id
+            )
+        )
+        straw_presents = []
+        for position, straw in straws.items():
+            if straw.id in here:
+                continue
+            here.add(straw.id)
+            straw_presents.append(
+                # a plain True (not true()) lets the inserts share a statement
+                StrawPresent(straw=straw.id, position=positions[position], present=True)
+            )
+        if commit and straw_presents:
+            DM.commitEntries(straw_presents)
+        return straw_presents
 
     def addStraw(self, straw, position, commit=True):
 
-        # Make sure there's not already a straw there
-        straw_present = (
-            self._queryStrawPresents()
-            .filter(StrawPresent.straw == straw.id)
-            .one_or_none()
-        )
-        if straw_present is not None:
+        # Make sure the straw isn't already here
+        if self.exists(
+            StrawOccupancy.query().filter_by(location=self.id, straw=straw.id)
+        ):
             return
 
         # Query StrawPosition key
@@ -367,9 +369,59 @@ class StrawLocation(BASE, OBJECT):
     def queryStrawPresents(cls, straw_location):
         return (
             StrawPresent.query()
-            .join(cls.queryStrawPositions(straw_location).subquery())
-            .filter(StrawPresent.present == True)
+            .join(StrawOccupancy, StrawOccupancy.id == StrawPresent.id)
+            .filter(StrawOccupancy.location == straw_location)
+        )
+
+    ## Occupancy of many straw locations at once
+
+    """occupancy
+    (public class method)
+
+        Description:
+            What is on each of the given straw locations, in one query.
+
+        Input:
+            straw_locations (list) Database PKs of StrawLocations.
+
+        Output:
+            (dict) {straw location PK : {position number : straw id}}, with
+            an empty dict for an empty location.
+    """
+
+    @classmethod
+    def occupancy(cls, straw_locations):
+        straw_locations = list(straw_locations)
+        occupancy = {location: {} for location in straw_locations}
+        rows = (
+            DM.query(
+                StrawOccupancy.location,
+                StrawOccupancy.position_number,
+                StrawOccupancy.straw,
+            )
+            .filter(StrawOccupancy.location.in_(straw_locations))
+            .all()
         )
+        for location, position, straw in rows:
+            occupancy[location][position] = straw
+        return occupancy
+
+    # Subset of the given straw location PKs that have no straws, in one query
+    @classmethod
+    def emptyLocations(cls, straw_locations):
+        straw_locations = set(straw_locations)
+        occupied = (
+            DM.query(StrawOccupancy.location)
+            .filter(StrawOccupancy.location.in_(straw_locations))
+            .distinct()
+            .all()
+        )
+        return straw_locations - {location for location, in occupied}
+
+    # Query of the locations of this class that have no straws
+    @classmethod
+    def queryEmpty(cls):
+        return cls.query().filter(~exists().where(StrawOccupancy.location == cls.id))
 
     ## Other
     @classmethod
@@ -513,8 +565,10 @@ class Pallet(StrawLocation):
 
     @classmethod
     def _palletIsEmpty(cls, pallet_id):
-        pallets = cls._queryPalletsByID(pallet_id).all()
-        return all(p.isEmpty() for p in pallets)
+        occupied = cls._queryPalletsByID(pallet_id).join(
+            StrawOccupancy, StrawOccupancy.location == cls.id
+        )
+        return not cls.exists(occupied)
 
     @classmethod
     def _queryPalletsByID(cls, pallet_id):
@@ -549,7 +603,7 @@ class CuttingPallet(Pallet):
         )
 
 
-class StrawLocationType(BASE, OBJECT):
+class StrawLocationType(BASE, OBJECT, Reference):
     __tablename__ = "straw_location_type"
     id = Column(VARCHAR(4, 7), primary_key=True)
     name = Column(VARCHAR(25))
@@ -643,3 +697,26 @@ class StrawPresent(BASE, OBJECT):
         self.present = false()
         if commit:
             self.commit()
+
+
+# The straws present now: one row per straw_present row with present true,
+# with its position's location and number. Filled and kept in step with
+# straw_present by triggers in the database (see migrations.py, v4), so it
+# answers "what is on location X" and "where is straw Y" with one indexed
+# query. Read-only here; write straw_present. In a database that hasn't got
+# the table yet, e.g. its migration failed on a locked database, it's a TEMP
+# view computing the same rows from straw_present (addFallbackViews).
+class StrawOccupancy(BASE, OBJECT):
+    __tablename__ = "straw_occupancy"
+    id = Column(Integer, primary_key=True)  # straw_present.id
+    straw = Column(Integer, ForeignKey("straw.id"))
+    position = Column(Integer, ForeignKey("straw_position.id"))
+    location = Column(Integer, ForeignKey("straw_location.id"))
+    position_number = Column(Integer)
+
+    def __repr__(self):
+        return "<StrawOccupancy(straw='%s',location='%s',position_number='%s')>" % (
+            self.straw,
+            self.location,
+            self.position_number,
+        )
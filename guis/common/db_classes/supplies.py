@@ -1,4 +1,4 @@
-from guis.common.db_classes.bases import BASE, OBJECT
+from guis.common.db_classes.bases import BASE, OBJECT, Reference
 from sqlalchemy import (
     Column,
     Integer,
@@ -17,7 +17,7 @@ from sqlalchemy import (
 from sqlalchemy.sql.expression import true, false
 
 
-class Supplies(BASE, OBJECT):
+class Supplies(BASE, OBJECT, Reference):
     __tablename__ = "supplies"
     id = Column(Integer, primary_key=True)
     station = Column(CHAR(4), ForeignKey("station.id"))
@@ -54,7 +54,7 @@ class SupplyChecked(BASE, OBJECT):
 
     ## returns supply object
     def getSupply(self):
-        return Supplies.queryWithId(self.supply)
+        return Supplies.cached(id=self.supply)
 
     def getWorker(self):
         return self.worker
@@ -63,7 +63,7 @@ class SupplyChecked(BASE, OBJECT):
         return self.timestamp
 
 
-class MoldReleaseItems(BASE, OBJECT):
+class MoldReleaseItems(BASE, OBJECT, Reference):
     __tablename__ = "mold_release_items"
     id = Column(Integer, primary_key=True)
     station = Column(CHAR(4), ForeignKey("station.id"))
@@ -92,7 +92,7 @@ class MoldReleaseItemsChecked(BASE, OBJECT):
         self.commit()
 
     def getMoldRelease(self):
-        return MoldReleaseItems.queryWithId(self.mold_release_item)
+        return MoldReleaseItems.cached(id=self.mold_release_item)
 
     def isMoldReleased(self):
         return self.mold_released
@@ -1,4 +1,4 @@
-from guis.common.db_classes.bases import BASE, OBJECT
+from guis.common.db_classes.bases import BASE, OBJECT, Reference
 from sqlalchemy import (
     Column,
     Integer,
@@ -26,7 +26,7 @@ class Worker(BASE, OBJECT):
     last_name = Column(String)
 
     def certifiedStations(self):
-        return [wc.station for wc in self._queryCertifiedStations().all()]
+        return [wc.station for wc in WorkerCertification.cachedAll(worker=self.id)]
 
     # Returns boolean indicating if worker is certified to do the given station.
     def certified(self, station):
@@ -35,6 +35,7 @@ class Worker(BASE, OBJECT):
     def certify(self, station):
         if not self.certified(station):
             WorkerCertification(worker=self.id, station=station.id)
+            WorkerCertification.invalidate(worker=self.id)
 
     def _queryCertifiedStations(self):
         return WorkerCertification.query().filter(WorkerCertification.worker == self.id)
@@ -47,8 +48,11 @@ class Worker(BASE, OBJECT):
         )
 
 
-class WorkerCertification(BASE, OBJECT):
+# Certifications are granted while GUIs are running, so they are re-read now
+# and then
+class WorkerCertification(BASE, OBJECT, Reference):
     __tablename__ = "worker_certification"
+    reference_ttl = 300
 
     id = Column(Integer, primary_key=True)
     worker = Column(CHAR(7, 13), ForeignKey("worker.id"))
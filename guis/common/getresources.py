@@ -1,8 +1,20 @@
 ################################################################################
+# Project resources
+#
+# The resources package holds this installation's settings, most of them
+# written by setup.py: paths.csv, rootDirectory.txt, networkDatabasePath.txt,
+# straw_leak_ino_ports.txt.
+#
+# They are asked for all over, often once per straw or once per file, so each
+# file is parsed once per process and parsed again only when its mtime or size
+# changes. What is handed out is shared between callers and therefore
+# immutable: read-only mappings, tuples, strings and Paths.
 ################################################################################
 
-import numpy as np  # has the most convenient csv parser for the task at hand
+import os, threading
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
 
 # Resource manager, and the resources folder (package)
 try:
@@ -15,28 +27,71 @@ except ImportError:
 import resources, data
 
 
+# Absolute path of a file in a package folder
+@lru_cache(maxsize=None)
+def _resourceFile(package, name):
+    with pkg_resources.path(package, name) as p:
+        return p.resolve()
+
+
+_cache = {}  # name : ((mtime, size) of each file, value)
+_cache_lock = threading.Lock()
+
+
+# build(*texts of the files), cached until one of the files changes
+def _cached(name, files, build):
+    paths = [_resourceFile(resources, f) for f in files]
+    stats = []
+    for path in paths:
+        stat = os.stat(path)
+        stats.append((stat.st_mtime_ns, stat.st_size))
+    stats = tuple(stats)
+    with _cache_lock:
+        entry = _cache.get(name)
+        if entry is None or entry[0] != stats:
+            entry = stats, build(*(path.read_text(encoding="utf-8") for path in paths))
+            _cache[name] = entry
+        return entry[1]
+
+
+# paths.csv: "name,relative path" lines, "#" starts a comment
+def _parsePaths(text, root):
+    paths = {}
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            name, path = line.split(",")
+            paths[name] = Path(root + "/" + path)
+    return MappingProxyType(paths)
+
+
 # Get a dictionary containing the important paths for this project.
 # Read in the csv file containing the directory locations.
-# Save them into a dictionary {name : path}.
+# Save them into a read-only dictionary {name : path}.
 # The paths are pathlib objs in absolute form: root_dir + relative_project_dir.
 def GetProjectPaths():
-    paths_file = ""
-    with pkg_resources.path(resources, "paths.csv") as p:
-        paths_file = p.resolve()
-    paths = dict(np.loadtxt(paths_file, delimiter=",", dtype=str))
-    # Make paths absolute. This txt file that holds the root/top dir of this
-    # installation is created during setup.py.
-    root = pkg_resources.read_text(resources, "rootDirectory.txt")
-    paths.update((k, Path(root + "/" + v)) for k, v in paths.items())
-    return paths
-
-
-# list of strings ["COM1", "COM8", etc.]
+    return _cached("paths", ("paths.csv", "rootDirectory.txt"), _parsePaths)
+
+
+# The top dir of this installation. The txt file that holds it is created
+# during setup.py.
+def GetRootDirectory():
+    return _cached("root", ("rootDirectory.txt",), str)
+
+
+# The merge-destination DB, set in networkDatabasePath.txt by setup.py
+def GetNetworkDatabasePath():
+    return _cached("network_db", ("networkDatabasePath.txt",), str)
+
+
+# tuple of strings ("COM1", "COM8", etc.)
 def GetStrawLeakInoPorts():
-    ports = pkg_resources.read_text(resources, "straw_leak_ino_ports.txt")
-    return [i.strip() for i in ports.split("\n")]
+    return _cached(
+        "straw_leak_ino_ports",
+        ("straw_leak_ino_ports.txt",),
+        lambda ports: tuple(i.strip() for i in ports.split("\n")),
+    )
 
 
 def GetLocalDatabasePath():
-    with pkg_resources.path(data, "database.db") as p:
-        return str(p.resolve())
+    return str(_resourceFile(data, "database.db"))
@@ -4,6 +4,7 @@ from datetime import datetime
 import sqlalchemy as sqla
 
 from guis.common.advancedthreading import LoopingReusableThread
+from guis.common.migrations import DERIVED_TABLES
 
 import logging
 
@@ -33,6 +34,13 @@ class Merger:
         # Allias used when attaching source database
         self.attach_alias = "att"  # Alias for source database
 
+        # Table in the source database holding per-table high-water marks
+        self.watermark_table = "merge_watermark"
+
+        # Optional change capture (see enableChangeCapture)
+        self.changelog_table = "merge_changelog"
+        self._capture_tables = None
+
     def getTables(self):
         return [
             tpl[0]
@@ -74,25 +82,375 @@ class Merger:
     # Loop tables in target db, add (update) all source data to the target
     # tables when data is new (when t_source > t_target).
     #
+    # Each table is merged in its own transaction, and tables whose source
+    # rows haven't changed since the last merge (see mergeTable) are skipped,
+    # so an idle table costs a few lookups in the local database.
+    #
     # A non-critical merge failure for a single table will not affect the
     # merging of other tables.
     #
     # e.g. non-critical failure: table exists in target but not source.
+    #
+    # Derived tables (see migrations.py) are maintained by each database's
+    # own triggers as the tables they derive from are merged, so they are
+    # left out.
     def mergeAll(self):
         start = datetime.now()
         logger.info("Beginning Automerge")
-        # logger.debug("\n".join([self.merge(t,execute=False) for t in sorted(self.getTables())]))
-        self.__execute(
-            "\n".join([self.merge(t, execute=False) for t in self.getTables()])
-        )
-        # for t in self.getTables():
-        #    logger.info(t)
-        #    self.__execute(
-        #        self.merge(t, execute=False)
-        #    )
+        con = self._connect()
+        merged, skipped = 0, 0
+        try:
+            self._initWatermarks(con)
+            tables = [
+                t
+                for t in self.getTables()
+                if t not in (self.watermark_table, self.changelog_table)
+                and t not in DERIVED_TABLES
+            ]
+            captured = self.installChangeCapture(con, tables)
+            for table in tables:
+                if table in captured:
+                    continue
+                try:
+                    if self.mergeTable(con, table):
+                        merged += 1
+                    else:
+                        skipped += 1
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to merge table {table}, Exception: {e}")
+            if captured:
+                merged += self.drainChangelog(con, captured)
+        finally:
+            con.close()
         finish = datetime.now()
         dt = (finish - start).total_seconds()
-        logger.info(f"Automerge complete ({dt}s)")
+        logger.info(
+            f"Automerge complete ({dt}s, {merged} tables merged, {skipped} unchanged)"
+        )
+
+    """
+    mergeTable
+        Merges one table using its high-water mark.
+
+        The mark records the source table as of the previous merge: its
+        largest timestamp (or rowid, for tables without a timestamp column)
+        with the number of rows sharing it, and its largest rowid. Each is an
+        index lookup. It is stored in the source database, keyed by
+        destination, so it is discarded along with the data it describes
+        whenever the local database is replaced.
+
+        If the mark is unchanged the table is skipped. Otherwise the rows
+        shipped are those past the mark's rowid, whatever their timestamp
+        (timestamps come from the writer's clock or an import-time column
+        default, so a new row may well be older than the mark), and those at
+        or past its timestamp that are new or newer than the destination's
+        copy. Both are index ranges. The mark is advanced in the same
+        transaction. Tables without a mark get the original full merge.
+
+        A row inserted with both a rowid and a timestamp below the mark (e.g.
+        an id taken from the clock long before the row was committed) is only
+        found by change capture, see enableChangeCapture.
+
+        Input:
+            con     (sqlite3.Connection)    connection from self._connect()
+            table   (str)                   name of table to be merged
+
+        Return:
+            (bool) False if the table was skipped
+    """
+
+    def mergeTable(self, con, table):
+        alias = self.attach_alias
+        columns = [
+            row[1] for row in con.execute(f'PRAGMA {alias}.table_info("{table}")')
+        ]
+        if not columns:
+            raise sqlite3.OperationalError(f"no such table: {alias}.{table}")
+        key = "timestamp" if "timestamp" in columns else "rowid"
+        if key == "timestamp":
+            con.execute(
+                f'CREATE INDEX IF NOT EXISTS {alias}."ix_merge_{table}_timestamp" '
+                f'ON "{table}" (timestamp)'
+            )
+
+        con.execute("BEGIN")
+        try:
+            top, top_count = con.execute(
+                f'SELECT max({key}), count(*) FROM {alias}."{table}" '
+                f'WHERE {key} = (SELECT max({key}) FROM {alias}."{table}")'
+            ).fetchone()
+            (top_rowid,) = con.execute(
+                f'SELECT max(rowid) FROM {alias}."{table}"'
+            ).fetchone()
+            state = (key, top, top_count, top_rowid)
+            mark = con.execute(
+                f"SELECT key, mark, mark_count, max_rowid "
+                f"FROM {alias}.{self.watermark_table} "
+                "WHERE destination = ? AND tbl = ?",
+                (str(self.dst_db), table),
+            ).fetchone()
+            if mark is not None and (mark[0] != key or mark[3] is None):
+                mark = None
+
+            if mark is not None and tuple(mark) == state:
+                con.execute("ROLLBACK")
+                return False
+
+            con.execute(
+                self.mergeScript(
+                    table=table,
+                    attached_alias=alias,
+                    into_attached=False,
+                    key=key,
+                    since=None if mark is None else mark[1],
+                    max_rowid=None if mark is None else mark[3],
+                )
+            )
+            if top is not None:
+                con.execute(
+                    f"INSERT OR REPLACE INTO {alias}.{self.watermark_table} "
+                    "(destination, tbl, key, mark, mark_count, max_rowid) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (str(self.dst_db), table) + state,
+                )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return True
+
+    """
+    enableChangeCapture
+        Switches the merger to change-capture mode. SQLite triggers on the
+        given tables of the source database append (table, id) pairs to a
+        changelog, and each merge drains the changelog instead of searching
+        those tables for new rows. Rows whose content changed without their
+        timestamp moving, and rows inserted with a rowid and timestamp below
+        the watermark, are therefore merged as well.
+
+        Tables are instrumented at the start of each merge. A table's first
+        merge after its triggers are created is still a watermark merge, which
+        picks up whatever changed before capture began.
+
+        Input:
+            tables  (callable)  returns the names of the tables to capture.
+                                Called on every merge, so tables declared
+                                after this call are picked up.
+    """
+
+    def enableChangeCapture(self, tables):
+        self._capture_tables = tables
+
+    # Switches back to watermark merges and removes the triggers and the
+    # changelog from the source database, so it stops growing.
+    def disableChangeCapture(self):
+        self._capture_tables = None
+        con = self._connect()
+        try:
+            self.removeChangeCapture(con)
+        finally:
+            con.close()
+
+    """
+    installChangeCapture
+        Creates the changelog and its triggers in the source database.
+
+        Input:
+            con     (sqlite3.Connection)    connection from self._connect()
+            tables  (list)                  tables present in the destination
+
+        Return:
+            (set) tables whose triggers existed before this call, i.e. whose
+                  every change since the last merge is in the changelog
+    """
+
+    def installChangeCapture(self, con, tables):
+        if self._capture_tables is None:
+            self.removeChangeCapture(con)
+            return set()
+        alias = self.attach_alias
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {alias}.{self.changelog_table} (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                tbl TEXT NOT NULL,
+                row_id NOT NULL
+            )
+            """
+        )
+        triggers = {
+            row[0]
+            for row in con.execute(
+                f"SELECT name FROM {alias}.sqlite_master WHERE type = 'trigger'"
+            )
+        }
+        captured = set()
+        for table in set(self._capture_tables()).intersection(tables):
+            names = [f"merge_capture_{table}_{op}" for op in ("insert", "update")]
+            if all(name in triggers for name in names):
+                captured.add(table)
+                continue
+            columns = [
+                row[1] for row in con.execute(f'PRAGMA {alias}.table_info("{table}")')
+            ]
+            # The merge joins on id, so tables without one can't be captured
+            if "id" not in columns:
+                continue
+            for name, op in zip(names, ("INSERT", "UPDATE")):
+                con.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {alias}."{name}"
+                    AFTER {op} ON "{table}"
+                    BEGIN
+                        INSERT INTO {self.changelog_table} (tbl, row_id)
+                        VALUES ('{table}', NEW.id);
+                    END
+                    """
+                )
+            logger.info(f"Change capture installed on table {table}")
+        return captured
+
+    # Drops the capture triggers and the changelog, if there are any. Nothing
+    # is lost: without capture every table gets a watermark merge, and a table
+    # captured again is re-instrumented and starts with one too.
+    def removeChangeCapture(self, con):
+        alias = self.attach_alias
+        names = con.execute(
+            f"SELECT type, name FROM {alias}.sqlite_master "
+            "WHERE (type = 'trigger' AND name LIKE 'merge?_capture?_%' ESCAPE '?') "
+            "OR (type = 'table' AND name = ?)",
+            (self.changelog_table,),
+        ).fetchall()
+        if not names:
+            return
+        for type, name in names:
+            if type == "trigger":
+                con.execute(f'DROP TRIGGER IF EXISTS {alias}."{name}"')
+        con.execute(f"DROP TABLE IF EXISTS {alias}.{self.changelog_table}")
+        logger.info("Change capture removed")
+
+    """
+    drainChangelog
+        Merges the rows named in the changelog and deletes the entries that
+        were merged. Each table is merged under its own savepoint, so a
+        failure leaves that table's entries in place for the next merge
+        without holding back the other tables.
+
+        A changed row replaces the destination's copy unless the destination's
+        copy has a strictly newer timestamp.
+
+        Input:
+            con     (sqlite3.Connection)    connection from self._connect()
+            tables  (set)                   tables to drain
+
+        Return:
+            (int) number of tables merged
+    """
+
+    def drainChangelog(self, con, tables):
+        alias = self.attach_alias
+        changelog = f"{alias}.{self.changelog_table}"
+        merged = 0
+        con.execute("BEGIN")
+        try:
+            (last,) = con.execute(f"SELECT max(seq) FROM {changelog}").fetchone()
+            if last is None:
+                con.execute("ROLLBACK")
+                return merged
+            changed = [
+                row[0]
+                for row in con.execute(
+                    f"SELECT DISTINCT tbl FROM {changelog} WHERE seq <= ?", (last,)
+                )
+            ]
+            for table in set(changed).intersection(tables):
+                columns = [
+                    row[1]
+                    for row in con.execute(f'PRAGMA {alias}.table_info("{table}")')
+                ]
+                condition = "t.id IS NULL"
+                if "timestamp" in columns:
+                    condition += " OR srct.timestamp >= t.timestamp"
+                con.execute("SAVEPOINT drain_table")
+                try:
+                    con.execute(
+                        f"""
+                        INSERT OR REPLACE INTO "{table}"
+                        SELECT srct.* FROM {alias}."{table}" srct
+                        LEFT OUTER JOIN "{table}" t ON srct.id = t.id
+                        WHERE srct.id IN (
+                            SELECT row_id FROM {changelog}
+                            WHERE tbl = ? AND seq <= ?
+                        )
+                        AND ({condition})
+                        """,
+                        (table, last),
+                    )
+                    con.execute(
+                        f"DELETE FROM {changelog} WHERE tbl = ? AND seq <= ?",
+                        (table, last),
+                    )
+                    con.execute("RELEASE drain_table")
+                    merged += 1
+                except sqlite3.Error as e:
+                    con.execute("ROLLBACK TO drain_table")
+                    con.execute("RELEASE drain_table")
+                    logger.error(f"Failed to merge table {table}, Exception: {e}")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return merged
+
+    # Forget all high-water marks for this destination so the next merge is a
+    # full one, e.g. after the destination database has been restored.
+    def resetWatermarks(self):
+        con = self._connect()
+        try:
+            self._initWatermarks(con)
+            con.execute(
+                f"DELETE FROM {self.attach_alias}.{self.watermark_table} "
+                "WHERE destination = ?",
+                (str(self.dst_db),),
+            )
+        finally:
+            con.close()
+
+    def _initWatermarks(self, con):
+        watermarks = f"{self.attach_alias}.{self.watermark_table}"
+        con.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {watermarks} (
+                destination TEXT NOT NULL,
+                tbl TEXT NOT NULL,
+                key TEXT NOT NULL,
+                mark INTEGER,
+                mark_count INTEGER,
+                max_rowid INTEGER,
+                PRIMARY KEY (destination, tbl)
+            )
+            """
+        )
+        # marks from before max_rowid are ignored (full merge)
+        columns = [
+            row[1]
+            for row in con.execute(
+                f'PRAGMA {self.attach_alias}.table_info("{self.watermark_table}")'
+            )
+        ]
+        if "max_rowid" not in columns:
+            con.execute(f"ALTER TABLE {watermarks} ADD COLUMN max_rowid INTEGER")
+
+    # Connection to the destination database with the source attached, in
+    # autocommit mode so that transactions are managed explicitly.
+    def _connect(self):
+        try:
+            con = sqlite3.connect(self.dst_db, timeout=15, isolation_level=None)
+        except Exception as e:
+            logger.critical(f"FAILED TO CONNECT TO DATABASE, Exception: {e}")
+            raise ConnectionError("Failed to connect to database")
+        con.execute(f"ATTACH DATABASE ? AS {self.attach_alias}", (str(self.src_db),))
+        return con
 
     def __execute(self, script, fetchall=False):
         return self.executeScript(
@@ -140,11 +498,35 @@ class Merger:
         # Return ret
         return ret
 
+    # since and max_rowid, a previous merge's high-water mark, restrict the
+    # merge to source rows past max_rowid and, for timestamped tables, rows at
+    # or past since that are new or newer than the destination's copy.
     @staticmethod
-    def mergeScript(table, attached_alias, into_attached=False):
+    def mergeScript(
+        table,
+        attached_alias,
+        into_attached=False,
+        key="timestamp",
+        since=None,
+        max_rowid=None,
+    ):
         # Determine database prefixes
         dst_prefix = f"{attached_alias}." if into_attached else str()
         src_prefix = f"{attached_alias}." if not into_attached else str()
+        # Rows are new, or newer than the destination's copy
+        condition = "t.id IS NULL"
+        if key == "timestamp":
+            condition = f"srct.timestamp > t.timestamp OR {condition}"
+        if max_rowid is not None:
+            if since is not None and key == "timestamp":
+                if not isinstance(since, (int, float)):
+                    since = "'" + str(since).replace("'", "''") + "'"
+                condition = (
+                    f"srct.rowid > {int(max_rowid)} OR (srct.timestamp >= {since} "
+                    f"AND ({condition}))"
+                )
+            else:
+                condition = f"srct.rowid > {int(max_rowid)}"
         # Generate script
         # logger.debug(f'Script for {table}')
         # logger.debug(f"""
@@ -167,15 +549,13 @@ class Merger:
             LEFT OUTER JOIN
             {dst_prefix}{table} t ON srct.id = t.id
             WHERE
-            srct.timestamp > t.timestamp
-            OR
-            t.id IS NULL;
+            {condition};
             """
 
     def main(self):
         try:
             return self.mergeAll()
-        except sqla.exc.OperationalError:
+        except (sqla.exc.OperationalError, sqlite3.OperationalError):
             logger.error("DB Locked. Failed to attach local DB in executeScript.")
 
 
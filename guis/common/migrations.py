@@ -0,0 +1,373 @@
+################################################################################
+# Schema migrations for the local and network databases
+#
+# The database schema is not created by the ORM (db_classes only maps tables
+# that already exist), so changes to it are applied here, in place, to
+# whatever database file is given. Each migration has a version number; the
+# highest version applied is kept in the database's PRAGMA user_version, which
+# is per-file and is not copied by the merger.
+#
+# The local database is migrated by DatabaseManager when it first connects.
+# The network database is migrated by hand:
+#
+#   python -m guis.common.migrations [--network] [--local] [db file ...]
+#
+# Migrations add indexes and derived tables. A change whose tables or columns
+# don't exist in a given database is skipped (and logged), e.g. for a station
+# that never ran that process. Whether a change is in place is read from the
+# schema itself, so a skipped change is applied by a later migrate() once its
+# tables are there, even though the database's version has moved past it.
+#
+# Derived tables (DERIVED_TABLES) are filled from other tables and kept up to
+# date by triggers, in every database for itself; the merger leaves them out.
+# Until a database has one (its migration was skipped, or failed e.g. on a
+# locked database), addFallbackViews() stands in a TEMP view of the same rows.
+#
+# tests/test_query_plans.py checks that the hot queries these indexes are
+# for are answered without a full table scan.
+################################################################################
+import argparse, sqlite3
+
+import logging
+
+logger = logging.getLogger("root")
+
+
+# An index on table(columns). The columns after the ones a query filters on
+# make the index covering for that query (no lookup of the row itself).
+class AddIndex:
+    def __init__(self, name, table, *columns):
+        self.name = name
+        self.table = table
+        self.columns = columns
+
+    def applied(self, con):
+        return schemaObjectExists(con, "index", self.name)
+
+    # What the index needs that this database doesn't have, e.g. ["table.a"]
+    def missing(self, con):
+        existing = {row[1] for row in con.execute(f"PRAGMA table_info({self.table})")}
+        if not existing:
+            return [self.table]
+        return [f"{self.table}.{c}" for c in self.columns if c not in existing]
+
+    # Returns whether the index was added (False: skipped)
+    def apply(self, con):
+        missing = self.missing(con)
+        if missing:
+            logger.info("Skipping index %s: no %s" % (self.name, ", ".join(missing)))
+            return False
+        con.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.name} "
+            f"ON {self.table} ({', '.join(self.columns)})"
+        )
+        return True
+
+
+# Statements that add a derived table, its indexes and the triggers that
+# maintain it, then fill it. Needs the tables it's derived from.
+class AddDerivedTable:
+    def __init__(self, name, sources, *statements):
+        self.name = name
+        self.sources = sources
+        self.statements = statements
+
+    def applied(self, con):
+        return schemaObjectExists(con, "table", self.name)
+
+    def missing(self, con):
+        return [
+            t
+            for t in self.sources
+            if not con.execute(f"PRAGMA table_info({t})").fetchone()
+        ]
+
+    # Returns whether the table was added (False: skipped)
+    def apply(self, con):
+        missing = self.missing(con)
+        if missing:
+            logger.info("Skipping table %s: no %s" % (self.name, ", ".join(missing)))
+            return False
+        for statement in self.statements:
+            con.execute(statement)
+        return True
+
+
+def schemaObjectExists(con, type, name):
+    return bool(
+        con.execute(
+            "SELECT 1 FROM main.sqlite_master WHERE type = ? AND name = ?",
+            (type, name),
+        ).fetchone()
+    )
+
+
+# straw_occupancy: where the straws are now, i.e. the straw_present rows that
+# are present, with their position's location and number. The triggers also
+# cover INSERT OR REPLACE (the merger's), which doesn't fire delete triggers.
+STRAW_OCCUPANCY_ROW = """
+    SELECT NEW.id, NEW.straw, NEW.position, p.location, p.position_number
+    FROM straw_position p WHERE p.id = NEW.position AND NEW.present = 1;
+"""
+STRAW_OCCUPANCY_ROWS = """
+    SELECT sp.id, sp.straw, sp.position, p.location, p.position_number
+    FROM straw_present sp JOIN straw_position p ON p.id = sp.position
+    WHERE sp.present = 1
+"""
+STRAW_OCCUPANCY = [
+    """
+    CREATE TABLE IF NOT EXISTS straw_occupancy (
+        id INTEGER PRIMARY KEY,  -- straw_present.id
+        straw INTEGER,
+        position INTEGER,
+        location INTEGER,
+        position_number INTEGER
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_straw_occupancy_location
+    ON straw_occupancy (location, position_number, straw)
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_straw_occupancy_straw ON straw_occupancy (straw)",
+    """
+    CREATE INDEX IF NOT EXISTS ix_straw_occupancy_position
+    ON straw_occupancy (position)
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS straw_occupancy_insert
+    AFTER INSERT ON straw_present BEGIN
+        DELETE FROM straw_occupancy WHERE id = NEW.id;
+        INSERT INTO straw_occupancy {STRAW_OCCUPANCY_ROW}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS straw_occupancy_update
+    AFTER UPDATE ON straw_present BEGIN
+        DELETE FROM straw_occupancy WHERE id = OLD.id;
+        INSERT INTO straw_occupancy {STRAW_OCCUPANCY_ROW}
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS straw_occupancy_delete
+    AFTER DELETE ON straw_present BEGIN
+        DELETE FROM straw_occupancy WHERE id = OLD.id;
+    END
+    """,
+    f"INSERT OR REPLACE INTO straw_occupancy {STRAW_OCCUPANCY_ROWS}",
+]
+
+# Derived table : query of the rows it holds, for its fallback view
+DERIVED_TABLE_ROWS = {"straw_occupancy": STRAW_OCCUPANCY_ROWS}
+DERIVED_TABLES = tuple(DERIVED_TABLE_ROWS)
+
+
+# (version, description, [changes]), in order. Never edit a migration that has
+# shipped; add a new one.
+MIGRATIONS = [
+    (
+        1,
+        "Index straw locations, positions and presents",
+        [
+            # StrawLocation._queryStrawLocation: number and polymorphic type
+            AddIndex(
+                "ix_straw_location_number", "straw_location", "number", "location_type"
+            ),
+            # queryStrawPositions, getStraws, get(Un)FilledPositions
+            AddIndex(
+                "ix_straw_position_location",
+                "straw_position",
+                "location",
+                "position_number",
+                "id",
+            ),
+            # joins from straw_position, filtered on present
+            AddIndex(
+                "ix_straw_present_position",
+                "straw_present",
+                "position",
+                "present",
+                "straw",
+            ),
+            # addStraw/removeStraw: is this straw present anywhere
+            AddIndex(
+                "ix_straw_present_straw",
+                "straw_present",
+                "straw",
+                "present",
+                "position",
+            ),
+        ],
+    ),
+    (
+        2,
+        "Index procedures by station and straw location",
+        [
+            # Procedure._startProcedure
+            AddIndex(
+                "ix_procedure_station_location",
+                "procedure",
+                "station",
+                "straw_location",
+            ),
+            AddIndex(
+                "ix_procedure_timestamp_procedure", "procedure_timestamp", "procedure"
+            ),
+            AddIndex("ix_session_procedure", "session", "procedure", "active"),
+            AddIndex("ix_comment_procedure", "comment", "procedure"),
+        ],
+    ),
+    (
+        3,
+        "Index per-procedure measurements",
+        [
+            AddIndex(
+                "ix_measurement_pan5_procedure",
+                "measurement_pan5",
+                "procedure",
+                "position",
+            ),
+            AddIndex(
+                "ix_measurement_straw_tension_procedure",
+                "measurement_straw_tension",
+                "procedure",
+                "position",
+            ),
+            AddIndex(
+                "ix_measurement_wire_tension_procedure",
+                "measurement_wire_tension",
+                "procedure",
+                "position",
+            ),
+            AddIndex(
+                "ix_measurement_tensionbox_procedure",
+                "measurement_tensionbox",
+                "procedure",
+                "position",
+            ),
+            AddIndex(
+                "ix_measurement_pan3_procedure",
+                "measurement_pan3",
+                "procedure",
+                "position",
+            ),
+            AddIndex(
+                "ix_bad_wire_straw_procedure", "bad_wire_straw", "procedure", "position"
+            ),
+            AddIndex("ix_panel_heat_procedure", "panel_heat", "procedure"),
+        ],
+    ),
+    (
+        4,
+        "Add straw_occupancy (the straws present at each position), index pallets",
+        [
+            AddDerivedTable(
+                "straw_occupancy",
+                ("straw_present", "straw_position"),
+                *STRAW_OCCUPANCY,
+            ),
+            # Pallet._palletIsEmpty
+            AddIndex(
+                "ix_straw_location_pallet",
+                "straw_location",
+                "pallet_id",
+                "location_type",
+            ),
+        ],
+    ),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def schemaVersion(con):
+    return con.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Apply the migrations this database hasn't had yet, and the changes of
+# earlier ones that were skipped and can be applied now, each migration in one
+# transaction. Returns the versions applied (or completed).
+def migrate(db_path, timeout=30):
+    con = sqlite3.connect(str(db_path), timeout=timeout, isolation_level=None)
+    applied = []
+    try:
+        # nothing to migrate in a new, empty database
+        if not con.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+            return applied
+        for version, description, changes in MIGRATIONS:
+            if version <= schemaVersion(con):
+                changes = [
+                    c for c in changes if not c.applied(con) and not c.missing(con)
+                ]
+                if not changes:
+                    continue
+                logger.info("Migrating %s, completing v%d" % (db_path, version))
+            else:
+                logger.info("Migrating %s to v%d: %s" % (db_path, version, description))
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                # the changes are idempotent, so someone else migrating it
+                # while we waited for the lock is harmless
+                for change in changes:
+                    change.apply(con)
+                if version > schemaVersion(con):
+                    con.execute(f"PRAGMA user_version = {version}")
+                applied.append(version)
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+    finally:
+        con.close()
+    return applied
+
+
+# Create a TEMP view for each derived table this database doesn't have, with
+# the rows the table would hold, so queries of it still work (if slowly). TEMP
+# objects are per connection: call on every new connection. Returns the names
+# of the views created.
+def addFallbackViews(con):
+    views = []
+    for name, rows in DERIVED_TABLE_ROWS.items():
+        if schemaObjectExists(con, "table", name):
+            continue
+        try:
+            con.execute(f"SELECT 1 FROM ({rows}) LIMIT 0")
+            con.execute(f"CREATE TEMP VIEW IF NOT EXISTS {name} AS {rows}")
+        except sqlite3.OperationalError as e:
+            # the tables it's derived from aren't there either
+            logger.debug("No fallback view %s: %s" % (name, e))
+            continue
+        views.append(name)
+    return views
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser(prog="python -m guis.common.migrations")
+    parser.add_argument("databases", nargs="*", help="database files to migrate")
+    parser.add_argument("--local", action="store_true", help="data/database.db")
+    parser.add_argument(
+        "--network", action="store_true", help="the merge-destination database"
+    )
+    return parser.parse_args()
+
+
+def Main():
+    from guis.common.getresources import GetLocalDatabasePath, GetNetworkDatabasePath
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    options = GetOptions()
+    databases = list(options.databases)
+    if options.local:
+        databases.append(GetLocalDatabasePath())
+    if options.network:
+        databases.append(GetNetworkDatabasePath())
+    for db in databases:
+        applied = migrate(db)
+        print(
+            "%s: %s, now at v%d"
+            % (db, "applied v" + str(applied) if applied else "up to date", LATEST)
+        )
+
+
+if __name__ == "__main__":
+    Main()
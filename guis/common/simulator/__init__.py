@@ -0,0 +1,11 @@
+from guis.common.simulator.virtualport import VirtualPort
+from guis.common.simulator.devices import (
+    DEVICES,
+    DeviceModel,
+    LeakStandArduino,
+    PanelHeaterArduino,
+    ResistanceArduino,
+    StrawTensionerNano,
+    TensionBoxArduino,
+    WireTensionerMicro,
+)
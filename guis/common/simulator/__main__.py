@@ -0,0 +1,61 @@
+################################################################################
+# Run simulated devices until Ctrl-C
+#
+# Usage:
+#   python -m guis.common.simulator <device>[:key=value,...] ...
+#
+# e.g.
+#   python -m guis.common.simulator leak heater:period=0.5,noise=2,seed=1
+#
+# prints the serial device path of each one; point the GUI's port at it.
+# Devices: leak, heater, strawtensioner, wiretensioner, tensionbox, resistance
+################################################################################
+import argparse
+import time
+
+from guis.common.simulator import DEVICES, VirtualPort
+
+
+def ParseDevice(spec):
+    name, _, params = spec.partition(":")
+    if name not in DEVICES:
+        raise argparse.ArgumentTypeError(
+            "unknown device %s, choose from %s" % (name, ", ".join(DEVICES))
+        )
+    kwargs = {}
+    for param in filter(None, params.split(",")):
+        key, _, value = param.partition("=")
+        try:
+            kwargs[key] = int(value)
+        except ValueError:
+            kwargs[key] = float(value)
+    return name, DEVICES[name](**kwargs)
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser(prog="python -m guis.common.simulator")
+    parser.add_argument("devices", nargs="+", type=ParseDevice)
+    parser.add_argument(
+        "--baudrate", type=int, help="pace output like a real line at this rate"
+    )
+    return parser.parse_args()
+
+
+def Main():
+    options = GetOptions()
+    ports = []
+    for name, model in options.devices:
+        ports.append(VirtualPort(model, baudrate=options.baudrate).start())
+        print("%-15s %s" % (name, ports[-1].device), flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for port in ports:
+            port.close()
+
+
+if __name__ == "__main__":
+    Main()
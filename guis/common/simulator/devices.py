@@ -0,0 +1,372 @@
+################################################################################
+# Device models for the serial simulator
+#
+# Each model speaks the line protocol of one of the arduinos the GUIs talk to,
+# as the GUI code (and the .ino sketch next to it) expects it:
+#
+#   LeakStandArduino    guis/straw/leak/LeakTestGUI.py, LeakTestStatus
+#   PanelHeaterArduino  guis/panel/heater/PanelHeater.py, HeatControl/DataThread
+#   StrawTensionerNano  guis/panel/strawtensioner/run_straw_tensioner.py
+#   WireTensionerMicro  guis/panel/wiretensioner/wire_tension.py
+#   TensionBoxArduino   guis/panel/tensionbox/tensionbox_window.py
+#   ResistanceArduino   guis/straw/resistance/resistanceMeter.py
+#
+# A model is driven by a VirtualPort: receive() gets whatever the client
+# wrote, poll() is called whenever the model's nextOutput() time has passed,
+# and both return the lines to send back. Times are seconds since connect().
+#
+# Every model takes
+#   period - seconds between spontaneous outputs (streaming devices)
+#   noise  - scale factor on every noise term, 0 for noiseless data
+#   seed   - random seed, for reproducible runs
+# plus the physical parameters documented on the class.
+################################################################################
+import math
+import random
+
+
+class DeviceModel:
+    period = None  # s between spontaneous outputs, None if only on request
+
+    def __init__(self, period=None, noise=1.0, seed=None):
+        if period is not None:
+            self.period = period
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.start = None
+        self._next = None
+        self._buffer = b""
+
+    ## DRIVEN BY VirtualPort ##
+
+    def connect(self, now):
+        self.start = now
+        if self.period:
+            self._next = now + self.period
+        return self.banner()
+
+    # time.monotonic() of the next spontaneous output, or None
+    def nextOutput(self, now):
+        return self._next
+
+    def poll(self, now):
+        lines = []
+        while self._next is not None and now >= self._next:
+            lines += self.output(self._next - self.start)
+            self._next += self.period
+        return lines
+
+    # Split the input into lines and answer each with command()
+    def receive(self, data, now):
+        self._buffer += data
+        lines = []
+        while b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            text = line.strip(b"\r").decode(errors="replace")
+            lines += self.command(text, now - self.start)
+        return lines
+
+    ## OVERRIDDEN BY MODELS ##
+
+    # lines sent when the port opens
+    def banner(self):
+        return []
+
+    # lines sent every period
+    def output(self, t):
+        return []
+
+    # lines sent in answer to one line of input
+    def command(self, text, t):
+        return []
+
+    ## HELPERS ##
+
+    def gauss(self, sigma):
+        return self.random.gauss(0, sigma * self.noise) if self.noise else 0.0
+
+
+class LeakStandArduino(DeviceModel):
+    """
+    CO2 sensors of one leak stand row. Every period sends one reading,
+    "<chamber> <ppm>", cycling through the chambers.
+
+        chambers   - number of chambers on the row
+        background - CO2 level at the start, ppm
+        leak_rates - CO2 rise of each chamber, ppm/s
+        sigma      - reading noise, ppm
+    """
+
+    period = 0.4
+
+    def __init__(
+        self,
+        chambers=5,
+        background=400.0,
+        leak_rates=(0.002, 0.01, 0.0, 0.05, 0.004),
+        sigma=2.0,
+        **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.chambers = chambers
+        self.background = background
+        self.leak_rates = list(leak_rates) + [0.0] * (chambers - len(leak_rates))
+        self.sigma = sigma
+        self.count = 0
+
+    def output(self, t):
+        chamber = self.count % self.chambers
+        self.count += 1
+        ppm = self.background + self.leak_rates[chamber] * t + self.gauss(self.sigma)
+        return ["%d %.2f" % (chamber, ppm)]
+
+
+class PanelHeaterArduino(DeviceModel):
+    """
+    PAAS heater control box (PAAS_heater.ino). Asks for the second PAAS type,
+    then takes "<paas type><setpoint>" lines (e.g. "b55") and every period
+    reports the duty cycles and both temperatures.
+
+        ambient - starting temperature, C
+        tau     - time constant of the approach to the setpoint, s
+        sigma   - temperature noise, C
+    """
+
+    period = 1.0
+
+    def __init__(self, ambient=20.0, tau=600.0, sigma=0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.ambient = ambient
+        self.tau = tau
+        self.sigma = sigma
+        self.paas = None  # "0", "b" or "c"
+        self.setpoint = ambient
+        self.temps = [ambient, ambient]
+        self.last = 0.0
+
+    def banner(self):
+        return [
+            "Enter second PAAS type (B or C) or enter 0 if heating PAAS-A only"
+        ]
+
+    def command(self, text, t):
+        if not text:
+            return self.banner() if self.paas is None else []
+        if text[0] in "0bc":
+            self.paas = text[0]
+            try:
+                self.setpoint = float(text[1:])
+            except ValueError:
+                pass
+        return []
+
+    def output(self, t):
+        if self.paas is None:
+            return []
+        # first order approach to the setpoint, PAAS-A only if paas is "0"
+        decay = math.exp(-(t - self.last) / self.tau)
+        self.last = t
+        targets = [self.setpoint, self.setpoint if self.paas != "0" else self.ambient]
+        self.temps = [
+            target + (temp - target) * decay
+            for temp, target in zip(self.temps, targets)
+        ]
+        vals = [
+            max(0, min(255, int(10 * (target - temp))))
+            for temp, target in zip(self.temps, targets)
+        ]
+        return [
+            "valA: %d" % vals[0],
+            "valB: %d" % vals[1],
+            "Temperature 1: %.2f" % (self.temps[0] + self.gauss(self.sigma)),
+            "Temperature 2: %.2f" % (self.temps[1] + self.gauss(self.sigma)),
+            "Time = %d" % (t * 1000),
+        ]
+
+
+class StrawTensionerNano(DeviceModel):
+    """
+    Vernier force sensor on the straw tensioner (strawtensionerv1.0.ino).
+    Streams "reading <grams> <stddev>" every period while a straw settles,
+    then "end <average> <stddev>", then starts over with the next straw.
+
+        tension  - mean straw tension, grams
+        spread   - straw to straw tension spread, grams
+        readings - readings per straw before "end"
+        sigma    - reading noise, grams
+    """
+
+    period = 0.1
+
+    def __init__(
+        self, tension=800.0, spread=20.0, readings=50, sigma=3.0, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.tension = tension
+        self.spread = spread
+        self.readings = readings
+        self.sigma = sigma
+        self.count = 0
+        self.straw = self.nextStraw()
+
+    def nextStraw(self):
+        return self.tension + self.gauss(self.spread)
+
+    def output(self, t):
+        self.count += 1
+        if self.count > self.readings:
+            self.count = 0
+            average, self.straw = self.straw, self.nextStraw()
+            return ["end %.2f %.2f" % (average, self.sigma * self.noise)]
+        settle = 1 - math.exp(-self.count / (self.readings / 5))
+        reading = self.straw * settle + self.gauss(self.sigma)
+        return ["reading %.2f %.2f" % (reading, self.sigma * self.noise)]
+
+
+class WireTensionerMicro(DeviceModel):
+    """
+    Stepper motor and load cell of the wire tensioner (motor_loadcell_0326.ino).
+    Request/response: an empty line gets "<motor position>\\t<grams>",
+    c/s get the calibration factor, t[<grams>] tensions the wire, p work
+    hardens it, r resets the motor, z/z2 tare the load cell.
+
+        calibration - load cell calibration factor
+        tension     - default tension for "t", grams
+        tau         - time constant of the motor reaching a tension, s
+        sigma       - load cell noise, grams
+    """
+
+    def __init__(
+        self, calibration=-2230.0, tension=80.0, tau=1.0, sigma=0.05, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.calibration = calibration
+        self.default_tension = tension
+        self.tau = tau
+        self.sigma = sigma
+        self.target = 0.0
+        self.load = 0.0
+        self.last = 0.0
+
+    def position(self):
+        return int(1000 + 20 * self.load)
+
+    def command(self, text, t):
+        decay = math.exp(-(t - self.last) / self.tau)
+        self.last = t
+        self.load = self.target + (self.load - self.target) * decay
+
+        if not text:
+            return ["%d\t%.4f" % (self.position(), self.load + self.gauss(self.sigma))]
+        if text in ("c", "s"):
+            return ["calibration_factor %.2f" % self.calibration]
+        if text in ("z", "z2"):
+            self.load = 0.0
+            return ["tared"]
+        if text == "p":
+            return [
+                "%d\t%.4f\t%d"
+                % (self.position(), self.default_tension * 1.2, self.position())
+            ]
+        if text[0] == "t":
+            self.target = float(text[1:]) if text[1:] else self.default_tension
+            return []
+        if text == "r":
+            self.target = 0.0
+            return []
+        return []
+
+
+class TensionBoxArduino(DeviceModel):
+    """
+    Tension box vibrator (vibrator.ino). Takes a trigger line and a pulse
+    width line; trigger 5 plucks the wire/straw and sends the echo, the pulse
+    width line and 2000 ADC samples of a damped oscillation, 4 and 6 send
+    the echo and samples only.
+
+        frequency - resonant frequency, Hz
+        amplitude - initial amplitude, ADC counts
+        tau       - damping time, s
+        sigma     - ADC noise, counts
+    """
+
+    samples = 2000  # DataLength in the sketch
+    rate = 8900.0  # Hz
+
+    def __init__(
+        self, frequency=80.0, amplitude=400.0, tau=0.1, sigma=3.0, **kwargs
+    ):
+        super().__init__(**kwargs)
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.tau = tau
+        self.sigma = sigma
+        self.trigger = None
+
+    def command(self, text, t):
+        if self.trigger is None:
+            self.trigger = text
+            return []
+        trigger, self.trigger = self.trigger, None
+        lines = [trigger]
+        if trigger == "5":
+            lines.append("Using a pulse of width (in microseconds): " + text)
+        elif trigger not in ("4", "6"):
+            return []
+        amplitude = 0.0 if trigger == "6" else self.amplitude
+        phase = self.random.uniform(0, 2 * math.pi)
+        for i in range(self.samples):
+            s = i / self.rate
+            value = amplitude * math.exp(-s / self.tau) * math.sin(
+                2 * math.pi * self.frequency * s + phase
+            )
+            value = int(round(value + self.gauss(self.sigma)))
+            # 14 bit two's complement-ish, as decoded in TensionBox.ping10
+            lines.append(str(value if value >= 0 else value + 16383))
+        return lines
+
+
+class ResistanceArduino(DeviceModel):
+    """
+    Straw resistance pallet reader (resistanceMeter.py). "y" sets averaging,
+    "<letter>r" measures one of the 16 letters a-p and answers
+    "<letter>,<6 ADC counts>".
+
+        counts - mean ADC count, 0-1023
+        sigma  - ADC noise, counts
+    """
+
+    letters = "abcdefghijklmnop"
+
+    def __init__(self, counts=512.0, sigma=2.0, **kwargs):
+        super().__init__(**kwargs)
+        self.counts = counts
+        self.sigma = sigma
+        self.letter = None
+
+    def banner(self):
+        return ["Resistance arduino ready"]
+
+    # commands are single characters, not lines
+    def receive(self, data, now):
+        lines = []
+        for char in data.decode(errors="replace"):
+            if char in self.letters:
+                self.letter = char
+            elif char == "r" and self.letter is not None:
+                counts = [self.counts + self.gauss(self.sigma) for _ in range(6)]
+                counts = ["%d" % max(0, min(1023, round(c))) for c in counts]
+                lines.append(",".join([self.letter] + counts))
+                self.letter = None
+        return lines
+
+
+# name used on the command line : model
+DEVICES = {
+    "leak": LeakStandArduino,
+    "heater": PanelHeaterArduino,
+    "strawtensioner": StrawTensionerNano,
+    "wiretensioner": WireTensionerMicro,
+    "tensionbox": TensionBoxArduino,
+    "resistance": ResistanceArduino,
+}
@@ -0,0 +1,109 @@
+################################################################################
+# VirtualPort: a pseudo-terminal that a DeviceModel answers on
+#
+# Opens a pty pair and serves a device model on the master side from a
+# thread. The slave side is an ordinary serial device path (/dev/pts/N), so
+# any code that does serial.Serial(port=...) can be pointed at it unchanged:
+#
+#   with VirtualPort(WireTensionerMicro()) as port:
+#       micro = serial.Serial(port=port.device, baudrate=9600, timeout=0.08)
+#
+# Linux/macOS only (needs os.openpty).
+################################################################################
+import collections
+import os
+import select
+import threading
+import time
+import tty
+
+
+class VirtualPort:
+    def __init__(self, model, baudrate=None, history=100000):
+        self.model = model
+        # If set, output is paced like a real line at this baud rate
+        # (10 bits per byte), otherwise it's written as fast as it's read.
+        self.baudrate = baudrate
+        # (line number, time.monotonic()) of the last lines written, taken
+        # just before writing, for latency measurements
+        self.sent = collections.deque(maxlen=history)
+        self.lines_sent = 0
+        self.bytes_received = 0
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)  # no echo, no line editing
+        self.device = os.ttyname(self._slave)
+        self._stop = threading.Event()
+        self._thread = None
+
+    ## CONTROL ##
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="VirtualPort " + self.device, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # time.monotonic() the n-th line (from 0) was written, None if it's no
+    # longer in the history
+    def sentTime(self, n):
+        try:
+            number, sent = self.sent[n - self.sent[0][0]]
+        except IndexError:
+            return None
+        return sent if number == n else None
+
+    ## SERVING ##
+
+    def _run(self):
+        self._write(self.model.connect(time.monotonic()))
+        while not self._stop.is_set():
+            now = time.monotonic()
+            wait = self.model.nextOutput(now)
+            wait = 0.05 if wait is None else min(max(wait - now, 0), 0.05)
+            readable, _, _ = select.select([self._master], [], [], wait)
+            now = time.monotonic()
+            if readable:
+                try:
+                    data = os.read(self._master, 4096)
+                except OSError:  # closed
+                    break
+                self.bytes_received += len(data)
+                self._write(self.model.receive(data, now))
+            self._write(self.model.poll(now))
+
+    def _write(self, lines):
+        for line in lines:
+            data = line.encode() + b"\r\n"  # Serial.println
+            self.sent.append((self.lines_sent, time.monotonic()))
+            self.lines_sent += 1
+            view = memoryview(data)
+            while view and not self._stop.is_set():
+                # don't block forever if nobody reads
+                _, writable, _ = select.select([], [self._master], [], 0.05)
+                if writable:
+                    view = view[os.write(self._master, view) :]
+            if self.baudrate:
+                time.sleep(len(data) * 10 / self.baudrate)
@@ -0,0 +1,358 @@
+################################################################################
+# Write-behind queue for DatabaseManager
+#
+# In write-behind mode (DM.startWriteBehind()) commitEntry/commitEntries do not
+# commit on the calling (GUI) thread. The entries are handed to a WriteBehind
+# thread with its own session, which merges them, commits them in batches
+# and retries when the database is locked by the merger or another station --
+# the GUI thread never waits on SQLite's busy timeout.
+#
+# How entries change hands:
+#   - on the GUI thread, submit() copies the column values to be written into
+#     plain dicts; the writer thread only ever sees those, never the GUI's
+#     objects, and builds its own copies from them
+#   - new rows are taken out of the GUI session; changed rows loaded by the
+#     GUI stay in it and stay dirty. While write-behind is on the GUI session
+#     doesn't autoflush, so they're only written by the writer
+#   - once a write is durable, DM.sync() (or the next commit) marks its
+#     changed rows clean and re-attaches its new rows with their ids and
+#     defaults, on the GUI thread. A failed write leaves them as they were,
+#     to be committed again, and DM.sync() raises its error
+#   - a row queued again before its first write landed is written by both
+#     writes in turn, the second updating the row the first inserted; submit()
+#     never waits for the writer
+#   - a database that stays locked for lock_timeout s fails the write. DM
+#     gives the writer connections with a short busy timeout, so each try
+#     waits on SQLite for a second at most
+#
+# So until a write is durable, the GUI session does not see new rows in query
+# results, and they have no id. Code that needs either waits first:
+#   pending = procedure.commit()    # a PendingWrite in write-behind mode
+#   pending.wait()                  # this write is committed, or raises
+#   DM.sync()                       # everything queued so far is committed
+################################################################################
+import collections, queue, threading, time
+
+from sqlalchemy import inspect
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+import logging
+
+logger = logging.getLogger("root")
+
+
+class DatabaseLocked(Exception):
+    pass
+
+
+class PendingWrite:
+    def __init__(self, entries, rows):
+        self.entries = entries
+        # (class, {column: value}, new, (PendingWrite, index) of the same new
+        # row queued earlier or None) of each entry
+        self.rows = rows
+        self.written = None  # {column: value} of each entry once durable
+        self.queued = time.monotonic()
+        self.committed = None  # time.monotonic() when durable
+        self.error = None
+        self._done = threading.Event()
+
+    def done(self):
+        return self._done.is_set()
+
+    # Block until the write is committed; re-raises the error if it failed
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("write still queued after %s s" % timeout)
+        if self.error is not None:
+            raise self.error
+        return True
+
+    def _finish(self, error=None):
+        self.error = error
+        self.committed = time.monotonic()
+        self._done.set()
+
+
+class WriteBehind(threading.Thread):
+    def __init__(self, Session, max_batch=500, retry_interval=0.5, lock_timeout=30.0):
+        threading.Thread.__init__(self, name="WriteBehind", daemon=True)
+        # Writer's own session, copies stay loaded after commit
+        self._session = Session(expire_on_commit=False)
+        self.max_batch = max_batch  # most writes per commit
+        self.retry_interval = retry_interval  # s between tries of a locked DB
+        self.lock_timeout = lock_timeout  # s of a locked DB before failing
+        self._queue = queue.Queue()
+        self._pending = collections.deque()  # PendingWrites not yet durable
+        self._finished = []  # PendingWrites done, for reattach()
+        self._errors = []  # of failed writes, for errors()
+        self._new = {}  # id(new row) : PendingWrite it's queued in
+        self._lock = threading.Lock()
+
+        ## Statistics, see stats()
+        self.batches = 0
+        self.writes = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=1000)  # queued -> durable, s
+        self.commit_times = collections.deque(maxlen=1000)  # per batch, s
+
+    ## CALLED FROM THE GUI THREAD ##
+
+    def submit(self, gui_session, entries):
+        entries = list(entries)
+        self.reattach(gui_session)
+        rows = []
+        for entry in entries:
+            state = inspect(entry)
+            if state.pending:
+                gui_session.expunge(entry)
+            new = state.key is None
+            # A new row queued a moment ago has no id yet: the writer gives
+            # this write the row that one inserted
+            with self._lock:
+                earlier = self._new.get(id(entry)) if new else None
+            if earlier is not None:
+                index = next(i for i, e in enumerate(earlier.entries) if e is entry)
+                earlier = (earlier, index)
+            rows.append((state.class_, self._snapshot(state), new, earlier))
+
+        pending = PendingWrite(entries, rows)
+        with self._lock:
+            for entry, (_, _, new, _) in zip(entries, rows):
+                if new:
+                    self._new[id(entry)] = pending
+            self._pending.append(pending)
+        self._queue.put(pending)
+        return pending
+
+    # The column values the writer needs: all of a new row's, the primary
+    # key and the changed columns of a loaded one
+    @staticmethod
+    def _snapshot(state):
+        new = state.key is None
+        primary_key = {column.key for column in state.mapper.primary_key}
+        values = {}
+        for attr in state.mapper.column_attrs:
+            if attr.key not in state.dict:
+                continue
+            if (
+                new
+                or attr.key in primary_key
+                or state.attrs[attr.key].history.has_changes()
+            ):
+                values[attr.key] = state.dict[attr.key]
+        return values
+
+    # Wait for everything queued so far
+    def sync(self, timeout=None):
+        with self._lock:
+            pending = list(self._pending)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for write in pending:
+            left = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not write._done.wait(left):
+                raise TimeoutError("%d writes still queued" % len(self._pending))
+
+    # Mark the rows of the writes done since the last call as written: the
+    # changed rows clean, the new rows detached with their ids and added back
+    # to gui_session. The rows of writes that failed are left as they were,
+    # and their errors kept for errors().
+    def reattach(self, gui_session):
+        with self._lock:
+            finished, self._finished = self._finished, []
+            queued = {id(e) for write in self._pending for e in write.entries}
+        for write in finished:
+            if write.error is not None:
+                self._errors.append(write.error)
+                continue
+            for entry, values in zip(write.entries, write.written):
+                # queued again since: that write will settle it
+                if id(entry) in queued:
+                    continue
+                self._adopt(entry, values)
+                if inspect(entry).detached:
+                    gui_session.add(entry)
+
+    # Errors of the writes that failed since the last call
+    def errors(self):
+        errors, self._errors = self._errors, []
+        return errors
+
+    # Give a row the values it was written with as its committed ones, unless
+    # it was changed again since; those stay changed
+    @staticmethod
+    def _adopt(entry, values):
+        state = inspect(entry)
+        changed = {
+            key: state.dict[key]
+            for key, value in values.items()
+            if key in state.dict and state.dict[key] != value
+        }
+        for key, value in values.items():
+            if key not in changed:
+                set_committed_value(entry, key, value)
+        if state.transient:
+            # a new row's changes since aren't changes yet: make them so
+            for key in changed:
+                set_committed_value(entry, key, values[key])
+            make_transient_to_detached(entry)
+            for key, value in changed.items():
+                setattr(entry, key, value)
+
+    def stop(self, timeout=None):
+        self._queue.put(None)
+        self.join(timeout)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        commit_times = list(self.commit_times)
+        return {
+            "queue_depth": self._queue.qsize(),
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "writes": self.writes,
+            "failed": self.failed,
+            "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+            "latency_max": max(latencies) if latencies else None,
+            "commit_mean": (
+                sum(commit_times) / len(commit_times) if commit_times else None
+            ),
+            "commit_max": max(commit_times) if commit_times else None,
+        }
+
+    ## WRITER THREAD ##
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [write for write in batch if write is not None]
+            if batch:
+                self._write(batch)
+        self._session.close()
+
+    def _write(self, batch):
+        start = time.monotonic()
+        try:
+            self._commit(batch)
+        except DatabaseLocked as e:
+            # trying each write alone would only wait out the lock again
+            logger.error("Write-behind commit failed: %s" % e)
+            for write in batch:
+                self.failed += 1
+                self._done(write, e)
+        except Exception:
+            # find the bad write(s), commit the rest
+            for write in batch:
+                try:
+                    self._commit([write])
+                except Exception as e:
+                    logger.error("Write-behind commit failed: %s" % e)
+                    self.failed += 1
+                    self._done(write, e)
+        else:
+            self.batches += 1
+        self.commit_times.append(time.monotonic() - start)
+
+    def _commit(self, writes):
+        session = self._session
+        deadline = time.monotonic() + self.lock_timeout
+        tries = 0
+        while True:
+            try:
+                copies = self._merge(writes)
+                session.commit()
+                break
+            except Exception as e:
+                session.rollback()
+                if "database is locked" not in str(e):
+                    raise
+                tries += 1
+                if time.monotonic() + self.retry_interval > deadline:
+                    raise DatabaseLocked(
+                        "database still locked after %d tries in %g s"
+                        % (tries, self.lock_timeout)
+                    ) from e
+                logger.info("Write-behind: database locked, retrying")
+                time.sleep(self.retry_interval)
+        for write, written in zip(writes, copies):
+            # plain values again, for reattach() on the GUI thread
+            write.written = [
+                self._columns(copy) if new else values
+                for copy, (_, values, new, _) in zip(written, write.rows)
+            ]
+            self.writes += 1
+            self._done(write)
+        session.expunge_all()
+
+    # Merge the writes' rows into the writer's session, in order. Returns the
+    # writer's copy of each row, write by write.
+    def _merge(self, writes):
+        copies = {}  # (id(write), index) : copy, of the writes merged here
+        merged = []
+        for write in writes:
+            written = []
+            for index, (cls, values, new, earlier) in enumerate(write.rows):
+                copy = None
+                if earlier is not None:
+                    copy = copies.get((id(earlier[0]), earlier[1]))
+                if copy is not None:
+                    # the same new row, earlier in this batch
+                    for key, value in values.items():
+                        setattr(copy, key, value)
+                else:
+                    if earlier is not None and earlier[0].written is not None:
+                        # inserted by an earlier batch: update that row
+                        values = dict(values, **self._key(cls, earlier))
+                    copy = self._session.merge(self._copy(cls, values))
+                copies[(id(write), index)] = copy
+                written.append(copy)
+            merged.append(written)
+        return merged
+
+    # The primary key values an earlier write inserted a row with
+    @staticmethod
+    def _key(cls, earlier):
+        write, index = earlier
+        mapper = inspect(cls)
+        keys = [
+            mapper.get_property_by_column(column).key for column in mapper.primary_key
+        ]
+        return {key: write.written[index][key] for key in keys}
+
+    # The writer's own instance of a row, from its snapshot
+    @staticmethod
+    def _copy(cls, values):
+        copy = inspect(cls).class_manager.new_instance()
+        for key, value in values.items():
+            setattr(copy, key, value)
+        return copy
+
+    # A written row's columns (id, defaults) as plain values
+    @staticmethod
+    def _columns(copy):
+        state = inspect(copy)
+        return {
+            attr.key: state.dict[attr.key]
+            for attr in state.mapper.column_attrs
+            if attr.key in state.dict
+        }
+
+    def _done(self, write, error=None):
+        with self._lock:
+            self._pending.remove(write)
+            self._finished.append(write)
+            for entry in write.entries:
+                if self._new.get(id(entry)) is write:
+                    del self._new[id(entry)]
+        write._finish(error)
+        if error is None:
+            self.latencies.append(write.committed - write.queued)
@@ -10,6 +10,8 @@ import sys, time, csv, os, tkinter, tkinter.messagebox, itertools, statistics
 from datetime import timedelta
 
 import logging
+import threading  # for loading panel data off the gui thread
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib import cm
 
 logger = logging.getLogger("root")
@@ -35,7 +37,7 @@ from PyQt5.QtWidgets import (
 
 # mostly for gui window management, QPen and QSize are for plotting
 from PyQt5.QtGui import QBrush, QIcon, QPen
-from PyQt5.QtCore import Qt, QPointF
+from PyQt5.QtCore import Qt, QPointF, pyqtSignal
 
 # for time formatting
 from datetime import datetime
@@ -85,6 +87,31 @@ class TimeScaleDraw(qwt.QwtScaleDraw):
 
 class facileDBGUI(QMainWindow):
 
+    # emitted from a loader thread when one part of a panel has been found
+    # arguments: load number, part name, bool true if any data found
+    PanelPartLoaded = pyqtSignal(int, str, bool)
+
+    # tables reflected once when connecting, see initSQLTables
+    REFLECTED_TABLES = [
+        "straw_location",
+        "procedure",
+        "procedure_timestamp",
+        "comment",
+        "panel_part_use",
+        "panel_part",
+        "procedure_details_pan1",
+        "procedure_details_pan2",
+        "procedure_details_pan3",
+        "procedure_details_pan8",
+        "measurement_straw_tension",
+        "measurement_wire_tension",
+        "measurement_pan5",
+        "panel_heat",
+        "measurement_tensionbox",
+        "bad_wire_straw",
+        "leak_final_form",
+    ]
+
     # fmt: off
     # ██╗███╗   ██╗██╗████████╗██╗ █████╗ ██╗     ██╗███████╗███████╗
     # ██║████╗  ██║██║╚══██╔══╝██║██╔══██╗██║     ██║╚══███╔╝██╔════╝
@@ -129,6 +156,18 @@ class facileDBGUI(QMainWindow):
         # to go somewhere, and nobody cares about individual heat measurements
         self.data = PanelData()
 
+        # panel data is found by a pool of loader threads, each with its own
+        # connection, so the gui stays responsive during a lookup
+        self.loader = ThreadPoolExecutor(max_workers=4)
+        self.loaderLocal = threading.local()
+        self.loaderConnections = []  # every thread's, closed by closeConnections
+        self.connectionLock = threading.Lock()
+        self.reflectLock = threading.Lock()
+        self.loadNumber = 0  # incremented for every panel lookup
+        self.loadPending = set()  # parts of the current lookup not found yet
+        self.loadHasData = False
+        self.PanelPartLoaded.connect(self.panelPartLoaded)
+
         # happy 4th of July :)
         if datetime.today().month == 7 and datetime.today().day < 5:
             self.changeColor((255,255,255), (10,49,97),(179,25,66), (179,25,66))
@@ -137,6 +176,7 @@ class facileDBGUI(QMainWindow):
     # parameters: event = close window button clicked signal(?)
     # returns: nothing returned
     def closeEvent(self, event):
+        self.closeConnections()
         sys.exit()  # kill program
         # this is necessary since using the pyplot.show() makes python think there's another app running, so closing the gui
         # won't close the program if you used the plot button (so you'd have a python process still running in the background
@@ -158,9 +198,12 @@ class facileDBGUI(QMainWindow):
         def connectSpecial(dbPath):
             print("Attempting connection to database:", database)
             ro_sql3_connection_uri = "file:" + str(database) + "?mode=ro"
+            # each connection is only used by the thread that opened it, but
+            # closeConnections closes them all from the gui thread
             return sqlite3.connect(
                 ro_sql3_connection_uri,
                 uri=True,
+                check_same_thread=False,
             )
 
         # The first argument of create_engine is usually
@@ -172,12 +215,12 @@ class facileDBGUI(QMainWindow):
         # arbitrary (function that returns an) connection, which will bipass
         # that abspath call. Note: you must still specify the dialect (sqlite)
         # in the first arg.
+        # NullPool: every thread opens its own connection (see connection),
+        # sqlite connections can't be shared between threads
         self.engine = sqla.create_engine(
-            "sqlite:///", creator=connectSpecial
+            "sqlite:///", creator=connectSpecial, poolclass=sqla.pool.NullPool
         )  # create engine
 
-        self.connection = self.engine.connect()  # connect engine with DB
-
         # Test RO mode. This SHOULD throw an exception.
         try:
             # although a write command, I think it does NOTHING
@@ -197,18 +240,57 @@ class facileDBGUI(QMainWindow):
         self.initSQLTables()  # create important tables
         self.disableButtons() # disable all input except panel entry/submit
 
+    # connection to the database for the calling thread, opened on first use
+    # the gui thread and each loader thread get their own
+    @property
+    def connection(self):
+        if getattr(self.loaderLocal, "connection", None) is None:
+            self.loaderLocal.connection = self.engine.connect()
+            with self.connectionLock:
+                self.loaderConnections.append(self.loaderLocal.connection)
+        return self.loaderLocal.connection
+
+    # stop the loader threads and close every thread's connection
+    # lookups still queued are dropped, one running is waited for
+    # parameters: no parameters
+    # returns: nothing returned
+    def closeConnections(self):
+        self.loadNumber += 1  # queued lookups see they're stale
+        self.loader.shutdown(wait=True)
+        with self.connectionLock:
+            connections, self.loaderConnections = self.loaderConnections, []
+        for connection in connections:
+            connection.close()
+
     # initialize important tables
+    # reflects every table the find functions use once, up front, so lookups
+    # don't reflect anything and the loader threads only read self.metadata
     # parameters: no parameters
     # returns: nothing returned
     def initSQLTables(self):
-        # straw_location (panels)
-        self.panelsTable = sqla.Table(
-            "straw_location", self.metadata, autoload=True, autoload_with=self.engine
+        existing = set(sqla.inspect(self.engine).get_table_names())
+        self.metadata.reflect(
+            bind=self.engine,
+            only=[t for t in self.REFLECTED_TABLES if t in existing],
         )
+        # straw_location (panels)
+        self.panelsTable = self.table("straw_location")
         # procedure (each different pro for each panel pro3 for mn100, pro6 for mn050, etc)
-        self.proceduresTable = sqla.Table(
-            "procedure", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        self.proceduresTable = self.table("procedure")
+
+    # get a reflected table
+    # parameters: name, str name of the table
+    # returns: sqla.Table
+    def table(self, name):
+        try:
+            return self.metadata.tables[name]
+        except KeyError:
+            # not reflected in initSQLTables, raises NoSuchTableError if
+            # the table doesn't exist
+            with self.reflectLock:
+                return sqla.Table(
+                    name, self.metadata, autoload=True, autoload_with=self.engine
+                )
 
     # initialize lists of widgets for organization and easy access
     # parameters: no parameters
@@ -551,9 +633,8 @@ class facileDBGUI(QMainWindow):
     # - checks to see if the text in self.ui.panelLE is a panel with data
     # - if not it shows an error and returns early
     # - removes all data from widgets and self.data
-    # - calls findPanelData to get data from DB
-    # - if findPanelData returns false it shows an error and returns early
-    # - calls displayPanelData to put data on the gui
+    # - calls startPanelLoad to get data from DB on the loader threads
+    # - each part of the data is put on the gui as it arrives (panelPartLoaded)
     # parameters: no parameters
     # returns: nothing returned
     def submitClicked(self):
@@ -577,24 +658,127 @@ class facileDBGUI(QMainWindow):
         # clear all widgets except entry widget
         self.clearWidgets()
 
-        # call self.findPanelData to attempt to get data
+        # call self.startPanelLoad to attempt to get data
         # if no data is found show an error and return early
-        if not self.findPanelData():
-            tkinter.messagebox.showerror(
-                title="Error",
-                message=f"No data was found for MN{(self.ui.panelLE.text()).zfill(3)}.",
-            )
-            return
+        if not self.startPanelLoad():
+            self.showNoDataError()
 
-        # put data on the gui
-        self.displayPanelData()
+    # error popup for a panel without data
+    # parameters: no parameters
+    # returns: nothing returned
+    def showNoDataError(self):
+        tkinter.messagebox.showerror(
+            title="Error",
+            message=f"No data was found for MN{str(self.data.humanID).zfill(3)}.",
+        )
+
+    # finds the panel and its procedures, then hands the rest of the "find"
+    # functions to the loader threads.  Only one lookup runs at a time, the
+    # submit button is disabled until it's done.
+    # parameters: no parameters
+    # returns: bool, false if the panel or its procedures weren't found
+    def startPanelLoad(self):
+        # find new database ID
+        self.data.dbID = self.findPanelDatabaseID()
+        if self.data.dbID == -1:
+            return False
+        # without procedures the panel doesn't have any data
+        if not self.findProcedures():
+            return False
+
+        self.loadNumber += 1
+        self.loadPending = set(self.panelLoadParts())
+        self.loadHasData = False
+        self.ui.submitPB.setDisabled(True)
+        self.ui.panelLE.setDisabled(True)
+        for part, find in self.panelLoadParts().items():
+            self.loader.submit(self.loadPanelPart, self.loadNumber, part, find)
+        return True
+
+    # the "find" functions run by startPanelLoad, by part name
+    # each part writes to its own members of self.data
+    # parameters: no parameters
+    # returns: dict, part name : function returning true if any data found
+    def panelLoadParts(self):
+        return {
+            # find pro timing (events like start, pause, etc.)
+            "timing": self.findProTiming,
+            "comments": self.findComments,
+            "parts": self.findParts,
+            # straw and wire tension data
+            "straws": self.findStraws,
+            "wires": self.findWires,
+            "hv": lambda: any(
+                [
+                    self.findSpecificHV(3, 1100),
+                    self.findSpecificHV(3, 1500),
+                    self.findSpecificHV(6, 1500),
+                ]
+            ),
+            "heat": lambda: any(
+                [
+                    self.findSpecificHeat(1),
+                    self.findSpecificHeat(2),
+                    self.findSpecificHeat(6),
+                ]
+            ),
+            "tb": lambda: any([self.findSpecificTB(3), self.findSpecificTB(6)]),
+            "pro8": self.findPro8,
+        }
 
-        self.ui.hvProBox.setEnabled(True)
-        self.ui.hvProBox_2.setEnabled(True)
-        self.ui.heatProBox.setEnabled(True)
-        self.ui.heatProBox_2.setEnabled(True)
-        self.ui.tbProBox.setEnabled(True)
-        self.ui.tbProBox_2.setEnabled(True)
+    # runs on a loader thread, calls one "find" function and reports back
+    # to the gui thread through PanelPartLoaded
+    # parameters: number, int load number the part belongs to
+    #             part, str name of the part
+    #             find, function to call
+    # returns: nothing returned
+    def loadPanelPart(self, number, part, find):
+        if number != self.loadNumber:  # another panel was asked for since
+            return
+        try:
+            found = bool(find())
+        except Exception:
+            logger.exception(f"Failed to find {part} data")
+            found = False
+        self.PanelPartLoaded.emit(number, part, found)
+
+    # runs on the gui thread when a part has been found, puts it on the gui
+    # parameters: number, int load number the part belongs to
+    #             part, str name of the part
+    #             found, bool true if any data found
+    # returns: nothing returned
+    def panelPartLoaded(self, number, part, found):
+        if number != self.loadNumber:
+            return
+        displays = {
+            "timing": self.displayProTiming,
+            "comments": self.displayComments,
+            "parts": self.displayParts,
+            "straws": self.displayStraws,
+            "wires": self.displayWires,
+            "hv": lambda: self.enableProBoxes("hv"),
+            "heat": lambda: self.enableProBoxes("heat"),
+            "tb": lambda: self.enableProBoxes("tb"),
+            "pro8": self.displayPro8,
+        }
+        displays[part]()
+        # timing alone doesn't count as data (same as findPanelData)
+        if part != "timing":
+            self.loadHasData = self.loadHasData or found
+        self.loadPending.discard(part)
+
+        if not self.loadPending:
+            self.ui.submitPB.setEnabled(True)
+            self.ui.panelLE.setEnabled(True)
+            if not self.loadHasData:
+                self.showNoDataError()
+
+    # enables the pro combo boxes for hv, heat, or tb data
+    # parameters: kind, str "hv", "heat", or "tb"
+    # returns: nothing returned
+    def enableProBoxes(self, kind):
+        self.getWid(f"{kind}ProBox").setEnabled(True)
+        self.getWid(f"{kind}ProBox_2").setEnabled(True)
 
     # parameters: ???
     # returns: nothing returned
@@ -820,6 +1004,8 @@ class facileDBGUI(QMainWindow):
 
     # findPanelData fetches data from the DB and puts it into self.data
     # it does NOT put data into the widgets, displayPanelData does that
+    # (submitClicked uses startPanelLoad instead, which runs the same "find"
+    # functions on the loader threads)
     # parameters: no parameters
     # returns: bool, true if any data was found for the panel
     def findPanelData(self):
@@ -943,9 +1129,7 @@ class facileDBGUI(QMainWindow):
     # returns: bool, true if any data found, false otherwise
     def findProTiming(self):
         # make table for procedure_timestamp
-        timing = sqla.Table(
-            "procedure_timestamp", self.metadata, autoload=True, autoload_with=self.engine,
-        )
+        timing = self.table("procedure_timestamp")
 
         # function to get specific process data
         # it will be used once for each pro
@@ -1008,9 +1192,7 @@ class facileDBGUI(QMainWindow):
     # returns: bool, true if any data found, false otherwise
     def findComments(self):
         # make table
-        comments = sqla.Table(
-            "comment", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        comments = self.table("comment")
         # make query
         comQuery = sqla.select(
             [
@@ -1052,13 +1234,9 @@ class facileDBGUI(QMainWindow):
     # returns: bool, true if any data found, false otherwise
     def findParts(self):
         # panel_part_use    --> panelPartUsage
-        panelPartUsage = sqla.Table(
-            "panel_part_use", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        panelPartUsage = self.table("panel_part_use")
         # panel_part        --> panelPartActual
-        panelPartActual = sqla.Table(
-            "panel_part", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        panelPartActual = self.table("panel_part")
 
         partsQuery = sqla.select(
             [  # why are the first three in here??
@@ -1129,9 +1307,7 @@ class facileDBGUI(QMainWindow):
         #   pan1_procedure(this panels procedure) --> straw_location(LPAL type)
 
         # procedure_details_pan1        --> pan1Pros
-        pan1Pros = sqla.Table(
-            "procedure_details_pan1", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        pan1Pros = self.table("procedure_details_pan1")
 
         lpal1Query = sqla.select([self.panelsTable.columns.number]
         ).select_from(
@@ -1158,9 +1334,7 @@ class facileDBGUI(QMainWindow):
 
         # otherwise repeat for pro 2
         # procedure_details_pan2        --> pan2Pros
-        pan2Pros = sqla.Table(
-            "procedure_details_pan2", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        pan2Pros = self.table("procedure_details_pan2")
 
         lpal2Query = sqla.select([self.panelsTable.columns.number]
         ).select_from(
@@ -1191,9 +1365,7 @@ class facileDBGUI(QMainWindow):
         if self.data.proIDs["pan3"] == -1:
             return False
 
-        pan3Pros = sqla.Table(
-            "procedure_details_pan3", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        pan3Pros = self.table("procedure_details_pan3")
 
         spoolQuery = sqla.select([
             pan3Pros.columns.wire_spool,
@@ -1222,12 +1394,7 @@ class facileDBGUI(QMainWindow):
         # check if pro 2 exists
         if self.data.proIDs["pan2"] == -1:
             return False
-        strawTensions = sqla.Table(
-            "measurement_straw_tension",
-            self.metadata,
-            autoload=True,
-            autoload_with=self.engine,
-        )
+        strawTensions = self.table("measurement_straw_tension")
 
         strawTensionQuery = sqla.select(
             [  # select
@@ -1278,12 +1445,7 @@ class facileDBGUI(QMainWindow):
         if self.data.proIDs["pan3"] == -1:
             return False
 
-        wireTensions = sqla.Table(
-            "measurement_wire_tension",
-            self.metadata,
-            autoload=True,
-            autoload_with=self.engine,
-        )
+        wireTensions = self.table("measurement_wire_tension")
 
         wireTensionQuery = sqla.select(
             [  # select:
@@ -1327,12 +1489,7 @@ class facileDBGUI(QMainWindow):
         if self.data.proIDs[f'pan{pro}'] == -1:
             return False
 
-        hvTable = sqla.Table(
-            "measurement_pan5",
-            self.metadata,
-            autoload=True,
-            autoload_with=self.engine,
-        )
+        hvTable = self.table("measurement_pan5")
 
         hvQuery = sqla.select(          # get...
             [
@@ -1397,9 +1554,7 @@ class facileDBGUI(QMainWindow):
         if self.data.proIDs[f'pan{pro}'] == -1:
             return False
 
-        panelHeats = sqla.Table(
-            "panel_heat", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        panelHeats = self.table("panel_heat")
 
         heatQuery = sqla.select(
             [
@@ -1441,9 +1596,7 @@ class facileDBGUI(QMainWindow):
         if self.data.proIDs[f'pan{pro}'] == -1:
             return False
 
-        panelTension = sqla.Table(
-            "measurement_tensionbox", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        panelTension = self.table("measurement_tensionbox")
 
         tbQuery = sqla.select(
             [
@@ -1479,31 +1632,16 @@ class facileDBGUI(QMainWindow):
     # finds QC data and puts it into panelData.
     # parameters: int, pro is the process to find data for (3 or 6)
     # returns: bool, true if any data found, false otherwise
+    # (the pro 8 widgets are cleared by clearWidgets, this runs off the gui thread)
     def findPro8(self):
-
-        self.ui.leaksLW.clear()
-        self.ui.badStrawsLW.clear()
-        self.ui.badWiresLW.clear()
-        self.ui.left_coverLE.clear()
-        self.ui.left_ringLE.clear()
-        self.ui.right_coverLE.clear()
-        self.ui.right_ringLE.clear()
-        self.ui.center_coverLE.clear()
-        self.ui.center_ringLE.clear()
         # check if desired pro exists
         if self.data.proIDs['pan8'] == -1:
             return False
 
         # make necessary tables
-        badSW = sqla.Table(
-            "bad_wire_straw", self.metadata, autoload=True, autoload_with=self.engine
-        )
-        methaneLeak = sqla.Table(
-            "leak_final_form", self.metadata, autoload=True, autoload_with=self.engine
-        )
-        pro8Parts = sqla.Table(
-            "procedure_details_pan8", self.metadata, autoload=True, autoload_with=self.engine
-        )
+        badSW = self.table("bad_wire_straw")
+        methaneLeak = self.table("leak_final_form")
+        pro8Parts = self.table("procedure_details_pan8")
 
         # bad straws and wires
         badSWQuery = sqla.select(
@@ -1586,6 +1724,14 @@ class facileDBGUI(QMainWindow):
         self.displayComments()
         self.displayParts()
         self.displayPro8()
+        self.displayWires()
+        self.displayStraws()
+        return
+
+    # puts wire tension data on the gui
+    # parameters: no parameters
+    # returns: nothing returned
+    def displayWires(self):
         self.displayOnLists(
             3,
             self.data.wireData,
@@ -1602,6 +1748,11 @@ class facileDBGUI(QMainWindow):
             "Tension",1,
             self.ui.wireGraphLayout
         )
+
+    # puts straw tension data on the gui
+    # parameters: no parameters
+    # returns: nothing returned
+    def displayStraws(self):
         self.displayOnLists(
             2,
             self.data.strawData,
@@ -1620,7 +1771,6 @@ class facileDBGUI(QMainWindow):
             errorBars=True,
             eIndex=3
         )
-        return
 
     # puts part IDs on the gui
     # parameters: no parameters
@@ -37,12 +37,9 @@ from guis.common.panguilogger import SetupPANGUILogger
 
 logger = SetupPANGUILogger("root")
 
-from guis.common.getresources import GetProjectPaths, pkg_resources
-import resources
+from guis.common.getresources import GetProjectPaths, GetRootDirectory
 
 import inspect
-import pyautogui
-from PIL import Image
 from datetime import datetime
 from threading import Thread, enumerate as enumerateThreads
 
@@ -58,6 +55,7 @@ from PyQt5.QtCore import (
     pyqtBoundSignal,
     pyqtSlot,
     QDate,
+    QTimer,
 )
 from PyQt5.QtGui import (
     QRegularExpressionValidator,
@@ -100,25 +98,18 @@ from guis.panel.pangui.suppliesList import SuppliesList
 from guis.panel.pangui.dialogBox import DialogBox
 from guis.panel.pangui.stepsList import StepList
 import serial.tools.list_ports
-from guis.common.dataProcessor import MultipleDataProcessor as DataProcessor
-from guis.panel.strawtensioner.run_straw_tensioner import StrawTension
-from guis.panel.wiretensioner.wire_tension import WireTensionWindow
-from guis.panel.tensionbox.tensionbox_window import TensionBox
-from guis.panel.heater.PanelHeater import HeatControl
-from guis.panel.hv.hvGUImain import highVoltageGUI
 from guis.common.gui_utils import generateBox
 
+# The data processor (SQLAlchemy, the database) and the device windows
+# (matplotlib, scipy, ...) are imported where they're first used, see
+# importDeferredModules() at the bottom of this file.
+
 # from guis.panel.resistance.run_test import run_test
 # from guis.panel.leak.PlotLeakRate import RunInteractive
 
 # Import QLCDTimer from Modules
 from guis.common.timer import QLCDTimer
 
-# import packages that are used by other files (data processor, straw tensioner, etc.)
-# this 'should' slightly speed up the program while it's running, with a tiny bit of time added to starting it up
-# also allows for checking the packages right off the bat
-import cycler, kiwisolver, matplotlib, pyparsing, pyrect, pyscreeze, pytweening, scipy, setuptools, six, sqlalchemy
-
 # ██████╗ ██████╗ ███╗   ██╗███████╗████████╗ █████╗ ███╗   ██╗████████╗███████╗
 # ██╔════╝██╔═══██╗████╗  ██║██╔════╝╚══██╔══╝██╔══██╗████╗  ██║╚══██╔══╝██╔════╝
 # ██║     ██║   ██║██╔██╗ ██║███████╗   ██║   ███████║██╔██╗ ██║   ██║   ███████╗
@@ -146,6 +137,13 @@ PRIMARY_DP = "SQL"
 # LAB_VERSION = False
 LAB_VERSION = True
 
+# set LAZY_STARTUP=True to show the window before importing the data processor,
+# the device windows, and the packages checked by checkPackages, and to build
+# per-pro widgets (the pro 5 HV grid) only when that pro is opened
+# set LAZY_STARTUP=False to do all of that before the window appears
+# time both with: python -m benchmarks.pangui_startup
+LAZY_STARTUP = True
+
 
 class panelGUI(QMainWindow):
     """
@@ -256,7 +254,11 @@ class panelGUI(QMainWindow):
         self._init_pro2_setup()
         self._init_pro3_setup()
         self._init_pro4_setup()  # process 4: pin protector
-        self._init_pro5_setup()  # process 5: high voltage tests
+        # process 5: high voltage tests, builds 96 rows of widgets
+        # pro: setup function, called by openGUI when that pro is opened
+        self.deferredSetup = {5: self._init_pro5_setup}
+        if not LAZY_STARTUP:
+            self.deferredSetup.pop(5)()
         self._init_pro6_setup()
         self._init_pro7_setup()
         self._init_pro8_setup()
@@ -1544,6 +1546,9 @@ class panelGUI(QMainWindow):
             self.panelInput[self.pro_index].setEnabled(True)
             self.ui.proSelection.setCurrentIndex(0)
             self.ui.GUIpro.setCurrentIndex(self.pro_index)
+            # build this pro's widgets if they were deferred
+            if self.pro in self.deferredSetup:
+                self.deferredSetup.pop(self.pro)()
         except IndexError:
             if btn.text() == "Process 8 - Final QC":
                 logger.warning("Process 8 is under construction")
@@ -1555,6 +1560,8 @@ class panelGUI(QMainWindow):
             return
 
         # Data Processor
+        from guis.common.dataProcessor import MultipleDataProcessor as DataProcessor
+
         self.DP = DataProcessor(
             gui=self,
             stage="panel",
@@ -5438,6 +5445,8 @@ class panelGUI(QMainWindow):
         if (
             self.strawTensionWindow is None
         ):  # if there's no strawTension window present...
+            from guis.panel.strawtensioner.run_straw_tensioner import StrawTension
+
             self.strawTensionWindow = StrawTension(  # make one! (creating it doesn't show it though)
                 saveMethod=lambda position, tension, uncertainty: saveStrawTensionMeasurement(  # pass it a save method, so it can...
                     position, tension, uncertainty
@@ -5466,6 +5475,8 @@ class panelGUI(QMainWindow):
 
         if self.checkDevice() == False:
             if self.wireTensionWindow is None:
+                from guis.panel.wiretensioner.wire_tension import WireTensionWindow
+
                 # Construct Wire Tension Window whose save method is to call the two methods defined above
                 self.wireTensionWindow = WireTensionWindow(
                     saveMethod=lambda tension_tpl, cont_tpl: (
@@ -5485,6 +5496,8 @@ class panelGUI(QMainWindow):
     def tensionboxPopup(self):
         if self.checkDevice() == False:
             if self.tensionBoxWindow is None:
+                from guis.panel.tensionbox.tensionbox_window import TensionBox
+
                 self.tensionBoxWindow = TensionBox(
                     saveMethod=(
                         lambda panel, is_straw, position, length, frequency, pulse_width, tension: self.DP.saveTensionboxMeasurement(
@@ -5515,7 +5528,7 @@ class panelGUI(QMainWindow):
     #
     # Uses HeatControl from guis/panel/heater/PanelHeater.py.
     def panelHeaterPopup(self):
-        root_dir = pkg_resources.read_text(resources, "rootDirectory.txt")
+        root_dir = GetRootDirectory()
         subprocess.call(
             f"start python -m guis.panel.heater {self.getCurrentPanel()}",
             shell=True,
@@ -5539,6 +5552,8 @@ class panelGUI(QMainWindow):
                 return  # don't close the window!  keep it safe by returning!
 
         if self.hvMeasurementsWindow is None:
+            from guis.panel.hv.hvGUImain import highVoltageGUI
+
             self.hvMeasurementsWindow = highVoltageGUI(
                 saveMethod=(
                     lambda position, side, current, volts, isTrip: (
@@ -5559,7 +5574,7 @@ class panelGUI(QMainWindow):
 
     # Creates a new terminal window and runs the resistance run_test.py script
     def run_resistance(self):
-        root_dir = pkg_resources.read_text(resources, "rootDirectory.txt")
+        root_dir = GetRootDirectory()
         subprocess.call(
             "start python -m guis.panel.resistance",
             shell=True,
@@ -5655,7 +5670,7 @@ class panelGUI(QMainWindow):
 
     # Creates a new terminal window and runs the PlotLeakRate.py script
     def run_plot_leak(self):
-        root_dir = pkg_resources.read_text(resources, "rootDirectory.txt")
+        root_dir = GetRootDirectory()
         subprocess.call(
             "start /wait python -m guis.panel.leak",
             shell=True,
@@ -5691,6 +5706,10 @@ def except_hook(exctype, exception, tb):
 
 
 def checkPackages():
+    # packages used by other files (data processor, straw tensioner, etc.)
+    import cycler, kiwisolver, matplotlib, pyparsing, pyrect, pyscreeze, pytweening, scipy, setuptools, six, sqlalchemy
+    import pyautogui
+
     # list of packages to check, each tuple has the name of the package and a
     # boolean to determine if the version is correct
     packageList = [
@@ -5741,9 +5760,29 @@ def checkPackages():
         tkinter.messagebox.showerror(title="Version Error", message=message)
 
 
+# Import the modules that aren't imported at the top of this file: the data
+# processor and the device windows. Without LAZY_STARTUP they're imported
+# before the window is shown, with it they're imported as they're used.
+def importDeferredModules():
+    import guis.common.dataProcessor
+    import guis.panel.strawtensioner.run_straw_tensioner
+    import guis.panel.wiretensioner.wire_tension
+    import guis.panel.tensionbox.tensionbox_window
+    import guis.panel.hv.hvGUImain
+
+
+# Merge this station's data into the network DB every 10 min while pangui runs
+def startMerger():
+    from guis.common.db_classes.bases import DM
+
+    DM.startMerger()
+
+
 def run():
     sys.excepthook = except_hook  # crash, don't hang when an exception is raised
-    checkPackages()  # check package versions
+    if not LAZY_STARTUP:
+        checkPackages()  # check package versions
+        importDeferredModules()
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling)
     app = QApplication(sys.argv)  # create new app to run
     app.setStyle(QStyleFactory.create("Fusion"))  # aestetics
@@ -5754,6 +5793,12 @@ def run():
     paths = GetProjectPaths()
     ctr = panelGUI(paths)  # create gui window
     ctr.show()  # show gui window
+    if LAZY_STARTUP:
+        # check package versions once the window is up
+        QTimer.singleShot(0, checkPackages)
+        QTimer.singleShot(0, startMerger)
+    else:
+        startMerger()
     app.exec_()  # go!
 
 
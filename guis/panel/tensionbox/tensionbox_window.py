@@ -24,6 +24,7 @@ import matplotlib.pyplot as plt
 import serial  ## from pyserial
 import math, time, os
 import csv
+from functools import lru_cache
 
 from scipy.signal import blackmanharris, fftconvolve
 from guis.panel.tensionbox.parabolic import parabolic
@@ -45,6 +46,14 @@ nlines = 2000  # Should match DataLength in the Arduino code
 this_folder = os.path.dirname(os.path.realpath(__file__))
 
 
+@lru_cache(maxsize=None)
+def loadLengths(filename):
+    """Read a length table once per session, in meters"""
+    lengths = np.loadtxt(os.path.join(this_folder, filename)) / 100.0
+    lengths.setflags(write=False)
+    return lengths
+
+
 class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
     """
     Class definition for the UI and associated functions.
@@ -52,8 +61,15 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
     Vadim: hwl is inherited from both QtGui.QDialog and myui.Ui_Dialog
     """
 
-    def __init__(self, saveMethod=None, panel=str(), pro=str(), parent=None):
-        """Vadim: Initialization of the class. Call the __init__ for the super classes"""
+    def __init__(
+        self, saveMethod=None, panel=str(), pro=str(), parent=None, audit=False
+    ):
+        """
+        Vadim: Initialization of the class. Call the __init__ for the super classes
+
+        If audit is true, the raw ADC counts of every run are also dumped to
+        cache/ as .npy files.
+        """
         super(TensionBox, self).__init__(parent)
         self.setupUi(self)
         self.connectActions()
@@ -64,6 +80,12 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
             self.panelID.setText(panel)
             self.panelID.setDisabled(True)
         self.saveMethod = saveMethod
+        self.audit = audit
+
+        # Acquisition buffers, reused by every pulse
+        self.counts = np.empty(nlines, dtype=np.int32)  # raw ADC counts
+        self.pulse = np.empty(nlines)  # one pulse, converted
+        self.summed = np.empty(nlines)  # sum of mean-subtracted pulses
 
         self.portloc = self.getPortLocation()  ## Arduino COM port
         self.openSerial()
@@ -153,14 +175,13 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
             length = float(self.lengthEdit.text())  # units are now in meters.
         else:
             if is_straw == 0:
-                # Read in the wire lengths
-                lengths = np.loadtxt(os.path.join(this_folder, "wire_lengths.txt"))
+                # Wire lengths, in meters
+                lengths = loadLengths("wire_lengths.txt")
             elif is_straw == 1:
-                # Read in the straw lengths
-                lengths = np.loadtxt(os.path.join(this_folder, "straw_lengths.txt"))
+                # Straw lengths, in meters
+                lengths = loadLengths("straw_lengths.txt")
             else:
                 lengths = np.zeros(96)
-            lengths = lengths / 100.0  # Convert to meters
             # Look up the length, based on the straw number
             length = lengths[strawNumber]
             # Set the length in the UI (meters)
@@ -242,19 +263,19 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
         """
         Function that prompts the Arduino to take data for one iteration
 
-        Reads in the resulting data. Writes it to an output file. Returns
-        relative humidity, temperature, and measured vibration frequency.
-
-        These output files are just used to hold values in order to iteratively
-        calculate means. I don't think they should be tracked or saved."
+        Reads the resulting data straight into the preallocated buffers, adds
+        up the mean-subtracted pulses, and returns the measured vibration
+        frequency. Nothing is written to disk unless self.audit is set, in
+        which case the raw counts of all pulses are dumped to cache/ as one
+        .npy file.
         """
 
-        data1 = [0] * nlines
-        for ik in range(0, self.SpinNpulses.value()):
-
-            filename = "cache/cache" + str(ik) + ".txt"
-            file = os.path.join(this_folder, filename)
-            f = open(file, "w")
+        npulses = self.SpinNpulses.value()
+        if self.audit:
+            raw = np.empty((npulses, nlines), dtype=np.int32)
+        data1 = self.summed
+        data1.fill(0)
+        for ik in range(0, npulses):
 
             # Trigger the Arduino to take data
             self.ser.write(b"5\n")
@@ -277,24 +298,21 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
                 print(self.ser.readline().decode("utf-8").strip())
             else:
                 self.ser.readline()  # Read in and print line where Arduino prints pulse width
-            # Read in the straw displacement data, and write it out to a file
+            # Read in the straw displacement data
+            counts = self.counts
+            readline = self.ser.readline
             for ic in range(0, nlines):
-                line = int(self.ser.readline())
-                if line >= 8192:
-                    val = (line - 16383) * 1.22
-                else:
-                    val = (line + 1) * 1.22
-
-                f.write(" %s" % val)
-                if ic < nlines - 1:
-                    f.write(",")
-            # ser.close()
-            f.close()
-
-            # Read back in the data from that file and add it to previous data
-            data = np.genfromtxt(file, delimiter=",")
-            data = data - data.mean()
-            data1 = np.add(data1, data)
+                counts[ic] = int(readline())
+            if self.audit:
+                raw[ik] = counts
+
+            # Convert to displacement and add it to previous data
+            data = self.pulse
+            np.copyto(data, (counts + 1) * 1.22)
+            wrapped = counts >= 8192
+            data[wrapped] = (counts[wrapped] - 16383) * 1.22
+            data -= data.mean()
+            data1 += data
 
             # Set the value in the progress bar (based on both iterations and pulses)
             self.progressBar.setValue(
@@ -304,6 +322,16 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
                 / (self.SpinNiter.value() * self.SpinNpulses.value())
             )
 
+        if self.audit:
+            np.save(
+                os.path.join(
+                    this_folder,
+                    "cache",
+                    "adc_%s_%d.npy" % (dt.now().strftime("%Y%m%d%H%M%S%f"), i),
+                ),
+                raw,
+            )
+
         # Compute the frequency
         freq = freq_from_fft(data1, 1.0 / SampleRate)
 
@@ -316,7 +344,7 @@ class TensionBox(QMainWindow, tensionbox_ui.Ui_MainWindow):
         if i == self.SpinNiter.value() - 1:
             # other options: plt.close(1); plt.close()
             plt.close("all")
-            plotadc(data1)
+            plotadc(data1.copy())
         return freq
 
     def cleanUp(self):
@@ -495,6 +523,8 @@ def run():
     hwl1 = TensionBox(
         saveMethod=lambda *args: print(f"\nMeasurement: {args}"),
         panel="MN999",
+        # --audit: keep each run's raw ADC counts in cache/
+        audit="--audit" in sys.argv,
     )
     hwl1.main()
     app.aboutToQuit.connect(hwl1.cleanUp)
@@ -4,6 +4,7 @@ import os
 import csv
 import sys
 from guis.common.getresources import GetProjectPaths
+from guis.straw.pallet_index import GetPalletIndex
 
 class StrawFailedError(Exception):
     # Raised when attempting to test a straw that has failed a previous step, but was not removed
@@ -15,42 +16,35 @@ class StrawFailedError(Exception):
 class Check:
     def __init__(self):
         self.palletDirectory = GetProjectPaths()["pallets"]
+        self.index = GetPalletIndex(self.palletDirectory)
 
-    def strawPass(self, CPAL, straw, step):
+    # Whether the straw passed the step on the pallet. Goes through the lines
+    # of CPAL's files that name the straw, in order: a "P" for the step is a
+    # pass, and an "adds" line hands over to where the straw came from (the
+    # pallet it moved in from, or the straw it replaced on this one).
+    def strawPass(self, CPAL, straw, step, _following=frozenset()):
         PASS = False
-        for palletid in os.listdir(self.palletDirectory):
-            for pallet in os.listdir(self.palletDirectory / palletid):
-                if CPAL + ".csv" == pallet:
-                    pfile =  self.palletDirectory / palletid / pallet
-                    with open(pfile, "r") as file:
-                        dummy = csv.reader(file)
-                        history = []
-                        for line in dummy:
-                            if line != []:
-                                history.append(line)
-                        for line in history:
-                            if line[1] == step:
-                                for index in range(len(line)):
-                                    if line[index] == straw and line[index + 1] == "P":
-                                        PASS = True
-                            if line[1] == "adds":
-                                for index in range(len(line)):
-                                    if line[index] == straw and line[
-                                        index + 1
-                                    ].startswith("CPAL"):
-                                        PASS = self.strawPass(
-                                            line[index + 1], straw, step
-                                        )
-                                    if line[index] == straw and line[
-                                        index + 1
-                                    ].startswith("ST"):
-                                        PASS = self.strawPass(
-                                            CPAL, line[index + 1], step
-                                        )
+        following = _following | {(CPAL, straw.upper())}
+        for event in self.index.strawEvents(straw):
+            if event.pallet != CPAL:
+                continue
+            if event.step == step:
+                if event.result == "P":
+                    PASS = True
+            elif event.step == "adds" and event.result:
+                if event.result.startswith("CPAL"):
+                    came_from = (event.result, straw)
+                elif event.result.startswith("ST"):
+                    came_from = (CPAL, event.result)
+                else:
+                    continue
+                # a pallet file that adds a straw back where it came from
+                if (came_from[0], came_from[1].upper()) in following:
+                    continue
+                PASS = self.strawPass(*came_from, step, following)
 
         return PASS
 
-
     def strawPassAll(self, CPAL, straw):
         PASS = False
         results = []
@@ -65,19 +59,10 @@ class Check:
         PASS = False
         results = []
         straws = []
-        for palletid in os.listdir(self.palletDirectory):
-            for pallet in os.listdir(self.palletDirectory / palletid):
-                if CPAL + ".csv" == pallet:
-                    pfile =  self.palletDirectory / palletid / pallet
-                    with open(pfile, "r") as file:
-                        dummy = csv.reader(file)
-                        history = []
-                        for line in dummy:
-                            if line != []:
-                                history.append(line)
-                        for entry in history[len(history) - 1]:
-                            if entry.startswith("ST"):
-                                straws.append(entry)
+        for history in self.index.palletHistories(CPAL):
+            for entry in history[len(history) - 1]:
+                if entry.startswith("ST"):
+                    straws.append(entry)
         for straw in straws:
             results.append(self.strawPass(CPAL, straw, step))
         if results == []:
@@ -38,6 +38,7 @@ from guis.straw.removestraw import removeStraw
 from guis.straw.checkstraw import *
 from data.workers.credentials.credentials import Credentials
 from guis.common.getresources import GetProjectPaths
+from guis.common.db_classes.bases import DM
 from guis.common.save_straw_workers import saveWorkers
 
 pyautogui.FAILSAFE = True  # Move mouse to top left corner to abort script
@@ -432,6 +433,7 @@ def except_hook(cls, exception, traceback):
 def run():
     sys.excepthook = except_hook
     app = QApplication(sys.argv)
+    DM.startMerger()  # merge this station's data into the network DB
     paths = GetProjectPaths()
     ctr = CO2(paths)
     ctr.show()
@@ -1,7 +1,11 @@
 import urllib.request
 import urllib.error
+import urllib.parse
+import http.client
+import base64
 import json
-import hashlib, random, time
+import hashlib, random, time, threading
+from concurrent.futures import ThreadPoolExecutor
 
 
 class DataLoader:
@@ -80,6 +84,178 @@ class DataLoader:
                 break
         return retValue, code, text
 
+    def sendBatched(
+        self,
+        maxRows=100,
+        maxBytes=1000000,
+        maxWorkers=4,
+        maxRetries=5,
+        backoff=0.5,
+        timeout=60,
+        echoUrl=False,
+    ):
+        """Sends the data to the server for loading, many rows per request.
+
+        Rows are packed, in order, into batches of at most maxRows rows and
+        (unless a single row is larger) maxBytes bytes of JSON. Each batch is
+        a separately signed request in the same format as send(). Up to
+        maxWorkers requests are in flight at once; each worker thread keeps
+        one keep-alive connection to the server (through the HTTP(S)_PROXY
+        proxy, if one is set), closed when all batches are sent.
+
+        A batch is only retried when it provably wasn't loaded: the server
+        answered "Signature Error", or the connection failed before the whole
+        request was sent. It is retried up to maxRetries times, waiting
+        backoff * 2^attempt seconds (plus jitter) between attempts. A batch
+        sent whose answer was lost, or answered with a 5xx status, may or may
+        not have been loaded, so it is not sent again: the caller must check
+        before re-sending its rows.
+
+        Args:
+             maxRows - Maximum number of rows per request.
+             maxBytes - Maximum size of a request body.
+             maxWorkers - Maximum number of concurrent requests.
+             maxRetries - Retries per batch before giving up on it.
+             backoff - Initial retry delay, seconds.
+             timeout - Socket timeout, seconds.
+
+        Returns:
+           A list with one tuple per batch, in row order:
+           (success, Html return status, error text, list of the batch's
+           (mode, row) pairs, loaded). loaded is True or False if the batch
+           was or wasn't loaded, None if that isn't known.
+        """
+        batches = list(self.__batches(maxRows, maxBytes))
+        if not batches:
+            return []
+        local = threading.local()
+        connections = []
+        lock = threading.Lock()
+
+        def sendBatch(rows):
+            if not hasattr(local, "connection"):
+                local.connection, local.path, local.headers = self.__connect(timeout)
+                with lock:
+                    connections.append(local.connection)
+            for attempt in range(maxRetries + 1):
+                retValue, code, text, loaded, retry = self.__post(local, rows, echoUrl)
+                if not retry or attempt == maxRetries:
+                    break
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+            return retValue, code, text, rows, loaded
+
+        try:
+            with ThreadPoolExecutor(max_workers=maxWorkers) as pool:
+                return list(pool.map(sendBatch, batches))
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def __batches(self, maxRows, maxBytes):
+        empty = {"table": self.data["table"], "rows": []}
+        overhead = len(json.dumps(empty, ensure_ascii=False).encode())
+        batch, size = [], overhead
+        for row in self.data["rows"]:
+            # +2 for the separating ", "
+            rowSize = len(json.dumps(row, ensure_ascii=False).encode()) + 2
+            if batch and (len(batch) >= maxRows or size + rowSize > maxBytes):
+                yield batch
+                batch, size = [], overhead
+            batch.append(row)
+            size += rowSize
+        if batch:
+            yield batch
+
+    def __connect(self, timeout):
+        """A connection to the server, or to its proxy as urllib would pick
+        it (HTTP_PROXY, HTTPS_PROXY, NO_PROXY).
+
+        Returns (connection, request path, extra headers).
+        """
+        url = urllib.parse.urlsplit(self.urlWithArgs)
+        path = url.path or "/"
+        if url.query:
+            path = "%s?%s" % (path, url.query)
+        proxy = urllib.request.getproxies().get(url.scheme)
+        if proxy and urllib.request.proxy_bypass(url.hostname):
+            proxy = None
+        if not proxy:
+            if url.scheme == "https":
+                connection = http.client.HTTPSConnection(url.netloc, timeout=timeout)
+            else:
+                connection = http.client.HTTPConnection(url.netloc, timeout=timeout)
+            return connection, path, {}
+
+        if "://" not in proxy:
+            proxy = "http://" + proxy
+        proxy = urllib.parse.urlsplit(proxy)
+        port = proxy.port or 80
+        headers = {}
+        if proxy.username:
+            credentials = "%s:%s" % (
+                urllib.parse.unquote(proxy.username),
+                urllib.parse.unquote(proxy.password or ""),
+            )
+            headers["Proxy-Authorization"] = "Basic " + base64.b64encode(
+                credentials.encode()
+            ).decode("ascii")
+        if url.scheme == "https":
+            # CONNECT through the proxy, then TLS to the server
+            connection = http.client.HTTPSConnection(
+                proxy.hostname, port, timeout=timeout
+            )
+            connection.set_tunnel(url.hostname, url.port or 443, headers)
+            return connection, path, {}
+        # the proxy takes the whole URL
+        connection = http.client.HTTPConnection(proxy.hostname, port, timeout=timeout)
+        return connection, "%s://%s%s" % (url.scheme, url.netloc, path), headers
+
+    def __post(self, local, rows, echoUrl):
+        """One signed POST of rows over the thread's connection.
+
+        Returns (success, code, text, loaded (None: unknown), whether to
+        retry).
+        """
+        jdata = json.dumps(
+            {"table": self.data["table"], "rows": rows}, ensure_ascii=False
+        ).encode()
+        salt = "%s" % (random.SystemRandom().random(),)
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "X-Salt": salt,
+            "X-Signature": self.__signature(jdata, salt),
+            "X-Group": self.group,
+            "X-Table": self.data["table"],
+        }
+        headers.update(local.headers)
+        if echoUrl:
+            print("URL: %s\n  %s" % (self.urlWithArgs, list(headers.items())))
+        try:
+            if local.connection.sock is None:
+                local.connection.connect()
+            local.connection.request("POST", local.path, jdata, headers)
+        except (http.client.HTTPException, OSError) as val:
+            # Couldn't connect, or the request wasn't sent whole (e.g. a
+            # dropped keep-alive connection): the server can't have loaded
+            # it. Reconnect and retry.
+            local.connection.close()
+            return False, "%s" % (val,), b"", False, True
+        try:
+            response = local.connection.getresponse()
+            text = response.read()
+        except (http.client.HTTPException, OSError) as val:
+            # Sent, but the answer was lost: it may have been loaded
+            local.connection.close()
+            return False, "%s" % (val,), b"", None, False
+        if response.will_close:
+            local.connection.close()
+        code = "%s %s" % (response.status, response.reason)
+        retry = text.strip() == b"Signature Error"
+        success = 200 <= response.status < 300
+        # a 5xx may come after the rows were loaded
+        loaded = None if response.status >= 500 else success
+        return success, code, text, loaded, retry
+
     def clearRows(self):
         """Deletes all rows from the instance, readying it for
         the next set of data.
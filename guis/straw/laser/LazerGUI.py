@@ -60,6 +60,7 @@ from data.workers.credentials.credentials import Credentials
 from guis.straw.removestraw import removeStraw
 from guis.straw.checkstraw import *
 from guis.common.getresources import GetProjectPaths
+from guis.common.db_classes.bases import DM
 from guis.common.save_straw_workers import saveWorkers
 
 
@@ -795,6 +796,7 @@ def except_hook(cls, exception, traceback):
 def run():
     sys.excepthook = except_hook
     app = QApplication(sys.argv)
+    DM.startMerger()  # merge this station's data into the network DB
     paths = GetProjectPaths()
     ctr = cutMenu(paths)
     ctr.show()
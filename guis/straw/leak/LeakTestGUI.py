@@ -29,10 +29,7 @@ from PyQt5.QtWidgets import (
     QListWidgetItem,
 )
 from PyQt5 import QtGui
-import serial  ## Takes this from pyserial, not serial
 import datetime
-import numpy as np
-import matplotlib.pyplot as plt
 from guis.straw.leak.least_square_linear import *  ## Contributes fit functions
 from guis.straw.leak.leakUI import Ui_MainWindow  ## Main GUI window
 from guis.straw.leak.N0207a import Ui_Dialog  ## Pop-up GUI window for straw selection
@@ -47,6 +44,11 @@ from guis.straw.leak.remove import Ui_DialogBox
 from guis.common.getresources import GetProjectPaths, GetStrawLeakInoPorts
 from guis.common.save_straw_workers import saveWorkers
 from guis.straw.leak.straw_leak_utilities import *
+from guis.straw.leak.streaming_fit import LeakFitState
+from guis.straw.leak.plot_renderer import PlotData, PlotRenderer
+from guis.straw.leak.acquisition import LeakAcquisition
+from guis.straw.leak.raw_data_writer import RawDataWriter
+from guis.straw.leak.leak_decision import FAILED, PASSED, SequentialDecision, decide
 
 # Import logger from Modules (only do this once)
 from guis.common.panguilogger import SetupPANGUILogger
@@ -71,26 +73,19 @@ class LeakTestStatus(QMainWindow):
     UnloadUpdate = QtCore.pyqtSignal(int)
     LockGUI = QtCore.pyqtSignal(bool)
 
-    def __init__(self, paths, COM, baudrate, app, arduino_input=False):
+    def __init__(
+        self, paths, COM, baudrate, app, arduino_input=False, sequential_decision=None
+    ):
         super(LeakTestStatus, self).__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         self.show()
-        ## Add a timeout (0.08 sec) to avoid freezing GUI while waiting for serial data from arduinos
+        ## Arduino ports, one per row, each read by its own thread that
+        ## timestamps the readings (see acquisition.py)
         self.COM = GetStrawLeakInoPorts()
-        self.COM_con = [None, None, None, None, None, None, None, None, None, None]
-        self.arduino = [
-            serial.Serial(port=self.COM_con[0], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[1], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[2], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[3], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[4], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[5], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[6], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[7], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[8], baudrate=115200, timeout=0.08),
-            serial.Serial(port=self.COM_con[9], baudrate=115200, timeout=0.08),
-        ]
+        self.acquisition = LeakAcquisition(status=self.arduinoStatus)
+        # readings of rows paused while their straws are changed
+        self.held_readings = []
 
         self.leakDirectory = paths["strawleakdata"]
         self.leakDirectoryRaw = self.leakDirectory / "raw_data"
@@ -127,6 +122,13 @@ class LeakTestStatus(QMainWindow):
 
         # dict of <chamber> : "<straw name>_rawdata.txt"
         self.files = {}
+        # Keeps each chamber's raw data file open, see raw_data_writer.py
+        self.raw_data = RawDataWriter()
+        # dict of <chamber> : LeakFitState of that chamber's raw data file
+        self.fit_states = {}
+        # Draws the fit pdfs on its own thread, see plot_renderer.py
+        self.plot_renderer = PlotRenderer()
+        self.plot_renderer.start()
         # Passed straws with saved data
         self.straw_list = []
         self.result = self.leakDirectory / "LeakTestResults.csv"
@@ -153,6 +155,9 @@ class LeakTestStatus(QMainWindow):
         # Multiplied by 1.4 for the argon gas leaking as well conservative estimate (should we reduce?
         # max leak rate for straws
         self.max_leakrate = 0.00009645060  # cc/min
+        # SequentialDecision to pass/fail straws as soon as it's certain, or
+        # None for the fixed rules only (see leak_decision.py)
+        self.sequential_decision = sequential_decision
 
         self.excluded_time = 120  # wait 2 minutes before using data for fit
         self.max_time = (
@@ -447,25 +452,10 @@ class LeakTestStatus(QMainWindow):
 
         # ROW starts at 0
 
-    def Connect_Arduino(self, a_port):
-        index = self.COM.index(a_port)
-        try:
-            serial.Serial(port=a_port, baudrate=115200, timeout=0.08)
-            # print("Arduino at port %s, baudrate %s" % (self.COM[self.COM.index(a_port)],'115200'))
-            self.COM_con[index] = a_port
-        except serial.SerialException:
-            # print("Arduino at port %s is not connected" % self.COM[self.COM.index(a_port)])
-            self.COM_con[index] = None
-        self.arduino[index] = serial.Serial(
-            port=self.COM_con[index], baudrate=115200, timeout=0.08
-        )
-
     def startArduino(self, btn):
         if self.checkCredentials():
             ROW = int(btn.objectName().strip("StartData_")) - 1
-            self.arduino[ROW].close()
-            self.Connect_Arduino(self.COM[ROW])
-            if self.COM_con[ROW] == None:
+            if not self.acquisition.start(ROW, self.COM[ROW]):
                 self.Arduinos[ROW].setStyleSheet("background-color: rgb(170, 0, 0);")
                 return
 
@@ -481,11 +471,6 @@ class LeakTestStatus(QMainWindow):
                     x.setEnabled(True)
             for COL in range(5):
                 self.update_name(ROW, COL)
-            thread = threading.Thread(
-                target=self.ReadinBuffer, args=(ROW,), name=("Buffer" + str(ROW))
-            )
-            thread.daemon = True  # Daemonize thread
-            thread.start()
 
             self._running[ROW] = True
         else:
@@ -494,6 +479,7 @@ class LeakTestStatus(QMainWindow):
     def handleStop(self, btn):
         ROW = int(btn.objectName().strip("StopData_")) - 1
         self._running[ROW] = False
+        self.acquisition.stop(ROW)
         self.StrtData[ROW].setEnabled(True)
         self.StpData[ROW].setDisabled(True)
         for x in self.ui.ActionButtons.buttons():
@@ -508,14 +494,22 @@ class LeakTestStatus(QMainWindow):
                 x.setDisabled(True)
         self.Arduinos[ROW].setStyleSheet("background-color: rgb(149, 186, 255);")
 
-    def ReadinBuffer(self, ROW):
-        starting_up_time = 1
-        starting_up = True
-        beginning_time = time.time()
-        while starting_up:
-            buffer = self.arduino[ROW].readline().strip()
-            if (time.time() - beginning_time) > starting_up_time:
-                starting_up = False
+    # Called from a row's reader thread when its port (dis)connects
+    def arduinoStatus(self, ROW, connected):
+        if self.acquisition.running(ROW):
+            self.ArduinoStart.emit(ROW, connected)
+
+    def readings(self):
+        """Arduino readings to process, oldest first. Those of a row paused
+        (e.g. while its straws are changed) are held until it runs again."""
+        held, self.held_readings = self.held_readings, []
+        for reading in held + list(self.acquisition.readings(timeout=0.1)):
+            if not self.acquisition.running(reading.row):
+                continue  # stopped
+            if self._running[reading.row]:
+                yield reading
+            else:
+                self.held_readings.append(reading)
 
     # (1) Read arduino data, (2) fit leak rate, (3) plot
     def handleStart(self):
@@ -524,107 +518,56 @@ class LeakTestStatus(QMainWindow):
         # self._running[0] = True
         # for x in self.ui.ActionButtons.buttons():
         #    x.setEnabled(True)
-        empty_lines = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        pasttime = [
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-            time.time(),
-        ]
+        pasttime = [time.time()] * len(self._running)
         while any(self._running):
-            i = 0
             ####################################################################
-            # LOOP ROWS
+            # LOOP READINGS
+            # Each row's arduino is read by its own thread (acquisition.py);
+            # take the readings of all rows, in the order they arrived
             ####################################################################
-            for tf in self._running:
-                # cycles through rows
-                ROW = i
-                i = i + 1
-
-                if self.testThreads("Buffer" + str(ROW)):
-                    continue
-
-                if tf != True:
-                    continue
+            for reading in self.readings():
+                ROW = reading.row
 
                 ################################################################
                 # WRITE ARDUINO DATA TO RAW DATA FILES
-                # Read arduino output for this row and save data to multiple
-                # raw data files, one for each chamber
+                # Save each reading to its chamber's raw data file, stamped
+                # with the time it was read
                 ################################################################
-                # ppms = self.arduino[ROW].readline().strip().split()
-                if empty_lines[ROW] > 60:
-                    self.arduino[ROW].close()
-                    self.Connect_Arduino(self.COM[ROW])
-                    if self.COM_con[ROW] != None:
-                        empty_lines[ROW] = 0
-
-                if self.COM_con[ROW] == None:
-                    # self.Arduinos[ROW].setStyleSheet("background-color: rgb(170, 0, 0);")
-                    self.ArduinoStart.emit(ROW, False)
-                    continue
-                else:
-                    # self.Arduinos[ROW].setStyleSheet("background-color: rgb(0, 170, 0);")
-                    self.ArduinoStart.emit(ROW, True)
-
-                arduino_line = self.arduino[ROW].readline().strip()
-                if arduino_line == b"":
-                    empty_lines[ROW] = empty_lines[ROW] + 1
-                    continue
+                epoctime = reading.timestamp
+                currenttime = datetime.datetime.fromtimestamp(epoctime).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
 
-                empty_lines[ROW] = 0
-                ppms = arduino_line.split()
-                formattedList = ["%5.2f" % float(member) for member in ppms]
-                currenttime = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                epoctime = [
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                    time.time(),
-                ]
-
-                file = int(float(formattedList[0]))
-                file = file + ROW * 5
-                with open(self.files[file], "a+", 1) as f:
-                    f.write(
-                        str(format(epoctime[ROW], ".0f"))
-                        + "\t"
-                        + str(file)
-                        + "\t"
-                        + ("%.0f" % float(formattedList[1]))
-                        + "\t"
-                        + str(currenttime)
-                        + "\n"
-                    )
-                    f.flush()  ## Needed to send data in buffer to file
-                # print(epoctime,'\t',file,'\t',formattedList[1],'\t',currenttime)
+                file = reading.chamber
+                fit_state = self.fitState(file)
+                line = (
+                    str(format(epoctime, ".0f"))
+                    + "\t"
+                    + str(file)
+                    + "\t"
+                    + ("%.0f" % reading.ppm)
+                    + "\t"
+                    + str(currenttime)
+                    + "\n"
+                )
+                self.raw_data.write(file, self.files[file], line)
+                # Keep the chamber's fit in step with its file
+                fit_state.addLine(line)
 
                 # only read new data and update plot at most every 15 seconds
-                if epoctime[ROW] < (pasttime[ROW] + 15.0):  ## Previously 15.0
+                if epoctime < (pasttime[ROW] + 15.0):  ## Previously 15.0
                     continue
 
                 ################################################################
                 # FIT AND PLOT
-                # Loop chambers in this row, read data from raw data files,
-                # measure leak rates, plot data + fits to pdf files.
+                # Loop chambers in this row, fit the readings accumulated in
+                # each chamber's LeakFitState, measure leak rates, plot data +
+                # fits to pdf files.
                 ################################################################
                 # print("")
                 # print(self.COM[ROW])
-                pasttime[ROW] = epoctime[ROW]
+                pasttime[ROW] = epoctime
                 PPM = {}
-                PPM_err = {}
                 timestamp = {}
                 #                        starttime = {}
                 slope = {}
@@ -634,26 +577,11 @@ class LeakTestStatus(QMainWindow):
                 for COL in range(5):
                     # cycles through columns
                     chamber = ROW * 5 + COL
-                    PPM[chamber] = []
-                    PPM_err[chamber] = []
-                    timestamp[chamber] = []
                     #                            starttime[chamber] = 0
                     slope[chamber] = 0
                     slope_err[chamber] = 0
                     intercept[chamber] = 0
                     intercept_err[chamber] = 0
-                    outfile = self.leakDirectoryRaw / str(
-                        self.Choosenames[ROW][COL] + "_rawdata.txt"
-                    )
-
-                    # open the raw data readings for this chamber and save them
-                    # in the PPM, PPM_err, and timestamp variables
-                    (
-                        timestamp[chamber],
-                        PPM[chamber],
-                        PPM_err[chamber],
-                    ) = get_data_from_file(outfile)
-                    running_duration = timestamp[chamber][-1]
 
                     # Chamber is empty -- go no further
                     # self.Choosenames[ROW][COL] = "ST00854_chamber0_2021_06_15"
@@ -661,6 +589,12 @@ class LeakTestStatus(QMainWindow):
                         # print("No straw in chamber %.0f" % (chamber))
                         continue
 
+                    # the raw data readings for this chamber, already parsed
+                    fit_state = self.fitState(chamber)
+                    timestamp[chamber] = fit_state.timestamps
+                    PPM[chamber] = fit_state.PPM
+                    running_duration = fit_state.runningDuration()
+
                     # All chambers start with "processing" code U -> yellow
                     if self.passed[chamber] == "U":
                         self.StrawProcessing.emit(chamber)
@@ -678,7 +612,7 @@ class LeakTestStatus(QMainWindow):
                     # If max PPM is larger than threshold and we haven't already passed,
                     # Then mark this chamber as a large leak (red) and skip it
                     if (
-                        max(PPM[chamber]) > self.max_co2_level
+                        fit_state.max_ppm > self.max_co2_level
                         and self.passed[chamber] != "P"
                     ):
                         self.LargeLeak.emit(chamber)
@@ -695,11 +629,7 @@ class LeakTestStatus(QMainWindow):
                         slope_err[chamber],
                         intercept[chamber],
                         intercept_err[chamber],
-                    ) = get_fit(
-                        timestamp[chamber],
-                        PPM[chamber],
-                        PPM_err[chamber],
-                    )
+                    ) = fit_state.fit()
 
                     self.leak_rate[chamber] = calculate_leak_rate(
                         slope[chamber], self.chamber_volume[ROW][COL]
@@ -722,129 +652,51 @@ class LeakTestStatus(QMainWindow):
                     self.UpdateStrawText.emit(chamber)
 
                     ############################################################
-                    # PASS type 1
-                    # At least 20 entries, acceptable rate and rate error
+                    # PASS-FAIL
+                    # The fixed rules, or the sequential rule if it's on and
+                    # already certain, see leak_decision.py
                     ############################################################
-                    if (
-                        len(PPM[chamber]) > 20
-                        and self.leak_rate[chamber] < self.max_leakrate
-                        and self.leak_rate_err[chamber] < self.max_leakrate / 10
-                    ):
-                        # print("Straw in chamber %.0f has Passed, Please remove" % chamber)
-                        straw_status = "Passed leak requirement"
-                        # self.Chambers[chamber].setStyleSheet("background-color: rgb(40, 225, 40);")
-                        self.StrawStatus.emit(chamber, True)
-                        self.passed[chamber] = "P"
-                    ############################################################
-                    # PASS type 2
-                    # At least 20 entries, acceptable rate, unacceptable
-                    # rate error, but event time 7.5 hrs +
-                    ############################################################
-                    elif (
-                        len(PPM[chamber]) > 20
-                        and self.leak_rate[chamber] < self.max_leakrate
-                        and running_duration > 27000  # cut off after... 7.5 hours???
-                    ):
-                        # print("Straw in chamber %.0f has Passed, Please remove" % chamber)
+                    decision = decide(
+                        len(PPM[chamber]),
+                        self.leak_rate[chamber],
+                        self.leak_rate_err[chamber],
+                        running_duration,
+                        self.max_leakrate,
+                        self.sequential_decision,
+                    )
+                    if decision == PASSED:
                         straw_status = "Passed leak requirement"
-                        # self.Chambers[chamber].setStyleSheet("background-color: rgb(40, 225, 40);")
                         self.StrawStatus.emit(chamber, True)
                         self.passed[chamber] = "P"
-                    ############################################################
-                    # FAIL type 1
-                    # At least 20 entries, unacceptable rate, acceptable
-                    # error. A well-understood failure.
-                    ############################################################
-                    elif (
-                        len(PPM[chamber]) > 20
-                        and self.leak_rate[chamber] > self.max_leakrate
-                        and self.leak_rate_err[chamber] < self.max_leakrate / 10
-                    ):
-                        # print("FAILURE SHAME DISHONOR: Straw in chamber %.0f has failed, Please remove and reglue ends" % chamber)
-                        straw_status = "Failed leak requirement"
-                        # self.Chambers[chamber].setStyleSheet("background-color: rgb(225, 40, 40);")
-                        self.StrawStatus.emit(chamber, False)
-                        self.passed[chamber] = "F"
-                    ############################################################
-                    # FAIL type 2
-                    # At least 20 entries, unacceptable rate, unacceptable
-                    # error, 7.5 hrs+.
-                    ############################################################
-                    elif (
-                        len(PPM[chamber]) > 20
-                        and self.leak_rate[chamber] > self.max_leakrate
-                        and running_duration > 27000
-                    ):
-                        # print("FAILURE SHAME DISHONOR: Straw in chamber %.0f has failed, Please remove and reglue ends" % chamber)
-                        straw_status = "Failed leak requirement"
-                        # self.Chambers[chamber].setStyleSheet("background-color: rgb(225, 40, 40);")
-                        self.StrawStatus.emit(chamber, False)
-                        self.passed[chamber] = "F"
-                    ############################################################
-                    # FAIL type 3
-                    # At least 20 entries, and even rate - err is above
-                    # threshold. Doesn't even pass within error bars
-                    ############################################################
-                    elif (
-                        len(PPM[chamber]) > 20
-                        and (self.leak_rate[chamber] - 10 * self.leak_rate_err[chamber])
-                        > self.max_leakrate
-                    ):
-                        # print("FAILURE SHAME DISHONOR: Straw in chamber %.0f has failed, Please remove and reglue ends" % chamber)
+                    elif decision == FAILED:
                         straw_status = "Failed leak requirement"
-                        # self.Chambers[chamber].setStyleSheet("background-color: rgb(225, 40, 40);")
                         self.StrawStatus.emit(chamber, False)
                         self.passed[chamber] = "F"
-                    ############################################################
-                    # UNHANDLED PASS-FAIL CASE
-                    # AFAICT this just happens when we don't have enough data
-                    ############################################################
-                    else:
-                        pass
-
-                    ## Graph and save graph of fit
-                    x = np.linspace(0, max(timestamp[chamber]))
-                    y = slope[chamber] * x + intercept[chamber]
-                    plt.plot(timestamp[chamber], PPM[chamber], "bo")
-                    # plt.errorbar(timestamp[f],PPM[f], yerr=PPM_err[f], fmt='o')
-                    plt.plot(x, y, "r")
-                    plt.xlabel("time (s)")
-                    plt.ylabel("CO2 level (PPM)")
-                    plt.title(self.Choosenames[ROW][COL] + "_fit")
-                    info_string = (
-                        "Slope = %.2f +- %.2f x $10^{-3}$ PPM/sec \n"
-                        % (
-                            slope[chamber] * 10 ** 4,
-                            slope_err[chamber] * 10 ** 4,
-                        )
-                        + "Leak Rate = %.2f +- %.2f x $10^{-5}$ cc/min \n"
-                        % (
-                            self.leak_rate[chamber] * (10 ** 5),
-                            self.leak_rate_err[chamber] * (10 ** 5),
-                        )
-                        + straw_status
-                        + "\n"
-                        + currenttime
-                    )
-                    plt.figtext(
-                        0.49,
-                        0.80,
-                        info_string,
-                        fontsize=12,
-                        color="r",
-                    )
-                    outfig = self.leakDirectoryRaw / str(
-                        self.Choosenames[ROW][COL] + "_fit.pdf"
+
+                    ## Graph and save graph of fit, on the plot renderer's thread
+                    self.plot_renderer.submit(
+                        chamber,
+                        PlotData(
+                            path=self.leakDirectoryRaw
+                            / str(self.Choosenames[ROW][COL] + "_fit.pdf"),
+                            title=self.Choosenames[ROW][COL] + "_fit",
+                            fit_state=fit_state,
+                            n=len(fit_state),
+                            slope=slope[chamber],
+                            slope_err=slope_err[chamber],
+                            intercept=intercept[chamber],
+                            leak_rate=self.leak_rate[chamber],
+                            leak_rate_err=self.leak_rate_err[chamber],
+                            status=straw_status,
+                            time=currenttime,
+                        ),
                     )
-                    plt.savefig(outfig)
-                    plt.clf()
                 # END loop over chambers
-            # END while any(self._running)
+            # END loop over readings
 
             # sys.stdout.flush()
             # qApp.processEvents()
             # app.processEvents()
-            time.sleep(0.1)
 
     def lineno(self):
         """Call in debugging to get current line number"""
@@ -907,6 +759,7 @@ class LeakTestStatus(QMainWindow):
         thread.start()
 
     def deleteFiles(self, ROW, COL):
+        self.raw_data.close(ROW * 5 + COL)
         path1 = self.leakDirectoryRaw / str(self.Choosenames[ROW][COL] + "_rawdata.txt")
         path2 = self.leakDirectoryRaw / str(self.Choosenames[ROW][COL] + "_fit.pdf")
         path3 = self.leakDirectoryRaw / str(
@@ -997,13 +850,30 @@ class LeakTestStatus(QMainWindow):
         self.files[chamber] = self.leakDirectoryRaw / str(
             self.Choosenames[ROW][COL] + "_rawdata.txt"
         )
-        x = open(self.files[chamber], "a+", 1)
-        x.close()
+        # Closes the old contents' file
+        self.raw_data.open(chamber, self.files[chamber])
+        # Forget the old contents' fit; rebuilt from the file on next use
+        self.fit_states.pop(chamber, None)
+        self.plot_renderer.forget(chamber)
         logger.debug(f"Saving data to file {self.Choosenames[ROW][COL]}")
 
+    def fitState(self, chamber):
+        """Running fit of a chamber's raw data file, read once then updated
+        per reading"""
+        fit_state = self.fit_states.get(chamber)
+        if fit_state is None or fit_state.path != self.files[chamber]:
+            self.raw_data.flush(chamber)
+            fit_state = LeakFitState.fromFile(self.files[chamber])
+            self.fit_states[chamber] = fit_state
+        return fit_state
+
     def Plot(self, btn):
-        """Make and display a copy of the fitted data"""
+        """Make and display a copy of the fitted data, once the plot renderer
+        has drawn the latest fit"""
         chamber = int(btn.objectName().strip("PdfButton"))
+        self.plot_renderer.request(chamber, functools.partial(self.openPlot, chamber))
+
+    def openPlot(self, chamber):
         ROW = int(chamber / 5)
         COL = chamber % 5
         # print('Plotting data for chamber', chamber)
@@ -1121,6 +991,7 @@ class LeakTestStatus(QMainWindow):
         )
         if reply == QMessageBox.Yes:
             event.accept()
+            self.raw_data.closeAll()
             sys.exit(0)
         else:
             event.ignore()
@@ -1205,13 +1076,6 @@ class LeakTestStatus(QMainWindow):
                 return True
         return False
 
-    def testThreads(self, name):
-        for threads in threading.enumerate():
-            if threads.name == name:
-                return True
-
-        return False
-
     def dataCollection(self, app):
         while True:
             if any(self._running):
@@ -2468,7 +2332,11 @@ def run():
     sys.excepthook = except_hook
     app = QApplication(sys.argv)
     paths = GetProjectPaths()
-    lts = LeakTestStatus(paths, "COM11", 115200, app, arduino_input=True)
+    # --sequential: decide early, see leak_decision.py
+    sequential = SequentialDecision() if "--sequential" in sys.argv else None
+    lts = LeakTestStatus(
+        paths, "COM11", 115200, app, arduino_input=True, sequential_decision=sequential
+    )
     lts.show()
     app.exec_()
 
@@ -2,6 +2,7 @@
 
 import os, time, datetime, csv
 from guis.common.getresources import GetProjectPaths
+from guis.straw.pallet_index import GetPalletIndex
 
 
 class StrawNotFoundError(Exception):
@@ -40,29 +41,14 @@ def FindCPAL(strawname):
     # Returns (CPALID, CPAL) of straw number
     # If a straw is associated with more than one CPALID, use the largest (i.e.
     # most recent) one.
-    cpal_return_pairs = []
-    database_path = GetProjectPaths()["pallets"]
-    for i in range(1, 25):
-        files = []
-        cpalid = "CPALID" + str(i).zfill(2)
-        path = database_path / cpalid
-
-        for (dirpath, dirnames, filenames) in os.walk(path):
-            files.extend(filenames)
-            break
-
-        for filename in files:
-            f = open(path / filename, "r")
-
-            line = f.readline()
-
-            while line != "":
-                if strawname.lower() in line.lower():
-                    cpal_return_pairs.append((cpalid, filename[:-4]))
-
-                line = f.readline()
-
-            f.close()
+    # Pallet files are indexed once and re-read only when they change, see
+    # guis/straw/pallet_index.py.
+    cpalids = {"CPALID" + str(i).zfill(2) for i in range(1, 25)}
+    cpal_return_pairs = [
+        pair
+        for pair in GetPalletIndex().palletsWithStraw(strawname)
+        if pair[0] in cpalids
+    ]
 
     # return the (cpalid,cpal) pair that has the highest cpal.
     # e.g. max([('CPAL01', 'CPAL0123'), ('CPAL01, 'CPAL6798')]), the max
@@ -128,6 +114,8 @@ def UpdateStrawInfo(test, workers, strawname, result):
             writer = csv.writer(f)
             writer.writerows(rows)
 
+    GetPalletIndex(database_path).invalidate(path)
+
 
 def findPreviousStep(path, step):
     with open(path, "r") as f:
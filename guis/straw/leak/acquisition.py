@@ -0,0 +1,238 @@
+################################################################################
+# Leak stand acquisition: one reader thread per arduino
+#
+# Each row of the leak stand has an arduino streaming "<chamber> <ppm>" lines
+# over its own serial port. A PortReader thread reads each port and puts every
+# reading, stamped with the time it arrived, on one queue shared by all rows;
+# LeakTestStatus takes them off with readings(). A slow or silent port only
+# holds up its own reader, so adding rows doesn't stretch anyone's sampling
+# interval.
+#
+# A reader that sees nothing for max_empty reads in a row (about 5 s) reopens
+# its port, and keeps trying while the port can't be opened, reporting the
+# connection state through the status callback.
+#
+#   acquisition = LeakAcquisition(status=lambda row, ok: ...)
+#   acquisition.start(row, port)          # False if the port can't be opened
+#   for reading in acquisition.readings(timeout=0.1):
+#       reading.timestamp, reading.chamber, reading.ppm
+#   acquisition.stop(row)
+################################################################################
+import collections, queue, threading, time
+
+import serial  ## Takes this from pyserial, not serial
+
+import logging
+
+logger = logging.getLogger("root")
+
+CHAMBERS_PER_ROW = 5
+
+LeakReading = collections.namedtuple(
+    "LeakReading",
+    [
+        "timestamp",  # time.time() the line was read
+        "row",
+        "chamber",  # 0-49: row * CHAMBERS_PER_ROW + the arduino's chamber
+        "ppm",  # CO2 level, rounded to 2 decimals like the GUI always has
+    ],
+)
+
+
+class PortReader(threading.Thread):
+    def __init__(
+        self,
+        row,
+        port,
+        events,
+        baudrate=115200,
+        timeout=0.08,
+        max_empty=60,
+        startup=1.0,
+        retry_interval=1.0,
+        status=None,
+    ):
+        threading.Thread.__init__(self, name="LeakReader%d" % row, daemon=True)
+        self.row = row
+        self.port = port
+        self.events = events  # queue.Queue the readings go to
+        self.baudrate = baudrate
+        self.timeout = timeout  # s, of each readline
+        self.max_empty = max_empty  # empty reads in a row before reconnecting
+        self.startup = startup  # s of output thrown away after (re)connecting
+        self.retry_interval = retry_interval  # s between tries to open the port
+        self.status = status  # status(row, connected), on changes
+        self.serial = None
+        self.connected = None
+        self.lines = 0  # lines read, including thrown away and bad ones
+        self.bad_lines = 0
+        self._stopping = threading.Event()
+
+    ## CALLED FROM OTHER THREADS ##
+
+    def stop(self):
+        self._stopping.set()
+
+    # Open the port now, before starting the thread. Returns whether it opened.
+    def open(self):
+        try:
+            self.serial = serial.Serial(
+                port=self.port, baudrate=self.baudrate, timeout=self.timeout
+            )
+        except serial.SerialException as e:
+            logger.debug("Could not open %s: %s" % (self.port, e))
+            self.serial = None
+        self._setConnected(self.serial is not None)
+        return self.serial is not None
+
+    ## READER THREAD ##
+
+    def run(self):
+        try:
+            self._read()
+        finally:
+            self._close()
+
+    def _read(self):
+        empty = 0
+        flush_until = time.monotonic() + self.startup
+        while not self._stopping.is_set():
+            if self.serial is None:
+                if not self.open():
+                    self._stopping.wait(self.retry_interval)
+                    continue
+                empty = 0
+                flush_until = time.monotonic() + self.startup
+
+            try:
+                line = self.serial.readline()
+            except serial.SerialException as e:
+                logger.warning("Lost %s: %s" % (self.port, e))
+                self._close()
+                self._setConnected(False)
+                continue
+            timestamp = time.time()
+
+            if not line.strip():
+                empty += 1
+                if empty > self.max_empty:
+                    logger.debug("Nothing from %s, reconnecting" % self.port)
+                    self._close()
+                continue
+            empty = 0
+            self.lines += 1
+
+            # the arduino sends what was buffered before we connected first
+            if time.monotonic() < flush_until:
+                continue
+
+            reading = self.parse(line, timestamp)
+            if reading is not None:
+                self.events.put(reading)
+
+    # LeakReading of one line, "<chamber> <ppm>", or None if it isn't one
+    def parse(self, line, timestamp):
+        try:
+            chamber, ppm = line.split()[:2]
+            chamber = int(float(chamber))
+            ppm = round(float(ppm), 2)
+        except ValueError:
+            self.bad_lines += 1
+            logger.debug("Bad line from %s: %r" % (self.port, line))
+            return None
+        if not 0 <= chamber < CHAMBERS_PER_ROW:
+            self.bad_lines += 1
+            logger.debug("Bad chamber from %s: %r" % (self.port, line))
+            return None
+        return LeakReading(
+            timestamp, self.row, self.row * CHAMBERS_PER_ROW + chamber, ppm
+        )
+
+    def _close(self):
+        if self.serial is not None:
+            try:
+                self.serial.close()
+            except serial.SerialException:
+                pass
+            self.serial = None
+
+    def _setConnected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if self.status is not None:
+                self.status(self.row, connected)
+
+
+class LeakAcquisition:
+    def __init__(self, status=None, **reader_options):
+        self.events = queue.Queue()
+        self.status = status
+        self.reader_options = reader_options  # passed on to each PortReader
+        self._readers = {}  # row : PortReader
+        self._lock = threading.Lock()
+
+    # Start reading a row's port, replacing the row's reader if it has one.
+    # Returns False, without starting, if the port can't be opened.
+    def start(self, row, port):
+        self.stop(row)
+        reader = PortReader(
+            row, port, self.events, status=self.status, **self.reader_options
+        )
+        if not reader.open():
+            return False
+        with self._lock:
+            self._readers[row] = reader
+        reader.start()
+        return True
+
+    # Stop reading a row. Its readings still queued are dropped by readings().
+    def stop(self, row):
+        with self._lock:
+            reader = self._readers.pop(row, None)
+        if reader is not None:
+            reader.stop()
+
+    # Stop every row and wait for the readers to close their ports
+    def stopAll(self, timeout=1.0):
+        with self._lock:
+            readers, self._readers = list(self._readers.values()), {}
+        for reader in readers:
+            reader.stop()
+        for reader in readers:
+            reader.join(timeout)
+
+    def running(self, row):
+        with self._lock:
+            return row in self._readers
+
+    def rows(self):
+        with self._lock:
+            return sorted(self._readers)
+
+    # Readings of running rows in the order they arrived: waits up to timeout
+    # for the first, then takes whatever else is queued
+    def readings(self, timeout=None):
+        try:
+            reading = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            if self.running(reading.row):
+                yield reading
+            try:
+                reading = self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    # Lines read and bad lines, per row
+    def stats(self):
+        with self._lock:
+            readers = dict(self._readers)
+        return {
+            row: {
+                "connected": reader.connected,
+                "lines": reader.lines,
+                "bad_lines": reader.bad_lines,
+            }
+            for row, reader in readers.items()
+        }
@@ -0,0 +1,201 @@
+################################################################################
+# Batched leak rate fits
+#
+# The fits of least_square_linear (get_fit, get_slope_zero_intercept,
+# get_slope_err_zero_intercept) and the leak rates of straw_leak_utilities,
+# for many chambers or raw data files at once, as numpy array operations.
+#
+# Chambers are rows of 2D arrays. Rows with fewer readings than the longest
+# are padded, and a boolean mask of the same shape marks the real readings
+# (see stack). Padding contributes nothing to any sum.
+#
+# Each sum is accumulated term by term in reading order (np.cumsum is a
+# sequential sum, unlike np.sum), with the same expressions least_square_linear
+# uses, so the results agree with it to the last bit or two (square roots).
+# tests/test_leak_fit_equivalence.py checks that.
+#
+# Where least_square_linear returns its -100 "no fit" value, so do these.
+# Where it raises (division by zero) or returns a complex number (square root
+# of a negative difference), these give nan or inf for that chamber.
+#
+# Example, refitting every raw data file of a day:
+#   paths = sorted(raw_data_dir.glob("*_2021_06_15_rawdata.txt"))
+#   leak_rate, leak_rate_err, n = fit_files(paths)
+################################################################################
+import re
+from pathlib import Path
+
+import numpy as np
+
+from guis.straw.leak.straw_leak_utilities import (
+    CHAMBER_VOLUME,
+    CHAMBER_VOLUME_ERR,
+    calculate_leak_rate,
+    calculate_leak_rate_err,
+    get_data_from_file,
+)
+
+NO_FIT = -100  # least_square_linear's value for a fit it can't make
+
+RAW_DATA_CHAMBER = re.compile(r"_chamber(\d+)_")
+
+
+## ARRAYS ##
+# Stack sequences of different lengths into one (n sequences, longest) float
+# array, padded with fill, and the mask of the real entries
+def stack(sequences, fill=0.0):
+    lengths = np.array([len(s) for s in sequences], dtype=int)
+    width = lengths.max() if len(lengths) else 0
+    mask = np.arange(width) < lengths[:, np.newaxis]
+    values = np.full(mask.shape, fill, dtype=float)
+    if width:
+        values[mask] = np.concatenate([np.asarray(s, dtype=float) for s in sequences])
+    return values, mask
+
+
+# Sum along the last axis in order, left to right, like a python loop would
+def _sum(terms, mask):
+    terms = np.where(mask, terms, 0.0)
+    if terms.shape[-1] == 0:
+        return np.zeros(terms.shape[:-1])
+    return np.cumsum(terms, axis=-1)[..., -1]
+
+
+def _mask(x, mask):
+    return np.ones(np.shape(x), dtype=bool) if mask is None else np.asarray(mask)
+
+
+## FIT ##
+# The weighted sums behind get_fit, per chamber:
+#   sum((1/err)^2), sum(x/err^2), sum(y/err^2), sum(x*y/err^2), sum(x^2/err^2)
+def weighted_sums(x, y, y_err, mask=None):
+    x, y, y_err = (np.asarray(a, dtype=float) for a in (x, y, y_err))
+    mask = _mask(x, mask)
+    # padding may hold anything, e.g. 0 errors: don't divide by it
+    y_err = np.where(mask, y_err, 1.0)
+    err_sqr = y_err ** 2
+    return (
+        _sum((1.0 / y_err) ** 2, mask),
+        _sum(x / err_sqr, mask),
+        _sum(y / err_sqr, mask),
+        _sum((x * y) / err_sqr, mask),
+        _sum(x ** 2 / err_sqr, mask),
+    )
+
+
+# slope, slope_err, intercept, intercept_err from the weighted sums, like
+# get_fit (and LeakFitState.fit) from its own
+def fit_from_sums(sum_w, sum_x, sum_y, sum_xy, sum_xx):
+    sum_w, sum_x, sum_y, sum_xy, sum_xx = np.broadcast_arrays(
+        *(np.asarray(s, dtype=float) for s in (sum_w, sum_x, sum_y, sum_xy, sum_xx))
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # get_slope
+        den1 = sum_x ** 2
+        den2 = sum_xx * sum_w
+        slope = np.where(
+            den1 != den2, (sum_x * sum_y - sum_xy * sum_w) / (den1 - den2), NO_FIT
+        )
+
+        # get_slope_err and get_intercept_err: den1 - den2 is the other way round
+        slope_err = np.where(den2 != den1, np.sqrt(sum_w / (den2 - den1)), NO_FIT)
+        intercept_err = np.where(den2 != den1, np.sqrt(sum_xx / (den2 - den1)), NO_FIT)
+
+        # get_intercept, with the slope before get_fit replaces 0 with 1e-100
+        intercept = np.where(sum_x != 0, (sum_xy - slope * sum_xx) / sum_x, NO_FIT)
+
+    slope = np.where(slope == 0, 1e-100, slope)
+    return slope, slope_err, intercept, intercept_err
+
+
+# get_fit for every row (chamber) of x, y and y_err at once. The inputs may
+# have any number of leading dimensions; the fit is along the last one.
+# Returns arrays of slope, slope_err, intercept, intercept_err.
+def fit(x, y, y_err, mask=None):
+    return fit_from_sums(*weighted_sums(x, y, y_err, mask))
+
+
+# get_fit for each LeakFitState (e.g. all 50 chambers of the leak stand),
+# from the running sums they already hold
+def fit_states(states):
+    return fit_from_sums(
+        *(
+            np.array([getattr(state, name) for state in states], dtype=float)
+            for name in ("_sum_w", "_sum_x", "_sum_y", "_sum_xy", "_sum_xx")
+        )
+    )
+
+
+# get_slope_zero_intercept and get_slope_err_zero_intercept for every row.
+# Returns arrays of slope, slope_err.
+def fit_zero_intercept(x, y, y_err, mask=None):
+    x, y, y_err = (np.asarray(a, dtype=float) for a in (x, y, y_err))
+    mask = _mask(x, mask)
+    y_err = np.where(mask, y_err, 1.0)
+    err_sqr = y_err ** 2
+    sum_xx = _sum(x ** 2 / err_sqr, mask)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = _sum((x * y) / err_sqr, mask) / sum_xx
+        residuals = _sum((y - x * slope[..., np.newaxis]) ** 2, mask)
+        s = np.sqrt(residuals / (mask.sum(axis=-1) - 1))
+        slope_err = s / np.sqrt(sum_xx)
+    return slope, slope_err
+
+
+## LEAK RATES ##
+# Chamber volumes and their uncertainties (ccs) for an array of chamber numbers,
+# less straw_volume (LeakTestGUI subtracts STRAW_VOLUME, the straw being in)
+def chamber_volumes(chambers, straw_volume=0.0):
+    chambers = np.asarray(chambers, dtype=int)
+    return (
+        np.asarray(CHAMBER_VOLUME, dtype=float).ravel()[chambers] - straw_volume,
+        np.asarray(CHAMBER_VOLUME_ERR, dtype=float).ravel()[chambers],
+    )
+
+
+# calculate_leak_rate and calculate_leak_rate_err for arrays of fitted slopes
+# in the given chambers (see chamber_volumes for straw_volume). Returns arrays
+# of leak_rate, leak_rate_err.
+def leak_rates(slope, slope_err, chambers, straw_volume=0.0):
+    slope = np.asarray(slope, dtype=float)
+    slope_err = np.asarray(slope_err, dtype=float)
+    volume, volume_err = chamber_volumes(chambers, straw_volume)
+    leak_rate = calculate_leak_rate(slope, volume)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        leak_rate_err = calculate_leak_rate_err(
+            leak_rate, slope, slope_err, volume, volume_err
+        )
+    return leak_rate, leak_rate_err
+
+
+## RAW DATA FILES ##
+# Chamber number from a raw data file name, e.g.
+# "ST00854_chamber12_2021_06_15_rawdata.txt" -> 12
+def chamber_from_filename(filename):
+    match = RAW_DATA_CHAMBER.search(str(filename))
+    if match is None:
+        raise ValueError("No chamber number in %s" % filename)
+    return int(match.group(1))
+
+
+# Read raw data files with get_data_from_file. Returns stacked arrays of
+# timestamps, PPM, PPM_err and their mask, one row per file.
+def read_files(paths):
+    data = [get_data_from_file(path) for path in paths]
+    timestamps, mask = stack([d[0] for d in data])
+    PPM, _ = stack([d[1] for d in data])
+    PPM_err, _ = stack([d[2] for d in data], fill=1.0)
+    return timestamps, PPM, PPM_err, mask
+
+
+# Fit raw data files the way refit_straw_leak.refit does (with nothing
+# skipped), all at once. Chambers are taken from the file names unless given.
+# Returns arrays of leak_rate, leak_rate_err and the number of readings fit.
+def fit_files(paths, chambers=None):
+    paths = list(paths)
+    if chambers is None:
+        chambers = [chamber_from_filename(Path(path).name) for path in paths]
+    timestamps, PPM, PPM_err, mask = read_files(paths)
+    slope, slope_err, _, _ = fit(timestamps, PPM, PPM_err, mask)
+    leak_rate, leak_rate_err = leak_rates(slope, slope_err, chambers)
+    return leak_rate, leak_rate_err, mask.sum(axis=-1)
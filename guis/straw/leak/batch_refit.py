@@ -0,0 +1,317 @@
+################################################################################
+# Batch refit of the straw leak raw data
+#
+# refit_straw_leak.py refits one raw data file at a time, interactively. This
+# refits every raw data file in a directory, e.g. after CHAMBER_VOLUME or the
+# fit window changed, with no questions asked:
+#
+#   python -m guis.straw.leak.batch_refit [--raw_dir DIR] [--pattern GLOB]
+#       [--skip_start N] [--skip_end N] [--archive DIR] [--results CSV]
+#       [--processes N] [--chunk N] [--straw_volume CCS] [--tolerance 0.01]
+#       [--out DIR]
+#
+# The files are split into chunks of --chunk files and fanned out over a pool
+# of --processes processes. Each chunk is fit at once by batch_fit (the same
+# numbers refit_straw_leak.refit gives, skipping points the same way) and its
+# leak rates come from calculate_leak_rate and calculate_leak_rate_err. Files
+# in the --archive (raw_data_archive.py) and unchanged since are read from it
+# rather than the text. Chamber volumes are less --straw_volume (default
+# STRAW_VOLUME), as LeakTestGUI has them when it records a result; pass 0 for
+# the empty chamber volumes refit_straw_leak.py uses.
+#
+# Each file's refit is compared with the leak rate recorded for that straw in
+# that chamber in LeakTestResults.csv: the first result recorded on or after
+# the file's date (a test may end the next day), else the last one. Written
+# to --out:
+#   leak_refit_summary.csv - every file's refit and recorded result
+#   leak_refit_diffs.csv   - the files whose refit leak rate is more than
+#                            --tolerance (relative) off the recorded one
+# Progress and the files/s rate are printed as chunks finish.
+################################################################################
+import argparse, bisect, collections, csv, datetime, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from guis.straw.leak.batch_fit import chamber_from_filename, fit, leak_rates, stack
+from guis.straw.leak.raw_data_archive import (
+    RAW_DATA_PATTERN,
+    RawDataArchive,
+    parse_name,
+)
+from guis.straw.leak.refit_straw_leak import truncate
+from guis.straw.leak.straw_leak_utilities import STRAW_VOLUME, get_data_from_file
+
+import logging
+
+logger = logging.getLogger("root")
+
+SUMMARY = "leak_refit_summary.csv"
+DIFFS = "leak_refit_diffs.csv"
+
+Refit = collections.namedtuple(
+    "Refit",
+    [
+        "file",  # raw data file name
+        "straw",
+        "chamber",
+        "date",  # YYYY_mm_dd of the file name
+        "readings",  # number of readings fit
+        "leak_rate",
+        "leak_rate_err",
+        "recorded_leak_rate",  # "" if none is recorded
+        "recorded_leak_rate_err",
+        "recorded_time",
+        "difference",  # (leak_rate - recorded) / recorded, "" if none
+        "error",  # why the file couldn't be refit, "" if it could
+    ],
+)
+
+
+## FITTING (in the pool's processes) ##
+# timestamps, PPM, PPM_err of a raw data file, from the archive if it's there
+# and up to date
+def read_file(path, archive=None):
+    if archive is not None and archive.current(path):
+        return archive.get_data(path.name)
+    return get_data_from_file(path)
+
+
+# Refit a chunk of raw data files. Returns a list of Refit, with no recorded
+# result filled in yet.
+def refit_chunk(
+    paths, skip_start=0, skip_end=0, archive_dir=None, straw_volume=STRAW_VOLUME
+):
+    archive = RawDataArchive(archive_dir) if archive_dir else None
+    refits = []
+    data = []
+    for path in map(Path, paths):
+        straw, date = parse_name(path.name)
+        refit = Refit(path.name, straw, None, date, 0, "", "", "", "", "", "", "")
+        try:
+            chamber = chamber_from_filename(path.name)
+            timestamps, PPM, PPM_err = (
+                truncate(column, skip_start, skip_end)
+                for column in read_file(path, archive)
+            )
+        except (OSError, ValueError, IndexError) as e:
+            refits.append(refit._replace(error=str(e) or type(e).__name__))
+            continue
+        refits.append(refit._replace(chamber=chamber))
+        data.append((len(refits) - 1, timestamps, PPM, PPM_err))
+
+    if data:
+        timestamps, mask = stack([d[1] for d in data])
+        PPM, _ = stack([d[2] for d in data])
+        PPM_err, _ = stack([d[3] for d in data], fill=1.0)
+        slope, slope_err, _, _ = fit(timestamps, PPM, PPM_err, mask)
+        chambers = [refits[d[0]].chamber for d in data]
+        leak_rate, leak_rate_err = leak_rates(slope, slope_err, chambers, straw_volume)
+        for i, (index, *_) in enumerate(data):
+            refits[index] = refits[index]._replace(
+                readings=int(mask[i].sum()),
+                leak_rate=float(leak_rate[i]),
+                leak_rate_err=float(leak_rate_err[i]),
+            )
+    return refits
+
+
+## RECORDED RESULTS ##
+# LeakTestResults.csv rows as {(STRAW, chamber): [(datetime, leak_rate,
+# leak_rate_err)] oldest first}. Rows that can't be read are skipped.
+def read_results(path):
+    results = collections.defaultdict(list)
+    with open(path, "r", newline="") as f:
+        for row in csv.reader(f):
+            if len(row) < 7:
+                continue
+            try:
+                straw = row[0].strip().upper()
+                when = parse_time(row[1].strip())
+                chamber = int(row[4].strip().lower().replace("chamber", ""))
+                leak_rate = float(row[5])
+                leak_rate_err = float(row[6])
+            except ValueError:
+                continue
+            results[(straw, chamber)].append((when, leak_rate, leak_rate_err))
+    for records in results.values():
+        records.sort(key=lambda record: record[0])
+    return results
+
+
+# Times as the leak GUI and the verification GUI write them
+def parse_time(text):
+    for format in ("%Y-%m-%d %H:%M:%S", "%m/%d/%Y %H:%M"):
+        try:
+            return datetime.datetime.strptime(text, format)
+        except ValueError:
+            pass
+    raise ValueError("Unknown time %r" % text)
+
+
+# The result recorded for a file's test: the first on or after its date, else
+# the last. None if the straw has none in that chamber.
+def recorded(results, refit):
+    records = results.get((refit.straw.upper(), refit.chamber))
+    if not records:
+        return None
+    try:
+        day = datetime.datetime.strptime(refit.date, "%Y_%m_%d")
+    except ValueError:
+        return records[-1]
+    index = bisect.bisect_left([record[0] for record in records], day)
+    return records[min(index, len(records) - 1)]
+
+
+def compare(refit, record):
+    if record is None or refit.error:
+        return refit
+    when, leak_rate, leak_rate_err = record
+    difference = (
+        (refit.leak_rate - leak_rate) / leak_rate if leak_rate else float("inf")
+    )
+    return refit._replace(
+        recorded_leak_rate=leak_rate,
+        recorded_leak_rate_err=leak_rate_err,
+        recorded_time=when.strftime("%Y-%m-%d %H:%M:%S"),
+        difference=difference,
+    )
+
+
+def differs(refit, tolerance):
+    return refit.difference != "" and not abs(refit.difference) <= tolerance
+
+
+## RUNNING ##
+# Refit paths over a pool of processes. Calls progress(done, total) as chunks
+# finish. Returns the Refits in the order of paths.
+def refit_files(
+    paths,
+    skip_start=0,
+    skip_end=0,
+    archive_dir=None,
+    processes=None,
+    chunk=50,
+    progress=None,
+    straw_volume=STRAW_VOLUME,
+):
+    paths = [str(path) for path in paths]
+    chunks = [paths[i : i + chunk] for i in range(0, len(paths), chunk)]
+    refits = [None] * len(chunks)
+    done = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {
+            pool.submit(
+                refit_chunk,
+                chunk_paths,
+                skip_start,
+                skip_end,
+                archive_dir,
+                straw_volume,
+            ): i
+            for i, chunk_paths in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            refits[futures[future]] = future.result()
+            done += len(refits[futures[future]])
+            if progress is not None:
+                progress(done, len(paths))
+    return [refit for chunk_refits in refits for refit in chunk_refits]
+
+
+def write_csv(path, refits):
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(Refit._fields)
+        writer.writerows(refits)
+    os.replace(tmp, path)
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser(
+        description="Refit every straw leak raw data file and compare with the "
+        "recorded leak rates"
+    )
+    parser.add_argument("--raw_dir", help="default: the leak raw_data directory")
+    parser.add_argument("--pattern", default=RAW_DATA_PATTERN)
+    parser.add_argument("--skip_start", type=int, default=0, help="points")
+    parser.add_argument("--skip_end", type=int, default=0, help="points")
+    parser.add_argument("--archive", help="raw_data_archive to read from, if any")
+    parser.add_argument("--results", help="default: LeakTestResults.csv")
+    parser.add_argument("--processes", type=int, help="default: one per cpu")
+    parser.add_argument("--chunk", type=int, default=50, help="files per task")
+    parser.add_argument(
+        "--straw_volume",
+        type=float,
+        default=STRAW_VOLUME,
+        help="ccs taken off each chamber volume (default: %(default)s)",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.01)
+    parser.add_argument("--out", default=".", help="directory for the csv files")
+    return parser.parse_args()
+
+
+def Main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    options = GetOptions()
+    if options.raw_dir and options.results:
+        raw_dir, results_path = Path(options.raw_dir), Path(options.results)
+    else:
+        from guis.common.getresources import GetProjectPaths
+
+        leak_dir = GetProjectPaths()["strawleakdata"]
+        raw_dir = Path(options.raw_dir or leak_dir / "raw_data")
+        results_path = Path(options.results or leak_dir / "LeakTestResults.csv")
+
+    paths = sorted(raw_dir.glob(options.pattern))
+    print("Refitting %d files in %s" % (len(paths), raw_dir))
+    start = time.perf_counter()
+
+    def progress(done, total):
+        elapsed = time.perf_counter() - start
+        print(
+            "%6d / %d files, %8.1f files/s" % (done, total, done / elapsed),
+            end="\r",
+        )
+
+    refits = refit_files(
+        paths,
+        options.skip_start,
+        options.skip_end,
+        options.archive,
+        options.processes,
+        options.chunk,
+        progress,
+        options.straw_volume,
+    )
+    elapsed = time.perf_counter() - start
+
+    results = read_results(results_path) if results_path.is_file() else {}
+    refits = [compare(refit, recorded(results, refit)) for refit in refits]
+    diffs = [refit for refit in refits if differs(refit, options.tolerance)]
+
+    out = Path(options.out)
+    out.mkdir(parents=True, exist_ok=True)
+    write_csv(out / SUMMARY, refits)
+    write_csv(out / DIFFS, diffs)
+
+    failed = sum(1 for refit in refits if refit.error)
+    unrecorded = sum(1 for refit in refits if refit.difference == "")
+    print(
+        "\n%d files in %.1f s, %.1f files/s: %d failed, %d with no recorded "
+        "result, %d differ by more than %g"
+        % (
+            len(refits),
+            elapsed,
+            len(refits) / elapsed if elapsed else float("inf"),
+            failed,
+            unrecorded - failed,
+            len(diffs),
+            options.tolerance,
+        )
+    )
+    print("Wrote %s and %s" % (out / SUMMARY, out / DIFFS))
+
+
+if __name__ == "__main__":
+    Main()
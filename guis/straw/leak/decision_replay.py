@@ -0,0 +1,256 @@
+################################################################################
+# Replay of leak test decisions over past raw data
+#
+# Replays each raw data file the way LeakTestStatus sees it: readings added to
+# a LeakFitState one by one, the fit checked every --interval s, a chamber
+# with more than max_co2_level ppm failed as a large leak. At each check it
+# asks leak_decision.fixed_decision and, for each --z, decide() with a
+# SequentialDecision, and notes the first decision of each and when it came.
+#
+#   python -m guis.straw.leak.decision_replay (--archive DIR | --raw_dir DIR)
+#       [--z 2 3 4] [--min_duration 1800] [--interval 15] [--out CSV]
+#
+# For each z it reports
+#   saved     - chamber-hours the sequential rule frees: from its decision to
+#               the fixed rules' (or to the end of the file, when the fixed
+#               rules never decided and the straw was taken out by hand)
+#   disagree  - straws it decided the other way from the fixed rules, out of
+#               those both decided
+# --out writes every file's decisions and times as csv.
+################################################################################
+import argparse, collections, csv, math
+from pathlib import Path
+
+from guis.straw.leak.batch_fit import chamber_from_filename
+from guis.straw.leak.leak_decision import (
+    FAILED,
+    SequentialDecision,
+    decide,
+    fixed_decision,
+)
+from guis.straw.leak.raw_data_archive import RAW_DATA_PATTERN, RawDataArchive, read_text
+from guis.straw.leak.straw_leak_utilities import (
+    STRAW_VOLUME,
+    calculate_leak_rate,
+    calculate_leak_rate_err,
+    get_chamber_volume,
+    get_chamber_volume_err,
+)
+from guis.straw.leak.streaming_fit import LeakFitState
+
+MAX_LEAKRATE = 0.00009645060  # cc/min, LeakTestStatus.max_leakrate
+MAX_CO2_LEVEL = 1800  # ppm, LeakTestStatus.max_co2_level
+MIN_NUMBER_DATAPOINTS = 10  # LeakTestStatus.min_number_datapoints
+CHECK_INTERVAL = 15  # s between fits, as LeakTestStatus.handleStart
+
+# A rule's first decision on a file: PASSED/FAILED or None, and when, in s
+# since the file's first reading (None if it never decided)
+Decision = collections.namedtuple("Decision", ["result", "time"])
+
+Replay = collections.namedtuple(
+    "Replay",
+    [
+        "file",
+        "chamber",
+        "duration",  # s from the first reading to the last
+        "fixed",  # Decision of the fixed rules
+        "sequential",  # [Decision] of each SequentialDecision
+    ],
+)
+
+
+# Replay one file's readings, (2, n) timestamps and ppm as archived
+def replay(
+    name,
+    readings,
+    chamber,
+    sequentials,
+    max_leakrate=MAX_LEAKRATE,
+    interval=CHECK_INTERVAL,
+):
+    # the chamber as LeakTestStatus has it, with the straw in
+    volume = get_chamber_volume(chamber) - STRAW_VOLUME
+    volume_err = get_chamber_volume_err(chamber)
+
+    timestamps, PPM = (column.tolist() for column in readings)
+    start = timestamps[0] if timestamps else 0
+    fixed = Decision(None, None)
+    sequential = [Decision(None, None)] * len(sequentials)
+
+    state = LeakFitState()
+    last_check = start
+    for timestamp, ppm in zip(timestamps, PPM):
+        state.add(timestamp, ppm)
+        if timestamp < last_check + interval:
+            continue
+        last_check = timestamp
+        if len(state) < MIN_NUMBER_DATAPOINTS:
+            continue
+
+        if state.max_ppm > MAX_CO2_LEVEL:
+            # a large leak, for either rule
+            results = [FAILED] * (1 + len(sequentials))
+        else:
+            slope, slope_err, _, _ = state.fit()
+            leak_rate = calculate_leak_rate(slope, volume)
+            leak_rate_err = calculate_leak_rate_err(
+                leak_rate, slope, slope_err, volume, volume_err
+            )
+            if isinstance(leak_rate_err, complex):
+                leak_rate_err = math.nan
+            args = (len(state), leak_rate, leak_rate_err, state.runningDuration())
+            results = [fixed_decision(*args, max_leakrate)] + [
+                decide(*args, max_leakrate, rule) for rule in sequentials
+            ]
+
+        elapsed = timestamp - start
+        if fixed.result is None and results[0] is not None:
+            fixed = Decision(results[0], elapsed)
+        for i, result in enumerate(results[1:]):
+            if sequential[i].result is None and result is not None:
+                sequential[i] = Decision(result, elapsed)
+        if fixed.result is not None and all(d.result for d in sequential):
+            break
+
+    duration = timestamps[-1] - start if timestamps else 0
+    return Replay(name, chamber, duration, fixed, sequential)
+
+
+# Totals of a list of Replay for the i'th SequentialDecision
+def summarize(replays, i):
+    occupied = saved = 0.0
+    both = disagree = early_only = 0
+    for r in replays:
+        fixed_time = r.fixed.time if r.fixed.result else r.duration
+        occupied += fixed_time
+        decision = r.sequential[i]
+        if decision.result is None:
+            continue
+        saved += max(fixed_time - decision.time, 0)
+        if r.fixed.result is None:
+            early_only += 1
+        else:
+            both += 1
+            disagree += decision.result != r.fixed.result
+    return {
+        "files": len(replays),
+        "fixed_decided": sum(1 for r in replays if r.fixed.result),
+        "decided": sum(1 for r in replays if r.sequential[i].result),
+        "early_only": early_only,  # decided where the fixed rules never did
+        "both": both,
+        "disagree": disagree,
+        "chamber_hours": occupied / 3600,
+        "saved_hours": saved / 3600,
+    }
+
+
+## RUNNING ##
+# (name, chamber, readings) of every archived file, or of every raw data text
+# file in raw_dir
+def sources(archive_dir=None, raw_dir=None, pattern=RAW_DATA_PATTERN):
+    if archive_dir is not None:
+        archive = RawDataArchive(archive_dir)
+        for name in sorted(archive.entries):
+            if Path(name).match(pattern):
+                yield name, archive.entries[name].chamber, archive.readings(name)
+    else:
+        for path in sorted(Path(raw_dir).glob(pattern)):
+            readings, chamber = read_text(path)
+            yield path.name, chamber, readings
+
+
+def replay_all(
+    sequentials,
+    archive_dir=None,
+    raw_dir=None,
+    pattern=RAW_DATA_PATTERN,
+    interval=CHECK_INTERVAL,
+):
+    replays = []
+    for name, chamber, readings in sources(archive_dir, raw_dir, pattern):
+        if name.startswith("empty"):
+            continue
+        try:
+            chamber = chamber_from_filename(name)
+        except ValueError:
+            if chamber is None:
+                continue
+        replays.append(replay(name, readings, chamber, sequentials, interval=interval))
+    return replays
+
+
+def write_csv(path, replays, sequentials):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        header = ["file", "chamber", "duration", "fixed", "fixed_time"]
+        for rule in sequentials:
+            header += ["z%g" % rule.z, "z%g_time" % rule.z]
+        writer.writerow(header)
+        for r in replays:
+            row = [r.file, r.chamber, r.duration, r.fixed.result, r.fixed.time]
+            for d in r.sequential:
+                row += [d.result, d.time]
+            writer.writerow(["" if v is None else v for v in row])
+
+
+def report(replays, sequentials):
+    for i, rule in enumerate(sequentials):
+        s = summarize(replays, i)
+        print(
+            "z %-4g %5d files: %5d decided (fixed rules %d, %d only by z), "
+            "%6.1f of %.1f chamber-hours saved (%4.1f%%), "
+            "disagree %d of %d (%.2f%%)"
+            % (
+                rule.z,
+                s["files"],
+                s["decided"],
+                s["fixed_decided"],
+                s["early_only"],
+                s["saved_hours"],
+                s["chamber_hours"],
+                (
+                    100 * s["saved_hours"] / s["chamber_hours"]
+                    if s["chamber_hours"]
+                    else 0
+                ),
+                s["disagree"],
+                s["both"],
+                100 * s["disagree"] / s["both"] if s["both"] else 0,
+            )
+        )
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser(
+        description="Replay past leak tests with the fixed and sequential rules"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--archive", help="raw_data_archive directory")
+    source.add_argument("--raw_dir", help="raw_data text files directory")
+    parser.add_argument("--pattern", default=RAW_DATA_PATTERN)
+    parser.add_argument("--z", type=float, nargs="+", default=[2.0, 3.0, 4.0])
+    parser.add_argument("--min_duration", type=float, default=1800, help="s")
+    parser.add_argument("--interval", type=float, default=CHECK_INTERVAL, help="s")
+    parser.add_argument("--out", help="csv of every file's decisions")
+    return parser.parse_args()
+
+
+def Main():
+    options = GetOptions()
+    sequentials = [
+        SequentialDecision(z=z, min_duration=options.min_duration) for z in options.z
+    ]
+    replays = replay_all(
+        sequentials,
+        options.archive,
+        options.raw_dir,
+        options.pattern,
+        options.interval,
+    )
+    report(replays, sequentials)
+    if options.out:
+        write_csv(options.out, replays, sequentials)
+
+
+if __name__ == "__main__":
+    Main()
@@ -0,0 +1,111 @@
+################################################################################
+# Pass/fail decisions of the straw leak test
+#
+# LeakTestStatus refits each chamber every 15 s and decides with these:
+#   fixed_decision     - the fixed rules the leak test has always used: more
+#                        than 20 points and a small enough error, or 27000 s
+#                        of data
+#   SequentialDecision - optional, off unless LeakTestGUI is run with
+#                        --sequential: passes (fails) a straw as soon as its
+#                        leak rate plus (minus) z times calculate_leak_rate_err
+#                        is below (above) max_leakrate, rather than waiting
+#                        for the error to shrink to a tenth of max_leakrate
+#                        or for the 27000 s cutoff
+# decide() applies both. The two can't disagree at the same moment (a pass
+# needs the rate below max_leakrate, a fail above), so the sequential rule
+# only ever decides earlier; the fixed rules still decide the straws it
+# can't.
+#
+# The fit is refit and looked at again every 15 s, so z has to cover the
+# many looks, and the leak rate error assumes independent readings. Check a
+# choice of z against the fixed rules on past data with decision_replay.py
+# before turning it on.
+################################################################################
+import math
+
+PASSED = "P"
+FAILED = "F"
+
+MIN_POINTS = 20  # more than this many readings before deciding
+MAX_DURATION = 27000  # s, decide on the rate alone after this long (7.5 h)
+
+
+# The fixed rules. Returns PASSED, FAILED or None (no decision yet).
+def fixed_decision(
+    n,
+    leak_rate,
+    leak_rate_err,
+    running_duration,
+    max_leakrate,
+    min_points=MIN_POINTS,
+    max_duration=MAX_DURATION,
+):
+    if not n > min_points:
+        return None
+
+    # PASS type 1: acceptable rate and rate error
+    if leak_rate < max_leakrate and leak_rate_err < max_leakrate / 10:
+        return PASSED
+
+    # PASS type 2: acceptable rate, unacceptable rate error, but event time
+    # 7.5 hrs +
+    if leak_rate < max_leakrate and running_duration > max_duration:
+        return PASSED
+
+    # FAIL type 1: unacceptable rate, acceptable error. A well-understood
+    # failure.
+    if leak_rate > max_leakrate and leak_rate_err < max_leakrate / 10:
+        return FAILED
+
+    # FAIL type 2: unacceptable rate, unacceptable error, 7.5 hrs+.
+    if leak_rate > max_leakrate and running_duration > max_duration:
+        return FAILED
+
+    # FAIL type 3: even rate - 10 err is above threshold. Doesn't even pass
+    # within error bars
+    if (leak_rate - 10 * leak_rate_err) > max_leakrate:
+        return FAILED
+
+    # AFAICT this just happens when we don't have enough data
+    return None
+
+
+class SequentialDecision:
+    def __init__(self, z=3.0, min_points=MIN_POINTS, min_duration=1800):
+        self.z = z  # leak rate errors the bound must clear max_leakrate by
+        self.min_points = min_points  # more readings than this first
+        self.min_duration = min_duration  # s of readings first
+
+    # PASSED, FAILED or None, like fixed_decision
+    def __call__(self, n, leak_rate, leak_rate_err, running_duration, max_leakrate):
+        if not n > self.min_points or running_duration < self.min_duration:
+            return None
+        # no fit (-100), or no error to go on
+        if not (math.isfinite(leak_rate_err) and leak_rate_err > 0):
+            return None
+        if leak_rate + self.z * leak_rate_err < max_leakrate:
+            return PASSED
+        if leak_rate - self.z * leak_rate_err > max_leakrate:
+            return FAILED
+        return None
+
+    def __repr__(self):
+        return "SequentialDecision(z=%g, min_points=%d, min_duration=%g)" % (
+            self.z,
+            self.min_points,
+            self.min_duration,
+        )
+
+
+# The fixed rules' decision, else the sequential rule's if there is one
+def decide(
+    n, leak_rate, leak_rate_err, running_duration, max_leakrate, sequential=None
+):
+    decision = fixed_decision(
+        n, leak_rate, leak_rate_err, running_duration, max_leakrate
+    )
+    if decision is None and sequential is not None:
+        decision = sequential(
+            n, leak_rate, leak_rate_err, running_duration, max_leakrate
+        )
+    return decision
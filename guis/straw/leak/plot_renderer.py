@@ -0,0 +1,219 @@
+################################################################################
+# Leak fit plots, rendered off the acquisition loop
+#
+# LeakTestStatus's acquisition loop hands each chamber's latest fit to a
+# PlotRenderer with submit(), which only stores it; a render thread draws the
+# pdfs. Only the newest fit of each chamber is kept, so a slow render never
+# queues up work, and nothing the loop does waits on matplotlib.
+#
+# A chamber's plot is redrawn when
+#   - its pass/fail status changed, or it has no plot yet
+#   - it has new readings and its plot is at least min_interval s old
+#   - someone asked for it (request(), e.g. the Plot button) and it's stale
+# Each render draws a new Figure, without pyplot, and writes the pdf under a
+# temporary name first, so nothing is kept between renders and a pdf is never
+# read half written.
+################################################################################
+import collections, os, threading, time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import logging
+
+logger = logging.getLogger("root")
+
+
+# One chamber's fit, as plotted. The readings are the first n of fit_state's,
+# which only ever appends to them.
+PlotData = collections.namedtuple(
+    "PlotData",
+    [
+        "path",  # pdf to write
+        "title",
+        "fit_state",  # LeakFitState of the chamber's raw data file
+        "n",  # number of readings fit
+        "slope",
+        "slope_err",
+        "intercept",
+        "leak_rate",
+        "leak_rate_err",
+        "status",  # e.g. "Passed leak requirement"
+        "time",  # human timestamp of the fit
+    ],
+)
+
+
+def renderPlot(data):
+    timestamps = data.fit_state.timestamps[: data.n]
+    PPM = data.fit_state.PPM[: data.n]
+
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    x = np.linspace(0, max(timestamps))
+    axes.plot(timestamps, PPM, "bo")
+    axes.plot(x, data.slope * x + data.intercept, "r")
+    axes.set_xlabel("time (s)")
+    axes.set_ylabel("CO2 level (PPM)")
+    axes.set_title(data.title)
+    info_string = (
+        "Slope = %.2f +- %.2f x $10^{-3}$ PPM/sec \n"
+        % (data.slope * 10 ** 4, data.slope_err * 10 ** 4)
+        + "Leak Rate = %.2f +- %.2f x $10^{-5}$ cc/min \n"
+        % (data.leak_rate * (10 ** 5), data.leak_rate_err * (10 ** 5))
+        + data.status
+        + "\n"
+        + data.time
+    )
+    figure.text(0.49, 0.80, info_string, fontsize=12, color="r")
+
+    path = str(data.path)
+    figure.savefig(path + ".tmp", format="pdf")
+    os.replace(path + ".tmp", path)
+
+
+class PlotRenderer(threading.Thread):
+    def __init__(self, min_interval=60, render=renderPlot):
+        threading.Thread.__init__(self, name="PlotRenderer", daemon=True)
+        self.min_interval = min_interval  # s between redraws for new readings
+        self._render = render
+        self._latest = {}  # chamber : newest PlotData
+        self._rendered = {}  # chamber : (PlotData, time.monotonic()) last drawn
+        self._requests = {}  # chamber : [callbacks waiting for its plot]
+        self._condition = threading.Condition()
+        self._stopping = False
+
+        ## Statistics, see stats()
+        self.submitted = 0
+        self.renders = 0
+        self.failed = 0
+        self.render_times = collections.deque(maxlen=1000)  # s per render
+
+    ## CALLED FROM OTHER THREADS ##
+
+    # Hand over a chamber's latest fit. Returns at once.
+    def submit(self, chamber, data):
+        with self._condition:
+            self._latest[chamber] = data
+            self.submitted += 1
+            self._condition.notify()
+
+    # Bring the chamber's plot up to date, then call callback() on the render
+    # thread. Called straight away if there's nothing to draw.
+    def request(self, chamber, callback):
+        with self._condition:
+            self._requests.setdefault(chamber, []).append(callback)
+            self._condition.notify()
+
+    # Forget the chamber's fits, e.g. when its straw is unloaded
+    def forget(self, chamber):
+        with self._condition:
+            self._latest.pop(chamber, None)
+            self._rendered.pop(chamber, None)
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+    def stats(self):
+        times = sorted(self.render_times)
+        with self._condition:
+            pending = len(self._due(float("inf")))
+        return {
+            "submitted": self.submitted,
+            "renders": self.renders,
+            "failed": self.failed,
+            "pending": pending,  # chambers with changes not drawn yet
+            "render_time_median": times[len(times) // 2] if times else None,
+        }
+
+    ## RENDER THREAD ##
+
+    # Changed since last drawn: new readings, status or file
+    def _changed(self, chamber):
+        data = self._latest.get(chamber)
+        if data is None:
+            return False
+        last = self._rendered.get(chamber)
+        return last is None or (data.path, data.n, data.status) != (
+            last[0].path,
+            last[0].n,
+            last[0].status,
+        )
+
+    # Chambers to draw now, assuming it's `now`
+    def _due(self, now):
+        due = []
+        for chamber in self._latest:
+            if not self._changed(chamber):
+                continue
+            last = self._rendered.get(chamber)
+            if (
+                last is None
+                or chamber in self._requests
+                or self._latest[chamber].status != last[0].status
+                or now - last[1] >= self.min_interval
+            ):
+                due.append(chamber)
+        return due
+
+    # Time until the next chamber with new readings comes off min_interval
+    def _nextDue(self, now):
+        waits = [
+            self._rendered[chamber][1] + self.min_interval - now
+            for chamber in self._latest
+            if chamber in self._rendered and self._changed(chamber)
+        ]
+        return max(min(waits), 0) if waits else None
+
+    def run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopping:
+                        return
+                    now = time.monotonic()
+                    due = self._due(now)
+                    if due or self._requests:
+                        break
+                    self._condition.wait(self._nextDue(now))
+                # requests with nothing to draw are answered straight away
+                callbacks = [
+                    callback
+                    for chamber in [c for c in self._requests if c not in due]
+                    for callback in self._requests.pop(chamber)
+                ]
+                # requested chambers first
+                due.sort(key=lambda chamber: chamber not in self._requests)
+                if due:
+                    chamber = due[0]
+                    data = self._latest[chamber]
+                    callbacks += self._requests.pop(chamber, [])
+
+            if due:
+                self._draw(chamber, data)
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.error("Plot request failed: %s" % e)
+
+    def _draw(self, chamber, data):
+        start = time.monotonic()
+        try:
+            self._render(data)
+            self.renders += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(
+                "Could not plot chamber %s to %s: %s" % (chamber, data.path, e)
+            )
+        finished = time.monotonic()
+        self.render_times.append(finished - start)
+        with self._condition:
+            # not if forgotten while drawing
+            if self._latest.get(chamber) is not None:
+                self._rendered[chamber] = (data, finished)
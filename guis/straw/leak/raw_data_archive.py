@@ -0,0 +1,255 @@
+################################################################################
+# Columnar archive of the straw leak raw data
+#
+# Refits, verification and plots all re-parse the text files in the leak raw
+# data directory line by line (straw_leak_utilities.get_data_from_file). The
+# archive keeps each raw data file's readings as a numpy array instead, so
+# reading a straw's history is one memory-mapped np.load:
+#
+#   <archive>/<raw file name without .txt>.npy
+#       float64, shape (2, readings): row 0 the epoch timestamps, row 1 the
+#       ppm, every line of the file in order. Each column is contiguous.
+#   <archive>/manifest.csv
+#       one row per archived file: its name, straw, chamber, date, number of
+#       readings, first and last timestamp, and the size and mtime of the text
+#       file it was converted from
+#
+# The text files stay where they are and are still what the GUI writes; the
+# archive is converted from them, by hand or on a schedule:
+#
+#   python -m guis.straw.leak.raw_data_archive [--raw_dir DIR] [--archive DIR]
+#
+# Files already archived are only converted again if their size or mtime
+# changed, e.g. a test still running. The archive defaults to raw_data_archive
+# next to raw_data.
+#
+#   archive = RawDataArchive(directory)
+#   archive.get_data("ST00854_chamber12_2021_06_15_rawdata.txt")
+#       # == get_data_from_file(raw_data / that file)
+#   for entry in archive.straw("ST00854"):
+#       archive.readings(entry.name)
+#
+# benchmarks/leak_raw_archive.py compares reading the archive with reading the
+# text files, and checks that they read the same.
+################################################################################
+import argparse, collections, csv, os
+from pathlib import Path
+
+import numpy as np
+
+from guis.straw.leak.batch_fit import RAW_DATA_CHAMBER
+from guis.straw.leak.straw_leak_utilities import EXCLUDE_RAW_DATA_SECONDS
+
+import logging
+
+logger = logging.getLogger("root")
+
+RAW_DATA_PATTERN = "*_rawdata.txt"
+MANIFEST = "manifest.csv"
+
+ArchiveEntry = collections.namedtuple(
+    "ArchiveEntry",
+    [
+        "name",  # raw data file name, e.g. ST00854_chamber12_2021_06_15_rawdata.txt
+        "straw",  # e.g. ST00854, or empty12 for an empty chamber
+        "chamber",  # from the readings, None if there are none
+        "date",  # YYYY_mm_dd of the file name, "" if it has none
+        "readings",  # number of lines
+        "start",  # first and last epoch timestamps, None if there are none
+        "end",
+        "source_size",  # bytes and st_mtime_ns of the text file converted
+        "source_mtime",
+    ],
+)
+
+
+## TEXT FILES ##
+# Every line of a raw data file as a (2, readings) array of timestamps and ppm,
+# and the chamber of the first line
+def read_text(path):
+    timestamps = []
+    PPM = []
+    chamber = None
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split()
+            timestamps.append(float(line[0]))
+            PPM.append(float(line[2]))
+            if chamber is None:
+                chamber = int(line[1])
+    return np.array([timestamps, PPM], dtype=np.float64).reshape(2, -1), chamber
+
+
+# The straw and date parts of a raw data file name
+def parse_name(name):
+    stem = name[: -len("_rawdata.txt")] if name.endswith("_rawdata.txt") else name
+    match = RAW_DATA_CHAMBER.search(stem)
+    if match is None:
+        return stem, ""
+    return stem[: match.start()], stem[match.end() :]
+
+
+## ARCHIVE ##
+class RawDataArchive:
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.entries = {}  # name : ArchiveEntry
+        manifest = self.directory / MANIFEST
+        if manifest.is_file():
+            with open(manifest, "r", newline="") as f:
+                for row in csv.DictReader(f):
+                    entry = ArchiveEntry(
+                        name=row["name"],
+                        straw=row["straw"],
+                        chamber=int(row["chamber"]) if row["chamber"] else None,
+                        date=row["date"],
+                        readings=int(row["readings"]),
+                        start=float(row["start"]) if row["start"] else None,
+                        end=float(row["end"]) if row["end"] else None,
+                        source_size=int(row["source_size"]),
+                        source_mtime=int(row["source_mtime"]),
+                    )
+                    self.entries[entry.name] = entry
+
+    def arrayPath(self, name):
+        return self.directory / (Path(name).stem + ".npy")
+
+    ## WRITING ##
+
+    # Archive one raw data file unless it's archived already and hasn't
+    # changed since. Returns whether it was converted. Call save() after.
+    def add(self, path):
+        path = Path(path)
+        stat = path.stat()
+        if self.current(path, stat):
+            return False
+
+        readings, chamber = read_text(path)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        array_path = self.arrayPath(path.name)
+        tmp = array_path.with_suffix(".npy.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, readings)
+        os.replace(tmp, array_path)
+
+        straw, date = parse_name(path.name)
+        n = readings.shape[1]
+        self.entries[path.name] = ArchiveEntry(
+            name=path.name,
+            straw=straw,
+            chamber=chamber,
+            date=date,
+            readings=n,
+            start=float(readings[0, 0]) if n else None,
+            end=float(readings[0, -1]) if n else None,
+            source_size=stat.st_size,
+            source_mtime=stat.st_mtime_ns,
+        )
+        return True
+
+    # Archive every raw data file in a directory, and save the manifest.
+    # Returns the number of files converted, unchanged and failed.
+    def convert(self, raw_directory, pattern=RAW_DATA_PATTERN):
+        converted = unchanged = failed = 0
+        for path in sorted(Path(raw_directory).glob(pattern)):
+            try:
+                if self.add(path):
+                    converted += 1
+                else:
+                    unchanged += 1
+            except (OSError, ValueError, IndexError) as e:
+                logger.warning("Could not archive %s: %s" % (path, e))
+                failed += 1
+        self.save()
+        return converted, unchanged, failed
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        manifest = self.directory / MANIFEST
+        tmp = manifest.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(ArchiveEntry._fields)
+            for name in sorted(self.entries):
+                writer.writerow(
+                    ["" if value is None else value for value in self.entries[name]]
+                )
+        os.replace(tmp, manifest)
+
+    ## READING ##
+
+    # Whether the raw data file is archived as it is now
+    def current(self, path, stat=None):
+        path = Path(path)
+        stat = stat or path.stat()
+        entry = self.entries.get(path.name)
+        return (
+            entry is not None
+            and entry.source_size == stat.st_size
+            and entry.source_mtime == stat.st_mtime_ns
+            and self.arrayPath(path.name).is_file()
+        )
+
+    # Entries of a straw's raw data files, oldest first
+    def straw(self, straw):
+        straw = straw.upper()
+        return sorted(
+            (entry for entry in self.entries.values() if entry.straw.upper() == straw),
+            key=lambda entry: (entry.start is None, entry.start or 0, entry.name),
+        )
+
+    # (2, readings) read-only memory-mapped array of a raw data file's
+    # timestamps and ppm
+    def readings(self, name):
+        return np.load(self.arrayPath(name), mmap_mode="r")
+
+    # What get_data_from_file returns for the raw data file, as arrays:
+    # timestamps since the first reading, skipping the first
+    # EXCLUDE_RAW_DATA_SECONDS, their ppm and ppm error
+    def get_data(self, name):
+        timestamps, PPM = self.readings(name)
+        if not len(timestamps):
+            return np.empty(0), np.empty(0), np.empty(0)
+        eventtime = timestamps - timestamps[0]
+        keep = eventtime >= EXCLUDE_RAW_DATA_SECONDS
+        PPM = np.array(PPM[keep])
+        # calc_ppm_err, elementwise
+        return (
+            eventtime[keep],
+            PPM,
+            ((PPM * 0.02) ** 2 + 20 ** 2) ** 0.5,
+        )
+
+
+def GetOptions():
+    parser = argparse.ArgumentParser(
+        description="Convert the straw leak raw data text files to the archive"
+    )
+    parser.add_argument("--raw_dir", help="default: the leak raw_data directory")
+    parser.add_argument("--archive", help="default: raw_data_archive next to it")
+    return parser.parse_args()
+
+
+def Main():
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    options = GetOptions()
+    if options.raw_dir:
+        raw_dir = Path(options.raw_dir)
+    else:
+        from guis.common.getresources import GetProjectPaths
+
+        raw_dir = GetProjectPaths()["strawleakdata"] / "raw_data"
+    archive_dir = (
+        Path(options.archive)
+        if options.archive
+        else raw_dir.parent / "raw_data_archive"
+    )
+    converted, unchanged, failed = RawDataArchive(archive_dir).convert(raw_dir)
+    print(
+        "%s: %d files converted, %d unchanged, %d failed"
+        % (archive_dir, converted, unchanged, failed)
+    )
+
+
+if __name__ == "__main__":
+    Main()
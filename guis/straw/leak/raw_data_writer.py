@@ -0,0 +1,153 @@
+################################################################################
+# Buffered writer for the leak raw data files
+#
+# LeakTestStatus used to open a chamber's raw data file, append one reading
+# and close it again, for every reading of every chamber. A RawDataWriter keeps
+# one append-only handle per chamber instead, and writes are buffered:
+#   - a flush thread writes every buffered reading out at least every
+#     flush_interval s, so other readers of the file (refit_straw_leak.py, a
+#     LeakFitState rebuilt from the file) are at most that far behind
+#   - fsync_interval s after a flush that isn't on the disk yet, the files
+#     are fsynced too (0: on every flush; None: never, leave it to the OS)
+# The lines written are exactly those passed in, so the files stay in the
+# format get_data_from_file reads.
+#
+# A chamber's file is rotated with open(chamber, path) when its straw changes
+# (or by writing to the new path), and close(chamber) ends it, e.g. before the
+# file is deleted or moved: both flush and fsync the old file and close it.
+# flush(chamber) makes what's been written readable now.
+################################################################################
+import os, threading, time
+
+import logging
+
+logger = logging.getLogger("root")
+
+
+class RawDataWriter:
+    def __init__(self, flush_interval=1.0, fsync_interval=60.0, buffer_size=65536):
+        self.flush_interval = flush_interval  # s a write may stay buffered
+        self.fsync_interval = fsync_interval  # s a flush may stay off the disk
+        self.buffer_size = buffer_size  # bytes per file buffered at most
+        self._files = {}  # chamber : open file
+        self._dirty = set()  # chambers with buffered writes
+        self._unsynced = set()  # chambers flushed but not fsynced
+        self._last_fsync = time.monotonic()
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        ## Statistics, see stats()
+        self.writes = 0
+        self.opens = 0
+        self.flushes = 0
+        self.fsyncs = 0
+
+    ## FILES ##
+
+    # Write the chamber's readings to path from now on, closing the file it
+    # had (if it's another one)
+    def open(self, chamber, path):
+        with self._lock:
+            current = self._files.get(chamber)
+            if current is not None and current.name == str(path):
+                return
+            self.close(chamber)
+            self._files[chamber] = open(str(path), "a", buffering=self.buffer_size)
+            self.opens += 1
+        self._startFlusher()
+
+    # Flush, fsync and close the chamber's file
+    def close(self, chamber):
+        with self._lock:
+            f = self._files.pop(chamber, None)
+            self._dirty.discard(chamber)
+            self._unsynced.discard(chamber)
+            if f is not None:
+                self._sync(f)
+                f.close()
+
+    def closeAll(self):
+        with self._lock:
+            for chamber in list(self._files):
+                self.close(chamber)
+        self._stopping.set()
+
+    def path(self, chamber):
+        with self._lock:
+            f = self._files.get(chamber)
+            return None if f is None else f.name
+
+    ## WRITING ##
+
+    # Append text (whole lines) to the chamber's file, path, opening it if
+    # it's not the one open
+    def write(self, chamber, path, text):
+        with self._lock:
+            self.open(chamber, path)
+            self._files[chamber].write(text)
+            self._dirty.add(chamber)
+            self.writes += 1
+
+    # Write out what's buffered for the chamber (all chambers if None), so
+    # it can be read from the file
+    def flush(self, chamber=None):
+        with self._lock:
+            chambers = list(self._dirty) if chamber is None else [chamber]
+            for c in chambers:
+                if c in self._dirty:
+                    self._files[c].flush()
+                    self._dirty.discard(c)
+                    self._unsynced.add(c)
+                    self.flushes += 1
+
+    # Flush and fsync everything written so far
+    def sync(self):
+        with self._lock:
+            self.flush()
+            for chamber in list(self._unsynced):
+                self._sync(self._files[chamber])
+            self._unsynced.clear()
+            self._last_fsync = time.monotonic()
+
+    def _sync(self, f):
+        f.flush()
+        try:
+            os.fsync(f.fileno())
+            self.fsyncs += 1
+        except OSError as e:
+            logger.warning("Could not fsync %s: %s" % (f.name, e))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "writes": self.writes,
+                "opens": self.opens,
+                "flushes": self.flushes,
+                "fsyncs": self.fsyncs,
+            }
+
+    ## FLUSH THREAD ##
+
+    def _startFlusher(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._flushLoop, name="RawDataWriter", daemon=True
+                )
+                self._thread.start()
+
+    def _flushLoop(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+                if (
+                    self.fsync_interval is not None
+                    and self._unsynced
+                    and time.monotonic() - self._last_fsync >= self.fsync_interval
+                ):
+                    self.sync()
+            except (OSError, ValueError) as e:
+                logger.error("Could not write leak raw data: %s" % e)
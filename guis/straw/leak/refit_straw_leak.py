@@ -5,6 +5,11 @@ import csv
 from pathlib import Path
 
 
+# Skip points at beginning and end
+def truncate(container, nstart, nend):
+    return container[max(nstart - 1, 0) : len(container) - nend]
+
+
 def refit(raw_data_filename, n_skips_start, n_skips_end):
     directory = GetProjectPaths()["strawleakdata"] / "raw_data"
     leak_rate = 0
@@ -19,9 +24,6 @@ def refit(raw_data_filename, n_skips_start, n_skips_end):
     timestamp, PPM, PPM_err = get_data_from_file(directory / raw_data_filename)
 
     # Skip points at beginning and end
-    def truncate(container, nstart, nend):
-        return container[max(nstart - 1, 0) : len(container) - nend]
-
     timestamp = truncate(timestamp, n_skips_start, n_skips_end)
     PPM = truncate(PPM, n_skips_start, n_skips_end)
     PPM_err = truncate(PPM_err, n_skips_start, n_skips_end)
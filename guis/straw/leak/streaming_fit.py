@@ -0,0 +1,129 @@
+################################################################################
+# Streaming leak rate fit
+#
+# LeakFitState holds the running sums behind least_square_linear.get_fit for
+# one chamber's raw data. Readings are added one at a time, as they arrive
+# from the arduino, and the fit can be queried at any time in O(1) instead of
+# re-reading and re-fitting the whole raw data file.
+#
+# Each sum is accumulated term by term, in file order, with the same
+# expressions least_square_linear uses, so fit() is bit-for-bit identical to
+# get_fit(*get_data_from_file(raw_data_file)).
+################################################################################
+from guis.straw.leak.straw_leak_utilities import (
+    EXCLUDE_RAW_DATA_SECONDS,
+    calc_ppm_err,
+)
+
+
+class LeakFitState:
+    def __init__(self, path=None):
+        self.path = path  # raw data file this state mirrors, if any
+        self.reset()
+
+    def reset(self):
+        self.starttime = 0
+        self.timestamps = []  # event times, s since the first reading
+        self.PPM = []
+        self.max_ppm = None
+
+        # Weighted sums, w = 1/ppm_err^2
+        self._sum_w = 0  # sum((1/err)^2)
+        self._sum_x = 0  # sum(x/err^2)
+        self._sum_y = 0  # sum(y/err^2)
+        self._sum_xy = 0  # sum(x*y/err^2)
+        self._sum_xx = 0  # sum(x^2/err^2)
+
+    # Build a state from an existing raw data file.
+    @classmethod
+    def fromFile(cls, raw_data_fullpath):
+        state = cls(raw_data_fullpath)
+        with open(raw_data_fullpath, "r") as readfile:
+            for line in readfile:
+                state.addLine(line)
+        return state
+
+    # example line: <timestamp> <chamber> <reading> <human timestmap>
+    def addLine(self, line):
+        line = line.split()
+        self.add(float(line[0]), float(line[2]))
+
+    # Add one reading. Mirrors straw_leak_utilities.get_data_from_file.
+    def add(self, timestamp, ppm):
+        # set start time for this chamber
+        if self.starttime == 0:
+            self.starttime = timestamp
+
+        # set time for this reading
+        eventtime = timestamp - self.starttime
+
+        # Don't record first two minutes of data
+        if eventtime < EXCLUDE_RAW_DATA_SECONDS:
+            return
+
+        err = calc_ppm_err(ppm)
+        err_sqr = err ** 2
+        self.timestamps.append(eventtime)
+        self.PPM.append(ppm)
+        if self.max_ppm is None or ppm > self.max_ppm:
+            self.max_ppm = ppm
+
+        self._sum_w = self._sum_w + (1.0 / float(err)) ** 2
+        self._sum_x = self._sum_x + float(eventtime) / float(err_sqr)
+        self._sum_y = self._sum_y + float(ppm) / float(err_sqr)
+        self._sum_xy = self._sum_xy + float(eventtime * ppm) / float(err_sqr)
+        self._sum_xx = self._sum_xx + float(eventtime ** 2) / float(err_sqr)
+
+    ## PROPERTIES ##
+    def __len__(self):
+        return len(self.PPM)
+
+    # time of the latest fitted reading, s since the first reading
+    def runningDuration(self):
+        return self.timestamps[-1] if self.timestamps else 0
+
+    ## FIT ##
+    # Each mirrors the least_square_linear function of the same name.
+    def getSlope(self):
+        slope = -100
+        num1 = self._sum_x * self._sum_y
+        num2 = self._sum_xy * self._sum_w
+        den1 = self._sum_x ** 2
+        den2 = self._sum_xx * self._sum_w
+        if den1 != den2:
+            slope = float(num1 - num2) / float(den1 - den2)
+        return slope
+
+    def getSlopeErr(self):
+        slope_err = -100
+        num1 = self._sum_w
+        den1 = self._sum_xx * num1
+        den2 = self._sum_x ** 2
+        if den1 != den2:
+            slope_err = (float(num1) / float(den1 - den2)) ** 0.5
+        return slope_err
+
+    def getIntercept(self):
+        intercept = -100
+        num1 = self._sum_xy
+        num2 = self.getSlope() * self._sum_xx
+        den1 = self._sum_x
+        if den1 != 0:
+            intercept = float(num1 - num2) / float(den1)
+        return intercept
+
+    def getInterceptErr(self):
+        intercept_err = -100
+        num1 = self._sum_xx
+        den1 = num1 * self._sum_w
+        den2 = self._sum_x ** 2
+        if den1 != den2:
+            intercept_err = (float(num1) / float(den1 - den2)) ** 0.5
+        return intercept_err
+
+    # Return slope, slope_err, intercept, intercept_err like get_fit
+    def fit(self):
+        slope = self.getSlope()
+        if slope == 0:
+            slope = 1e-100
+        return slope, self.getSlopeErr(), self.getIntercept(), self.getInterceptErr()
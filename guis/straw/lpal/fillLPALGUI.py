@@ -20,6 +20,7 @@ from guis.common.dataProcessor import SQLDataProcessor as SQLDP
 from guis.common.timer import QLCDTimer
 from PyQt5.QtCore import pyqtSignal, QObject
 from PyQt5.QtWidgets import QApplication, QLCDNumber
+from guis.common.db_classes.bases import DM
 from guis.common.db_classes.straw import Straw
 from guis.common.getresources import GetProjectPaths
 
@@ -282,6 +283,8 @@ def run():
     |_____|_| /_/   \_\_____| |_____\___/ \__,_|\__,_|\___|_|                                                   
     """
     )
+    DM.startMerger()  # merge this station's data into the network DB
+
     ############################################################################
     # Scan-in LPAL Info
     ############################################################################
@@ -93,6 +93,26 @@ class MakeUpload:
         if failed:
             raise UploadFailedError(text.decode("unicode_escape"))
 
+    # Upload (straw, batch) pairs with DataLoader.sendBatched. Returns the
+    # pairs in batches that weren't loaded (rejected, or never sent), and
+    # those in batches that may or may not have been loaded (sent but no
+    # answer, or a 5xx) with the error of each.
+    def batchUpload(self, uploads, worker):
+        dataLoader = DataLoader(self.password, self.url, self.group, self.table)
+        for straw, batch in uploads:
+            dataLoader.addRow(self.createRow([straw, batch, worker]))
+
+        rejected, unknown = [], []
+        for retVal, code, text, rows, loaded in dataLoader.sendBatched():
+            if retVal:
+                continue
+            pairs = [(row["straw_barcode"], row["batch_number"]) for mode, row in rows]
+            if loaded is None:
+                unknown += [(pair, code) for pair in pairs]
+            else:
+                rejected += pairs
+        return rejected, unknown
+
     def findDataAndUpload(self, failed_straws, CPAL, worker):
         for file in os.listdir(self.data_path):
             filename = os.fsdecode(file)
@@ -106,37 +126,54 @@ class MakeUpload:
                         elif index == 3:
                             batches = row
 
-                for index, straw in enumerate(straws):
-                    if straw in failed_straws:
-                        try:
-                            self.beginUpload(
-                                straw, batches[index], worker, CPAL, "master"
-                            )
-                        except UploadFailedError as error:
-                            t = datetime.datetime.now().strftime("%Y-%m-%d")
-                            original_message = error.message
+                # Upload all the straws in batched requests. Only straws in a
+                # batch that wasn't loaded are retried one at a time, where
+                # the error can be pinned on a single straw. Straws in a batch
+                # that may have been loaded anyway aren't sent again, so as
+                # not to load them twice: they're written to the errors file
+                # to be checked.
+                uploads = [
+                    (straw, batches[index])
+                    for index, straw in enumerate(straws)
+                    if straw in failed_straws
+                ]
+                rejected, unknown = self.batchUpload(uploads, worker)
+                if unknown:
+                    t = datetime.datetime.now().strftime("%Y-%m-%d")
+                    errors = open(self.failed_path / str(t + "_masterupload_errors.txt"), "a+")
+                    for (straw, batch), code in unknown:
+                        errors.write(straw + " UPLOAD NOT CONFIRMED, check before retrying\n")
+                        errors.write(code)
+                        errors.write("\n")
+                    errors.close()
+                for straw, batch in rejected:
+                    try:
+                        self.beginUpload(straw, batch, worker, CPAL, "master")
+                    except UploadFailedError as error:
+                        t = datetime.datetime.now().strftime("%Y-%m-%d")
+                        original_message = error.message
 
-                            if error.message[125:-1] == workerIDError(worker):
-                                try:
-                                    self.beginUpload(
-                                        straw,
-                                        batches[index],
-                                        master_worker,
-                                        CPAL,
-                                        "master",
-                                    )
-                                except UploadFailedError:
-                                    errors = open(self.failed_path / str(t + "_masterupload_errors.txt"), "a+")
-                                    errors.write(straw + " FAILED UPLOAD\n")
-                                    errors.write(original_message)
-                                    errors.write("\n")
-                                    errors.close()
-                            else:
+                        if error.message[125:-1] == workerIDError(worker):
+                            try:
+                                self.beginUpload(
+                                    straw,
+                                    batch,
+                                    master_worker,
+                                    CPAL,
+                                    "master",
+                                )
+                            except UploadFailedError:
                                 errors = open(self.failed_path / str(t + "_masterupload_errors.txt"), "a+")
                                 errors.write(straw + " FAILED UPLOAD\n")
                                 errors.write(original_message)
                                 errors.write("\n")
                                 errors.close()
+                        else:
+                            errors = open(self.failed_path / str(t + "_masterupload_errors.txt"), "a+")
+                            errors.write(straw + " FAILED UPLOAD\n")
+                            errors.write(original_message)
+                            errors.write("\n")
+                            errors.close()
             else:
                 continue
 
@@ -0,0 +1,187 @@
+################################################################################
+# Pallet history index
+#
+# Straw histories are kept in one csv file per cutting pallet,
+# data/Pallets/CPALID##/CPAL####.csv, with one line per step:
+#   <date>,<step>,<straw>,<P/F/_>,<straw>,<P/F/_>,...,<workers>
+# plus "adds" lines recording a straw that moved in from another pallet
+# (<straw>,CPAL####) or that replaced another straw (<straw>,ST#####).
+#
+# Answering "did this straw pass this step" or "which pallet is this straw on"
+# used to mean listing every pallet directory and re-reading every pallet file,
+# for every straw. PalletIndex reads the files once, keeps their parsed lines
+# and a straw -> events map, and afterwards only re-reads files whose mtime or
+# size changed -- and of those, only the bytes appended since the last read
+# when the file just grew.
+#
+# Use GetPalletIndex() to share one index per pallet directory.
+################################################################################
+import csv, hashlib, os, threading, time
+from collections import namedtuple
+from pathlib import Path
+
+# One straw's entry on one line of a pallet file
+PalletEvent = namedtuple("PalletEvent", "cpalid pallet step result timestamp")
+
+
+class _PalletFile:
+    def __init__(self, path, cpalid):
+        self.path = path
+        self.cpalid = cpalid  # e.g. "CPALID07"
+        self.pallet = path.name[:-4]  # e.g. "CPAL1234"
+        self.stat = None  # (mtime, size) when last read
+        self.offset = 0  # bytes up to and including the last newline
+        self._digest = None  # hash of the bytes before offset, to detect rewrites
+        self.rows = []  # non-empty csv rows from complete lines
+        self.partial = []  # rows from the trailing line without a newline
+
+    def history(self):
+        return self.rows + self.partial
+
+    # Read what changed since the last read. Returns True if anything did.
+    def update(self, stat):
+        if stat == self.stat:
+            return False
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # If the file only grew, the bytes read last time are unchanged and
+        # only the rest needs parsing. Otherwise (e.g. UpdateStrawInfo rewrote
+        # a line in place) start over.
+        if self.offset and self._hash(data[: self.offset]) != self._digest:
+            self.reset()
+        new = data[self.offset :]
+        end = new.rfind(b"\n") + 1
+        self.rows += self._parse(new[:end])
+        self.partial = self._parse(new[end:])
+        self.offset += end
+        self._digest = self._hash(data[: self.offset])
+        self.stat = stat
+        return True
+
+    # Forget what was read, so the next update re-reads the whole file
+    def reset(self):
+        self.stat, self.offset, self._digest, self.rows = None, 0, None, []
+
+    @staticmethod
+    def _hash(data):
+        return hashlib.sha1(data).digest()
+
+    @staticmethod
+    def _parse(data):
+        lines = data.decode(errors="replace").splitlines()
+        return [row for row in csv.reader(lines) if row != []]
+
+    # (straw, event) for every straw-like cell in the file
+    def events(self):
+        for row in self.history():
+            if len(row) < 2:
+                continue
+            for index in range(2, len(row)):
+                cell = row[index].strip()
+                if len(cell) == 7 and cell[:2].lower() == "st":
+                    result = row[index + 1] if index + 1 < len(row) else None
+                    yield cell.lower(), PalletEvent(
+                        self.cpalid, self.pallet, row[1], result, row[0]
+                    )
+
+
+class PalletIndex:
+    def __init__(self, pallet_directory, refresh_interval=1.0):
+        self.palletDirectory = Path(pallet_directory)
+        # Minimum time between scans of the directory for changed files
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        self._files = {}  # path : _PalletFile, in directory listing order
+        self._pallets = {}  # "CPAL####.csv" : [_PalletFile]
+        self._straws = {}  # "st#####" : {path : [PalletEvent]}
+        self._last_refresh = None
+
+    ## LOOKUPS ##
+    # Each refreshes the index if it is older than refresh_interval.
+
+    # Parsed lines of each file named <cpal>.csv, in directory listing order.
+    def palletHistories(self, cpal):
+        with self._lock:
+            self.refresh()
+            return [f.history() for f in self._pallets.get(cpal + ".csv", [])]
+
+    # Every line naming this straw, file by file, in file order.
+    def strawEvents(self, straw):
+        with self._lock:
+            self.refresh()
+            files = self._straws.get(straw.lower(), {})
+            return [event for path in sorted(files) for event in files[path]]
+
+    # (cpalid, pallet) of every pallet file whose history names this straw
+    def palletsWithStraw(self, straw):
+        return sorted({(e.cpalid, e.pallet) for e in self.strawEvents(straw)})
+
+    ## MAINTENANCE ##
+
+    # Make the next lookup rescan. Call after writing a pallet file.
+    def invalidate(self, path=None):
+        with self._lock:
+            self._last_refresh = None
+            if path is not None and Path(path) in self._files:
+                self._files[Path(path)].reset()
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._last_refresh is not None
+                and now - self._last_refresh < self.refresh_interval
+            ):
+                return
+            self._last_refresh = now
+
+            files, pallets = {}, {}
+            for palletid in os.scandir(self.palletDirectory):
+                if not palletid.is_dir():
+                    continue
+                for entry in os.scandir(palletid.path):
+                    if not entry.is_file():
+                        continue
+                    path = Path(entry.path)
+                    stat = entry.stat()
+                    pfile = self._files.get(path) or _PalletFile(path, palletid.name)
+                    if pfile.update((stat.st_mtime_ns, stat.st_size)):
+                        self._reindex(pfile)
+                    files[path] = pfile
+                    pallets.setdefault(entry.name, []).append(pfile)
+
+            for path in set(self._files) - set(files):
+                self._unindex(path)
+            self._files, self._pallets = files, pallets
+
+    def _unindex(self, path):
+        for straw in list(self._straws):
+            self._straws[straw].pop(path, None)
+            if not self._straws[straw]:
+                del self._straws[straw]
+
+    def _reindex(self, pfile):
+        self._unindex(pfile.path)
+        for straw, event in pfile.events():
+            self._straws.setdefault(straw, {}).setdefault(pfile.path, []).append(
+                event
+            )
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# The process-wide PalletIndex of a pallet directory (default: the "pallets"
+# project path).
+def GetPalletIndex(pallet_directory=None):
+    if pallet_directory is None:
+        from guis.common.getresources import GetProjectPaths
+
+        pallet_directory = GetProjectPaths()["pallets"]
+    key = Path(pallet_directory)
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = PalletIndex(key)
+        return _indexes[key]
@@ -47,6 +47,7 @@ from pathlib import Path
 from guis.straw.prep.design import Ui_MainWindow  ## edit via Qt Designer
 from data.workers.credentials.credentials import Credentials
 from guis.straw.prep.straw_label_script import print_barcodes
+from guis.common.db_classes.bases import DM
 from guis.common.db_classes.straw import Straw
 from guis.common.db_classes.straw_location import StrawPosition, CuttingPallet
 from guis.common.getresources import GetProjectPaths
@@ -684,31 +685,45 @@ class Prep(QMainWindow):
             file.write(workers_str)
 
     # Add entries to the straw, straw_present and measurement_prep tables
+    # The whole pallet is saved in one transaction, with a few statements
+    # for all 24 straws.
     def saveDataToDB(self):
+        procedure = self.DP.procedure
+        straw_ids, batches, grades = [], {}, []
         for position in range(24):
             straw_id = int(self.strawIDs[position][2:])
             batch = self.batchBarcodes[position]
             batch = "".join(filter(str.isalnum, batch))  # for the db, drop the period
-            ppg = self.paperPullGrades[position][-1]
-
-            # new entry in straw table
-            straw = Straw.Straw(id=straw_id, batch=batch)
-
-            # our procedure (created and) knows our CPAL. In creating the CPAL
-            # straw location, we made 24 "straw positions" (in the
-            # straw_position" table), aka slots where straws can go.
-            cpal = self.DP.procedure.getStrawLocation()
-
-            # new entry in straw_present table.
-            cpal.addStraw(straw, position)
+            straw_ids.append(straw_id)
+            batches[straw_id] = batch
+            grades.append(self.paperPullGrades[position][-1])
+
+        # our procedure (created and) knows our CPAL. In creating the CPAL
+        # straw location, we made 24 "straw positions" (in the
+        # straw_position" table), aka slots where straws can go.
+        cpal = procedure.getStrawLocation()
+
+        with DM.transaction():
+            # new entries in straw table
+            straws = Straw.Straws(batches)
+
+            # new entries in straw_present table.
+            cpal.addStraws(
+                {position: straws[id] for position, id in enumerate(straw_ids)}
+            )
 
-            # new entry in measurement_prep table
-            self.DP.procedure.StrawPrepMeasurement(
-                procedure=self.DP.procedure,
-                straw_id=straw_id,
-                paper_pull_grade=ppg,
-                evaluation=None,
-            ).commit()
+            # new entries in measurement_prep table
+            DM.insertEntries(
+                [
+                    procedure.StrawPrepMeasurement(
+                        procedure=procedure,
+                        straw_id=straw_id,
+                        paper_pull_grade=ppg,
+                        evaluation=None,
+                    )
+                    for straw_id, ppg in zip(straw_ids, grades)
+                ]
+            )
 
     ############################################################################
     # Worker login and gui lock
@@ -1255,6 +1270,7 @@ def except_hook(exctype, exception, tb):
 def run():
     sys.excepthook = except_hook  # crash, don't hang when an exception is raised
     app = QApplication(sys.argv)
+    DM.startMerger()  # merge this station's data into the network DB
     paths = GetProjectPaths()
     ctr = Prep(paths)
     ctr.show()
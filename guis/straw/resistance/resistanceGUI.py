@@ -48,6 +48,7 @@ from guis.straw.resistance.measureByHand import MeasureByHandPopup
 from guis.straw.removestraw import removeStraw
 from data.workers.credentials.credentials import Credentials
 from guis.common.getresources import GetProjectPaths
+from guis.common.db_classes.bases import DM
 from guis.common.save_straw_workers import saveWorkers
 from guis.common.dataProcessor import SQLDataProcessor as DP
 from guis.common.gui_utils import generateBox
@@ -685,7 +686,8 @@ class StrawResistanceGUI(QDialog):
 
     def saveDataToDB(self):
         # TODO perform checks on the validity/completeness of entries
-        [entry.commit() for entry in self.db_entries]
+        # all of the pallet's measurements in one statement and transaction
+        DM.insertEntries(self.db_entries)
 
     # save the csv file of straw-by-straw measurements
     def saveResistanceDataToText(self):
@@ -1013,6 +1015,7 @@ def except_hook(exctype, exception, tb):
 def run():
     sys.excepthook = except_hook  # crash, don't hang when an exception is raised
     app = QApplication(sys.argv)
+    DM.startMerger()  # merge this station's data into the network DB
     paths = GetProjectPaths()
     ctr = StrawResistanceGUI(paths, app)
     ctr.show()
@@ -37,6 +37,7 @@ from guis.straw.removestraw import removeStraw
 from guis.straw.checkstraw import *
 from data.workers.credentials.credentials import Credentials
 from guis.common.getresources import GetProjectPaths
+from guis.common.db_classes.bases import DM
 from guis.common.save_straw_workers import saveWorkers
 
 pyautogui.FAILSAFE = True  # Move mouse to top left corner to abort script
@@ -410,6 +411,7 @@ def run():
     paths = GetProjectPaths()
     sys.excepthook = except_hook
     app = QApplication(sys.argv)
+    DM.startMerger()  # merge this station's data into the network DB
     ctr = Silver(paths)
     ctr.show()
     app.exec_()
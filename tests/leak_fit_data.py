@@ -0,0 +1,60 @@
+################################################################################
+# Leak fit test data and comparison, shared by tests/test_leak_fit_equivalence.py
+# and the benchmarks that check batch_fit against the functions it batches
+################################################################################
+import math
+
+from guis.straw.leak.least_square_linear import (
+    get_slope_err_zero_intercept,
+    get_slope_zero_intercept,
+)
+from guis.straw.leak.straw_leak_utilities import EXCLUDE_RAW_DATA_SECONDS, calc_ppm_err
+
+
+## DATA ##
+# One chamber's readings: a straw leaking at a random rate, read every ~2 s
+def Chamber(n, rng):
+    x, t = [], EXCLUDE_RAW_DATA_SECONDS + rng.uniform(0, 2)
+    for _ in range(n):
+        x.append(t)
+        t += rng.uniform(1.5, 2.5)
+    leak, start = rng.uniform(-0.01, 0.2), rng.uniform(300, 800)
+    y = [round(start + leak * t + rng.gauss(0, 10), 2) for t in x]
+    return x, y, [calc_ppm_err(ppm) for ppm in y]
+
+
+# Data the fits can't make sense of
+def Degenerate():
+    return [
+        ([], [], []),  # no readings
+        ([500.0], [600.0], [calc_ppm_err(600.0)]),  # one
+        ([500.0] * 4, [600.0, 610, 620, 630], [25.0] * 4),  # no time passes
+        ([0.0] * 3, [600.0, 600, 600], [25.0] * 3),  # all at x = 0
+        ([1.0, 2, 3], [600.0, 600, 600], [25.0] * 3),  # flat
+        ([-1.0, 0, 1], [600.0, 610, 620], [25.0] * 3),  # sum(x/err^2) = 0
+    ]
+
+
+## COMPARISON ##
+# Values agree if they are within rtol of each other, or both aren't finite
+# (the batched fits give nan or inf where the originals raise)
+def Agree(a, b, rtol):
+    a, b = complex(a), complex(b)
+    if a.imag or b.imag:  # the original took the root of a negative number
+        return not math.isfinite(a.real) or not math.isfinite(b.real)
+    a, b = a.real, b.real
+    if not (math.isfinite(a) and math.isfinite(b)):
+        return not math.isfinite(a) and not math.isfinite(b)
+    return abs(a - b) <= rtol * max(abs(a), abs(b))
+
+
+# get_slope_zero_intercept and get_slope_err_zero_intercept, nan where the
+# original raises
+def ZeroIntercept(x, y, y_err):
+    values = []
+    for function in (get_slope_zero_intercept, get_slope_err_zero_intercept):
+        try:
+            values.append(function(x, y, y_err))
+        except ZeroDivisionError:
+            values.append(math.nan)
+    return values
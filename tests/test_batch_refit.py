@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+# refit_straw_leak needs the data package, which setup.py creates
+pytest.importorskip("data", reason="no data package, run setup.py first")
+
+from guis.straw.leak import batch_refit
+from guis.straw.leak.least_square_linear import get_fit
+from guis.straw.leak.straw_leak_utilities import (
+    STRAW_VOLUME,
+    calculate_leak_rate,
+    get_chamber_volume,
+    get_data_from_file,
+)
+
+START = 1.6e9  # 2020-09-13
+
+
+@pytest.fixture
+def raw_files(tmp_path):
+    rng = random.Random(0)
+    paths = []
+    for n, chamber in enumerate((0, 17, 49)):
+        path = tmp_path / ("ST%05d_chamber%d_2020_09_13_rawdata.txt" % (n, chamber))
+        with open(path, "w") as f:
+            for i in range(400):
+                ppm = 500 + 0.1 * i + rng.gauss(0, 10)
+                f.write("%.0f\t%d\t%.0f\tx\n" % (START + 2 * i, chamber, ppm))
+        paths.append(path)
+    return paths
+
+
+# LeakTestResults.csv with each file's leak rate as LeakTestGUI records it:
+# fit over the chamber with the straw in
+@pytest.fixture
+def results(tmp_path, raw_files):
+    path = tmp_path / "LeakTestResults.csv"
+    with open(path, "w") as f:
+        for raw in raw_files:
+            straw = raw.name.split("_")[0]
+            chamber = int(raw.name.split("_")[1][len("chamber") :])
+            slope = get_fit(*get_data_from_file(raw))[0]
+            volume = get_chamber_volume(chamber) - STRAW_VOLUME
+            f.write(
+                "%s,2020-09-13 20:00:00,CO2,wk-test01,chamber%d,%r,0.0\n"
+                % (straw, chamber, calculate_leak_rate(slope, volume))
+            )
+    return batch_refit.read_results(path)
+
+
+def compared(refits, results):
+    return [batch_refit.compare(r, batch_refit.recorded(results, r)) for r in refits]
+
+
+def test_refits_agree_with_the_recorded_results(raw_files, results):
+    refits = compared(batch_refit.refit_chunk(raw_files), results)
+    assert [r.error for r in refits] == [""] * len(raw_files)
+    assert [r for r in refits if batch_refit.differs(r, 1e-9)] == []
+
+
+def test_empty_chamber_volumes_differ(raw_files, results):
+    refits = compared(batch_refit.refit_chunk(raw_files, straw_volume=0), results)
+    assert len([r for r in refits if batch_refit.differs(r, 0.01)]) == len(raw_files)
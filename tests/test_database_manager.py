@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+
+import pytest
+
+# databaseManager needs the data package, which setup.py creates
+pytest.importorskip("data", reason="no data package, run setup.py first")
+
+from sqlalchemy import Column, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+from guis.common.databaseManager import DatabaseManager
+
+BASE = declarative_base()
+
+
+class Record(BASE):
+    __tablename__ = "record_test"
+    id = Column(Integer, primary_key=True)
+    value = Column(Integer)
+
+
+@pytest.fixture(params=["synchronous", "write-behind"])
+def dm(request, tmp_path):
+    path = tmp_path / "dm.db"
+    dm = DatabaseManager(local_db=path)
+    BASE.metadata.create_all(dm._engine)
+    if request.param == "write-behind":
+        dm.startWriteBehind()
+    yield dm
+    if dm.writeBehind():
+        dm.stopWriteBehind()
+    dm._engine.dispose()
+
+
+def values(dm):
+    dm.sync()
+    con = sqlite3.connect(str(dm.getLocalDatabasePath()))
+    try:
+        return [row[0] for row in con.execute("SELECT value FROM record_test")]
+    finally:
+        con.close()
+
+
+def test_outer_block_commits_once(dm):
+    commits = dm.commits
+    with dm.transaction():
+        dm.commitEntry(Record(value=1))
+        with dm.transaction():
+            dm.commitEntry(Record(value=2))
+            dm.commitEntries([Record(value=3), Record(value=4)])
+        assert dm.inTransaction()
+        assert dm.commits == commits
+    assert not dm.inTransaction()
+    assert dm.commits == commits + 1
+    assert sorted(values(dm)) == [1, 2, 3, 4]
+
+
+def test_outer_block_that_raises_rolls_back(dm):
+    commits = dm.commits
+    with pytest.raises(ValueError):
+        with dm.transaction():
+            dm.commitEntry(Record(value=1))
+            with dm.transaction():
+                dm.commitEntry(Record(value=2))
+            raise ValueError
+    assert not dm.inTransaction()
+    assert dm.commits == commits
+    assert values(dm) == []
+
+
+def test_nested_block_that_raises_rolls_back_alone(dm):
+    with dm.transaction():
+        dm.commitEntry(Record(value=1))
+        try:
+            with dm.transaction():
+                dm.commitEntry(Record(value=2))
+                raise ValueError
+        except ValueError:
+            pass
+        dm.commitEntry(Record(value=3))
+    assert sorted(values(dm)) == [1, 3]
+
+
+def test_blocks_are_per_thread(dm):
+    seen = []
+    with dm.transaction():
+        other = threading.Thread(target=lambda: seen.append(dm.inTransaction()))
+        other.start()
+        other.join()
+    assert seen == [False]
@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from guis.straw.leak import batch_fit
+from guis.straw.leak.least_square_linear import get_fit
+from guis.straw.leak.straw_leak_utilities import (
+    calculate_leak_rate,
+    calculate_leak_rate_err,
+    get_chamber_volume,
+    get_chamber_volume_err,
+)
+from guis.straw.leak.streaming_fit import LeakFitState
+from tests.leak_fit_data import Agree, Chamber, Degenerate, ZeroIntercept
+
+RTOL = 1e-12
+
+
+def random_chambers():
+    rng = random.Random(0)
+    return [Chamber(n, rng) for n in (0, 1, 2, 3, 10, 57, 200, 431)]
+
+
+@pytest.fixture(params=["random", "degenerate"])
+def chambers(request):
+    return random_chambers() if request.param == "random" else Degenerate()
+
+
+def stacked(chambers):
+    x, mask = batch_fit.stack([c[0] for c in chambers])
+    y, _ = batch_fit.stack([c[1] for c in chambers])
+    y_err, _ = batch_fit.stack([c[2] for c in chambers], fill=1.0)
+    return x, y, y_err, mask
+
+
+# expected: a tuple per chamber; got: a tuple of arrays, one entry per chamber
+def assert_agree(expected, got):
+    for chamber, values in enumerate(expected):
+        for quantity, (e, g) in enumerate(zip(values, got)):
+            assert Agree(e, g[chamber], RTOL), (chamber, quantity, e, g[chamber])
+
+
+def test_fit(chambers):
+    assert_agree([get_fit(*c) for c in chambers], batch_fit.fit(*stacked(chambers)))
+
+
+def test_fit_zero_intercept(chambers):
+    assert_agree(
+        [ZeroIntercept(*c) for c in chambers],
+        batch_fit.fit_zero_intercept(*stacked(chambers)),
+    )
+
+
+def test_fit_states(chambers):
+    states = []
+    for c in chambers:
+        state = LeakFitState()
+        for t, ppm in zip(c[0], c[1]):
+            state.add(1.6e9 + t, ppm)
+        states.append(state)
+    assert_agree([s.fit() for s in states], batch_fit.fit_states(states))
+
+
+def test_leak_rates(chambers):
+    numbers = [i * 7 % 50 for i in range(len(chambers))]
+    slope, slope_err, _, _ = batch_fit.fit(*stacked(chambers))
+    expected = []
+    for c, n in zip(chambers, numbers):
+        s, s_err, _, _ = get_fit(*c)
+        volume, volume_err = get_chamber_volume(n), get_chamber_volume_err(n)
+        rate = calculate_leak_rate(s, volume)
+        expected.append(
+            (rate, calculate_leak_rate_err(rate, s, s_err, volume, volume_err))
+        )
+    assert_agree(expected, batch_fit.leak_rates(slope, slope_err, numbers))
@@ -0,0 +1,180 @@
+import sqlite3
+
+import pytest
+
+from guis.common.merger import Merger
+
+
+@pytest.fixture
+def merger(tmp_path):
+    src, dst = tmp_path / "src.db", tmp_path / "dst.db"
+    for path in (src, dst):
+        con = sqlite3.connect(str(path))
+        con.execute(
+            "CREATE TABLE measurement (id INTEGER PRIMARY KEY, timestamp INTEGER, x)"
+        )
+        con.execute("CREATE TABLE station (id INTEGER PRIMARY KEY, name TEXT)")
+        con.commit()
+        con.close()
+    return Merger(src, dst)
+
+
+def execute(path, script, args=()):
+    con = sqlite3.connect(str(path))
+    try:
+        with con:
+            return con.execute(script, args).fetchall()
+    finally:
+        con.close()
+
+
+def insert(merger, id, timestamp, x=None):
+    execute(
+        merger.src_db,
+        "INSERT INTO measurement (id, timestamp, x) VALUES (?, ?, ?)",
+        (id, timestamp, x),
+    )
+
+
+def merged(merger, table="measurement"):
+    return [row[0] for row in execute(merger.dst_db, f"SELECT id FROM {table}")]
+
+
+def test_late_row_is_merged(merger):
+    insert(merger, 1, 1000)
+    insert(merger, 2, 2000)
+    merger.mergeAll()
+    assert merged(merger) == [1, 2]
+
+    # written with a timestamp below the mark, e.g. an import-time default
+    insert(merger, 3, 1500)
+    merger.mergeAll()
+    assert merged(merger) == [1, 2, 3]
+
+
+def test_late_row_is_merged_with_newer_rows(merger):
+    insert(merger, 1, 1000)
+    insert(merger, 2, 2000)
+    merger.mergeAll()
+
+    insert(merger, 3, 1500)
+    insert(merger, 4, 3000)
+    merger.mergeAll()
+    assert merged(merger) == [1, 2, 3, 4]
+
+
+def test_backdated_rowid_is_merged_by_timestamp(merger):
+    insert(merger, 10, 1000)
+    insert(merger, 20, 2000)
+    merger.mergeAll()
+
+    # an id taken from the clock before row 20's, committed after it
+    insert(merger, 15, 2500)
+    merger.mergeAll()
+    assert merged(merger) == [10, 15, 20]
+
+
+def test_backdated_rowid_is_merged_by_change_capture(merger):
+    merger.enableChangeCapture(lambda: ["station"])
+    execute(merger.src_db, "INSERT INTO station VALUES (10, 'a'), (20, 'b')")
+    merger.mergeAll()
+    assert merged(merger, "station") == [10, 20]
+
+    execute(merger.src_db, "INSERT INTO station VALUES (15, 'c')")
+    merger.mergeAll()
+    assert merged(merger, "station") == [10, 15, 20]
+
+
+@pytest.mark.parametrize("key", ["timestamp", "rowid"])
+def test_watermark_merge_searches_indexes(merger, key):
+    con = merger._connect()
+    try:
+        merger._initWatermarks(con)
+        merger.mergeTable(con, "measurement")
+        script = Merger.mergeScript(
+            "measurement", merger.attach_alias, key=key, since=1000, max_rowid=1
+        )
+        select = script[script.index("SELECT") :].strip().rstrip(";")
+        plan = [row[3] for row in con.execute("EXPLAIN QUERY PLAN " + select)]
+    finally:
+        con.close()
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+
+
+def test_updated_row_is_merged(merger):
+    insert(merger, 1, 1000, "old")
+    merger.mergeAll()
+
+    execute(merger.src_db, "UPDATE measurement SET timestamp = 2000, x = 'new'")
+    merger.mergeAll()
+    assert execute(merger.dst_db, "SELECT x FROM measurement") == [("new",)]
+
+
+def test_unchanged_tables_are_skipped(merger):
+    insert(merger, 1, 1000)
+    merger.mergeAll()
+
+    # a row only in the destination is left alone if the source is unchanged
+    execute(merger.dst_db, "DELETE FROM measurement")
+    merger.mergeAll()
+    assert merged(merger) == []
+
+
+def capture_objects(merger):
+    return execute(
+        merger.src_db,
+        "SELECT name FROM sqlite_master WHERE name LIKE 'merge_capture%' "
+        "OR name = 'merge_changelog'",
+    )
+
+
+def test_disable_change_capture_removes_triggers(merger):
+    merger.enableChangeCapture(lambda: ["measurement"])
+    merger.mergeAll()
+    insert(merger, 1, 1000)
+    assert len(capture_objects(merger)) == 3
+
+    merger.disableChangeCapture()
+    assert capture_objects(merger) == []
+    insert(merger, 2, 2000)
+    merger.mergeAll()
+    assert merged(merger) == [1, 2]
+
+
+def test_merge_without_capture_removes_triggers(merger):
+    merger.enableChangeCapture(lambda: ["measurement"])
+    merger.mergeAll()
+
+    # e.g. the previous run captured and this one doesn't
+    merger = Merger(merger.src_db, merger.dst_db)
+    merger.mergeAll()
+    assert capture_objects(merger) == []
+
+
+def changelog(merger):
+    return execute(merger.src_db, "SELECT tbl, row_id FROM merge_changelog")
+
+
+def test_changelog_merges_content_changed_in_place(merger):
+    merger.enableChangeCapture(lambda: ["measurement"])
+    insert(merger, 1, 1000, "old")
+    merger.mergeAll()
+
+    # the content changes, the timestamp doesn't
+    execute(merger.src_db, "UPDATE measurement SET x = 'new'")
+    assert changelog(merger) == [("measurement", 1)]
+    merger.mergeAll()
+    assert execute(merger.dst_db, "SELECT x FROM measurement") == [("new",)]
+    assert changelog(merger) == []
+
+
+def test_failed_drain_keeps_the_changelog(merger):
+    merger.enableChangeCapture(lambda: ["measurement"])
+    merger.mergeAll()
+    insert(merger, 1, 1000)
+
+    # the destination can't take the source's rows
+    execute(merger.dst_db, "DROP TABLE measurement")
+    execute(merger.dst_db, "CREATE TABLE measurement (id INTEGER PRIMARY KEY, x)")
+    merger.mergeAll()
+    assert changelog(merger) == [("measurement", 1)]
@@ -0,0 +1,81 @@
+import csv
+import os
+
+import pytest
+
+from guis.straw.pallet_index import PalletIndex
+
+STRAWS = [f"ST{n:05}" for n in range(1, 25)]
+
+
+def write(path, rows):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def step(date, name, results):
+    row = [date, name]
+    for straw in STRAWS:
+        row += [straw, results.get(straw, "_")]
+    return row + ["wk-worker01"]
+
+
+@pytest.fixture
+def pallet(tmp_path):
+    (tmp_path / "CPALID01").mkdir()
+    path = tmp_path / "CPALID01" / "CPAL0001.csv"
+    write(
+        path,
+        [
+            step("2020-01-01_10:00", "prep", {s: "P" for s in STRAWS}),
+            step("2020-01-02_10:00", "leak", {}),
+        ],
+    )
+    return path
+
+
+def leak_result(index, straw):
+    return [e.result for e in index.strawEvents(straw) if e.step == "leak"]
+
+
+# What UpdateStrawInfo does when the step is unchanged: rewrite the last line
+# with a new date and one straw's result, keeping the file's length.
+def rewrite_last_line(path, straw, result):
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    rows[-1][0] = "2020-01-02_11:00"
+    rows[-1][rows[-1].index(straw) + 1] = result
+    write(path, rows)
+
+
+def test_rewrite_in_place_is_reread(pallet):
+    index = PalletIndex(pallet.parent.parent, refresh_interval=0)
+    assert leak_result(index, "ST00001") == ["_"]
+
+    size = pallet.stat().st_size
+    rewrite_last_line(pallet, "ST00001", "P")
+    assert pallet.stat().st_size == size
+    # a later mtime, as the rewrite would normally have
+    os.utime(pallet, ns=(pallet.stat().st_atime_ns, pallet.stat().st_mtime_ns + 1))
+    assert leak_result(index, "ST00001") == ["P"]
+
+
+def test_invalidate_rereads_an_unchanged_stat(pallet):
+    index = PalletIndex(pallet.parent.parent, refresh_interval=0)
+    assert leak_result(index, "ST00001") == ["_"]
+
+    stat = pallet.stat()
+    rewrite_last_line(pallet, "ST00001", "P")
+    # same mtime and size: only invalidate() can tell the index
+    os.utime(pallet, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    index.invalidate(pallet)
+    assert leak_result(index, "ST00001") == ["P"]
+
+
+def test_appended_lines_are_read(pallet):
+    index = PalletIndex(pallet.parent.parent, refresh_interval=0)
+    assert leak_result(index, "ST00002") == ["_"]
+
+    with open(pallet, "a", newline="") as f:
+        csv.writer(f).writerow(step("2020-01-03_10:00", "leak", {"ST00002": "P"}))
+    assert leak_result(index, "ST00002") == ["_", "P"]
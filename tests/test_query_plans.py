@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+# db_classes needs the data package, which setup.py creates
+pytest.importorskip("data", reason="no data package, run setup.py first")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.query_plans import FULL_SCAN, CreateTables, HotQueries, Plan
+from guis.common.migrations import migrate
+
+ENGINE = create_engine("sqlite://")
+QUERIES = HotQueries(sessionmaker(bind=ENGINE)())
+
+
+@pytest.fixture(scope="module")
+def con(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    CreateTables(engine)
+    engine.dispose()
+    migrate(path)
+    con = sqlite3.connect(str(path))
+    yield con
+    con.close()
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_hot_query_uses_an_index(con, name):
+    sql = str(
+        QUERIES[name].statement.compile(
+            dialect=ENGINE.dialect, compile_kwargs={"literal_binds": True}
+        )
+    )
+    plan = Plan(con, sql)
+    assert not [step for step in plan if FULL_SCAN.match(step)], "\n".join(plan)
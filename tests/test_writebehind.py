@@ -0,0 +1,188 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from guis.common.writebehind import DatabaseLocked, WriteBehind
+
+BASE = declarative_base()
+
+
+class Row(BASE):
+    __tablename__ = "row"
+    id = Column(Integer, primary_key=True)
+    x = Column(String, nullable=False)
+    n = Column(Integer, default=7)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "writebehind.db"
+    engine = create_engine(f"sqlite:///{path}")
+    BASE.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def Session(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 0.05})
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def gui(Session):
+    session = Session(autoflush=False)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def writer(Session):
+    writer = WriteBehind(Session, retry_interval=0.01, lock_timeout=5)
+    writer.start()
+    yield writer
+    writer.stop(5)
+
+
+def rows(path):
+    con = sqlite3.connect(str(path))
+    try:
+        return con.execute("SELECT id, x, n FROM row ORDER BY id").fetchall()
+    finally:
+        con.close()
+
+
+# Hold the database's write lock, like the merger or another station
+@contextmanager
+def locked(path):
+    con = sqlite3.connect(str(path), isolation_level=None)
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    finally:
+        con.execute("ROLLBACK")
+        con.close()
+
+
+def test_new_row_is_reattached(path, gui, writer):
+    row = Row(x="a")
+    writer.submit(gui, [row]).wait(5)
+    assert rows(path) == [(1, "a", 7)]
+
+    writer.reattach(gui)
+    assert row in gui
+    assert (row.id, row.n) == (1, 7)
+    assert not gui.is_modified(row)
+
+
+def test_changed_row_stays_dirty_until_written(path, gui, writer):
+    gui.add(Row(id=1, x="a"))
+    gui.commit()
+    row = gui.query(Row).one()
+
+    with locked(path):
+        row.x = "b"
+        pending = writer.submit(gui, [row])
+        writer.reattach(gui)
+        assert gui.is_modified(row)
+    pending.wait(5)
+    writer.reattach(gui)
+    assert not gui.is_modified(row)
+    assert rows(path) == [(1, "b", 7)]
+
+
+def test_writes_land_in_order(path, gui, writer):
+    gui.add(Row(id=1, x="0"))
+    gui.commit()
+    row = gui.query(Row).one()
+
+    with locked(path):
+        for n in range(1, 20):
+            row.x = str(n)
+            writer.submit(gui, [row])
+    writer.sync(5)
+    assert rows(path) == [(1, "19", 7)]
+
+
+def test_new_row_queued_again_is_inserted_once(path, gui, writer):
+    row = Row(x="a")
+    with locked(path):
+        first = writer.submit(gui, [row])
+        start = time.monotonic()
+        row.x = "b"
+        second = writer.submit(gui, [row])
+        # doesn't wait for the first write
+        assert time.monotonic() - start < 1
+        assert not first.done()
+    second.wait(5)
+    assert rows(path) == [(1, "b", 7)]
+
+    # and once the first has landed, a third write updates the same row
+    writer.reattach(gui)
+    row.x = "c"
+    writer.submit(gui, [row]).wait(5)
+    assert rows(path) == [(1, "c", 7)]
+
+
+def test_new_row_changed_before_reattach(path, gui, writer):
+    row = Row(x="a")
+    writer.submit(gui, [row]).wait(5)
+    # changed before the write was reattached: still a change once it is
+    row.x = "b"
+    writer.submit(gui, [row]).wait(5)
+    assert rows(path) == [(1, "b", 7)]
+
+
+def test_locked_database_fails_the_write(path, Session, gui):
+    writer = WriteBehind(Session, retry_interval=0.01, lock_timeout=0.2)
+    writer.start()
+    try:
+        row = Row(x="a")
+        with locked(path):
+            start = time.monotonic()
+            pending = writer.submit(gui, [row])
+            with pytest.raises(DatabaseLocked):
+                pending.wait(5)
+            assert time.monotonic() - start < 1
+        writer.reattach(gui)
+        assert [type(e) for e in writer.errors()] == [DatabaseLocked]
+        assert writer.errors() == []
+        assert row not in gui and row.id is None
+
+        # left as it was, to be committed again
+        writer.submit(gui, [row]).wait(5)
+        assert rows(path) == [(1, "a", 7)]
+    finally:
+        writer.stop(5)
+
+
+def test_bad_write_fails_alone(path, gui, writer):
+    gui.add(Row(id=1, x="a"))
+    gui.commit()
+    with locked(path):
+        good = writer.submit(gui, [Row(id=2, x="b")])
+        bad = writer.submit(gui, [Row(id=4)])  # x is NOT NULL
+        later = writer.submit(gui, [Row(id=3, x="c")])
+    later.wait(5)
+    good.wait(5)
+    with pytest.raises(Exception):
+        bad.wait(5)
+    writer.reattach(gui)
+    assert len(writer.errors()) == 1
+    assert rows(path) == [(1, "a", 7), (2, "b", 7), (3, "c", 7)]
+
+
+def test_sync_waits_for_everything_queued(path, gui, writer):
+    with locked(path):
+        pending = [writer.submit(gui, [Row(x=str(n))]) for n in range(5)]
+        with pytest.raises(TimeoutError):
+            writer.sync(0.05)
+    writer.sync(5)
+    assert all(write.done() for write in pending)
+    assert len(rows(path)) == 5